@@ -0,0 +1,133 @@
+"""
+get_user_stats latency before and after the lookup indexes (migration 2).
+
+Builds the base schema (migration 1) in a scratch schema, loads ~1M
+event_attendance rows, times get_user_stats_single for a sample of users,
+then applies migration 2, ANALYZEs and times the same users again.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/covenant_bench \
+        python bench/bench_indexes.py [--attendance 1000000] [--samples 500]
+"""
+
+import argparse
+import asyncio
+import random
+
+from common import (
+    Timer,
+    apply_migrations,
+    bench_database_url,
+    create_bench_pool,
+    drop_schema,
+    main,
+    print_table,
+    reset_schema,
+)
+
+SCHEMA = "bench_indexes"
+ATTENDEES_PER_EVENT = 25
+
+
+async def load_history(conn, users: int, events: int, duels: int):
+    event_types = sorted(main.WARFARE_EVENT_TYPES | main.TRAINING_EVENT_TYPES | {"gamenight", "other"})
+
+    await conn.execute(
+        "INSERT INTO users (discord_id) SELECT g FROM generate_series(1, $1) AS g;",
+        users,
+    )
+    await conn.execute(
+        """
+        INSERT INTO events (event_type, host_discord_id, cohost_discord_id)
+        SELECT
+            ($2::text[])[1 + (g % array_length($2::text[], 1))],
+            1 + (g::bigint * 7919) % $3,
+            CASE WHEN g % 3 = 0 THEN 1 + (g::bigint * 104729) % $3 END
+        FROM generate_series(1, $1) AS g;
+        """,
+        events,
+        event_types,
+        users,
+    )
+    await conn.execute(
+        """
+        INSERT INTO event_attendance (event_id, user_discord_id)
+        SELECT e, 1 + (e * 31 + a * 7919) % $3
+        FROM generate_series(1, $1) AS e, generate_series(1, $2) AS a;
+        """,
+        events,
+        ATTENDEES_PER_EVENT,
+        users,
+    )
+    await conn.execute(
+        """
+        INSERT INTO duels (winner_discord_id, loser_discord_id)
+        SELECT 1 + (g * 13) % $2, 1 + (g * 17 + 1) % $2
+        FROM generate_series(1, $1) AS g;
+        """,
+        duels,
+        users,
+    )
+    await conn.execute("ANALYZE;")
+
+
+async def measure(user_ids):
+    samples = []
+    for uid in user_ids:
+        with Timer() as t:
+            await main.get_user_stats_single(uid)
+        samples.append(t.ms)
+    return samples
+
+
+async def run(args):
+    url = bench_database_url()
+    await reset_schema(url, SCHEMA)
+    pool = await create_bench_pool(url, SCHEMA, min_size=1, max_size=2)
+
+    try:
+        events = args.attendance // ATTENDEES_PER_EVENT
+        async with pool.acquire() as conn:
+            await apply_migrations(conn, up_to=1)
+            print(f"Loading {events * ATTENDEES_PER_EVENT:,} attendance rows...")
+            with Timer() as t:
+                await load_history(conn, args.users, events, args.duels)
+            print(f"Loaded in {t.ms / 1000:.1f}s\n")
+
+        user_ids = random.Random(42).sample(range(1, args.users + 1), args.samples)
+
+        # Warm the plan/statement caches so both runs compare steady state
+        await measure(user_ids[:10])
+        before = await measure(user_ids)
+
+        async with pool.acquire() as conn:
+            with Timer() as t:
+                await apply_migrations(conn, up_to=2)
+                await conn.execute("ANALYZE;")
+            print(f"Built indexes in {t.ms / 1000:.1f}s\n")
+
+        await measure(user_ids[:10])
+        after = await measure(user_ids)
+
+        print_table({
+            "get_user_stats (no indexes)": before,
+            "get_user_stats (migration 2)": after,
+        })
+    finally:
+        await pool.close()
+        if not args.keep:
+            await drop_schema(url, SCHEMA)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attendance", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--duels", type=int, default=50_000)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
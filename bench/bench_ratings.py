@@ -0,0 +1,154 @@
+"""
+Duel rating engine: full history replay vs incremental updates.
+
+Loads synthetic duels (100k by default) between a pool of players, times
+rebuild_player_ratings replaying all of them through a server-side cursor,
+then times log_duel_result (which updates both ratings incrementally)
+sequentially and with concurrent writers, plus head-to-head lookups.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/covenant_bench \
+        python bench/bench_ratings.py [--duels 100000] [--players 2000] [--samples 1000]
+"""
+
+import argparse
+import asyncio
+import random
+
+from common import (
+    Timer,
+    apply_migrations,
+    bench_database_url,
+    create_bench_pool,
+    drop_schema,
+    main,
+    print_table,
+    reset_schema,
+)
+
+SCHEMA = "bench_ratings"
+
+
+async def load_duels(conn, duels: int, players: int):
+    # Skewed pairings: low ids duel far more often, like a real ladder
+    await conn.execute(
+        """
+        INSERT INTO duels (winner_discord_id, loser_discord_id, timestamp)
+        SELECT w, CASE WHEN l = w THEN 1 + w % $2 ELSE l END, now() - (($1 - g) || ' seconds')::interval
+        FROM (
+            SELECT
+                g,
+                1 + floor($2 * power(random(), 2))::bigint AS w,
+                1 + floor($2 * power(random(), 2))::bigint AS l
+            FROM generate_series(1, $1) AS g
+        ) pairs;
+        """,
+        duels,
+        players,
+    )
+    await conn.execute("ANALYZE duels;")
+
+
+async def timed_calls(coros_factory, count: int, concurrency: int):
+    """Run `count` calls with at most `concurrency` in flight. Returns
+    (latency samples in ms, wall-clock seconds)."""
+    samples = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            with Timer() as t:
+                await coros_factory(i)
+            samples.append(t.ms)
+
+    with Timer() as wall:
+        await asyncio.gather(*(one(i) for i in range(count)))
+    return samples, wall.ms / 1000
+
+
+async def run(args):
+    url = bench_database_url()
+    await reset_schema(url, SCHEMA)
+    pool = await create_bench_pool(url, SCHEMA, min_size=1, max_size=max(2, args.concurrency))
+    rng = random.Random(42)
+
+    try:
+        async with pool.acquire() as conn:
+            await apply_migrations(conn)
+            print(f"Loading {args.duels:,} duels between {args.players:,} players...")
+            with Timer() as t:
+                await load_duels(conn, args.duels, args.players)
+            print(f"Loaded in {t.ms / 1000:.1f}s\n")
+
+        rebuilds = []
+        for _ in range(args.rebuilds):
+            async with pool.acquire() as conn:
+                with Timer() as t:
+                    replayed, rated = await main.rebuild_player_ratings(conn)
+            rebuilds.append(t.ms)
+        print(
+            f"Full replay: {replayed:,} duels, {rated:,} players, "
+            f"{replayed / (min(rebuilds) / 1000):,.0f} duels/s (best of {len(rebuilds)})\n"
+        )
+
+        def random_pair():
+            winner, loser = rng.sample(range(1, args.players + 1), 2)
+            return winner, loser
+
+        pairs = [random_pair() for _ in range(args.samples)]
+        sequential, sequential_s = await timed_calls(
+            lambda i: main.log_duel_result(*pairs[i]), args.samples, 1
+        )
+        concurrent, concurrent_s = await timed_calls(
+            lambda i: main.log_duel_result(*pairs[i]), args.samples, args.concurrency
+        )
+        head_to_head, head_to_head_s = await timed_calls(
+            lambda i: main.get_head_to_head(*pairs[i]), args.samples, 1
+        )
+        rating, rating_s = await timed_calls(
+            lambda i: main.get_player_rating(pairs[i][0]), args.samples, 1
+        )
+
+        concurrent_name = f"log_duel_result (x{args.concurrency})"
+        print_table(
+            {
+                "rebuild_player_ratings": rebuilds,
+                "log_duel_result": sequential,
+                concurrent_name: concurrent,
+                "get_head_to_head": head_to_head,
+                "get_player_rating": rating,
+            },
+            elapsed={
+                "log_duel_result": sequential_s,
+                concurrent_name: concurrent_s,
+                "get_head_to_head": head_to_head_s,
+                "get_player_rating": rating_s,
+            },
+        )
+
+        # The incremental path must land exactly where a full replay does
+        async with pool.acquire() as conn:
+            before = dict(await conn.fetch("SELECT discord_id, rating FROM player_ratings;"))
+            await main.rebuild_player_ratings(conn)
+            after = dict(await conn.fetch("SELECT discord_id, rating FROM player_ratings;"))
+        drift = max((abs(before[k] - after.get(k, 0.0)) for k in before), default=0.0)
+        print(f"\nMax drift between incremental and replayed ratings: {drift:.6f}")
+    finally:
+        await pool.close()
+        if not args.keep:
+            await drop_schema(url, SCHEMA)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duels", type=int, default=100_000)
+    parser.add_argument("--players", type=int, default=2_000)
+    parser.add_argument("--samples", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rebuilds", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,373 @@
+"""
+Interactive workloads replayed through the bot's real views and handlers.
+
+Seeds a guild's worth of members and history into a scratch schema, then
+drives main's code through the fake Discord layer in fake_discord.py:
+
+- progress:    concurrent "View Progress" clicks (cold cache, then warm)
+- log_event:   events with 25 attendees each, logged concurrently, plus the
+               after-event follow-up (promotion digest, receipts); then events
+               and duels logged while their members' stats are being read,
+               checking the stats cache still matches Postgres afterwards
+- quiz_review: reaction storms on pending quiz submissions, with several
+               reviewers racing, duplicates and unauthorized reactions
+
+Each workload reports throughput and latency percentiles per operation,
+followed by the per-query breakdown recorded by main.metrics.
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/covenant_bench \
+        python bench/bench_workloads.py [--members 5000] [--clicks 500] \
+        [--events 200] [--submissions 200] [--only progress,log_event] \
+        [--preset 1m]
+"""
+
+import argparse
+import asyncio
+import random
+
+from common import (
+    Timer,
+    apply_migrations,
+    bench_database_url,
+    create_bench_pool,
+    drop_schema,
+    main,
+    print_table,
+    reset_schema,
+)
+from datagen import PRESETS, load_fixture
+from fake_discord import FakeGuild, FakeInteraction, install, reaction_payload
+
+SCHEMA = "bench_workloads"
+WORKLOADS = ("progress", "log_event", "quiz_review")
+ATTENDEES_PER_EVENT = 25
+BOT_USER_ID = 10 ** 15
+# Quiz submissions are keyed by review message id; keep them clear of members
+SUBMISSION_MESSAGE_BASE = 10 ** 12
+
+
+async def load_history(conn, members: int, events: int, duels: int):
+    event_types = sorted(main.WARFARE_EVENT_TYPES | main.TRAINING_EVENT_TYPES | {"gamenight", "other"})
+
+    await conn.execute(
+        "INSERT INTO users (discord_id) SELECT g FROM generate_series(1, $1) AS g;",
+        members,
+    )
+    await conn.execute(
+        """
+        INSERT INTO events (event_type, host_discord_id, cohost_discord_id, timestamp)
+        SELECT
+            ($2::text[])[1 + (g % array_length($2::text[], 1))],
+            1 + (g::bigint * 7919) % $3,
+            CASE WHEN g % 3 = 0 THEN 1 + (g::bigint * 104729) % $3 END,
+            now() - (($1 - g) || ' minutes')::interval
+        FROM generate_series(1, $1) AS g;
+        """,
+        events,
+        event_types,
+        members,
+    )
+    await conn.execute(
+        """
+        INSERT INTO event_attendance (event_id, user_discord_id, event_type, attended_at)
+        SELECT e.id, 1 + (e.id::bigint * 31 + a * 7919) % $2, e.event_type, e.timestamp
+        FROM events e, generate_series(1, $1) AS a;
+        """,
+        ATTENDEES_PER_EVENT,
+        members,
+    )
+    await conn.execute(
+        """
+        INSERT INTO duels (winner_discord_id, loser_discord_id)
+        SELECT 1 + (g::bigint * 13) % $2, 1 + (g::bigint * 17 + 1) % $2
+        FROM generate_series(1, $1) AS g;
+        """,
+        duels,
+        members,
+    )
+    await main.rebuild_user_stats(conn)
+    await conn.execute("ANALYZE;")
+
+
+def build_guild(members: int, reviewers: int) -> FakeGuild:
+    """Members 1..N spread across every rank; the last `reviewers` of them
+    can review quizzes."""
+    guild = FakeGuild()
+    guild.add_text_channel(main.QUIZ_REVIEW_CHANNEL_ID)
+    guild.add_text_channel(main.PROMOTION_CHANNEL_ID)
+    for discord_id in range(1, members + 1):
+        roles = [main.RANKS[discord_id % len(main.RANKS)].role_id]
+        if discord_id > members - reviewers:
+            roles.append(main.QUIZ_REVIEWER_ROLE_IDS[0])
+        guild.add_member(discord_id, roles)
+    return guild
+
+
+async def timed_gather(calls):
+    """Run every zero-argument coroutine factory at once. Returns
+    (latency samples in ms, wall-clock seconds)."""
+    samples = []
+
+    async def one(call):
+        with Timer() as t:
+            await call()
+        samples.append(t.ms)
+
+    with Timer() as wall:
+        await asyncio.gather(*(one(call) for call in calls))
+    return samples, wall.ms / 1000
+
+
+async def timed_bounded(calls, concurrency: int):
+    """Like timed_gather, with at most `concurrency` calls in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(call):
+        async with semaphore:
+            with Timer() as t:
+                await call()
+            samples.append(t.ms)
+
+    with Timer() as wall:
+        await asyncio.gather(*(one(call) for call in calls))
+    return samples, wall.ms / 1000
+
+
+def print_query_breakdown():
+    """Per-query latencies main.metrics recorded during the last workload."""
+    rows = {
+        name: [seconds * 1000 for seconds in hist.recent]
+        for (kind, name), hist in sorted(main.metrics.histograms.items())
+        if kind == "query"
+    }
+    if rows:
+        print("\nQueries (most recent samples):")
+        print_table(rows)
+
+
+async def run_progress(args, guild: FakeGuild, rng: random.Random):
+    button = main.ProgressButton()
+    clickers = [guild.get_member(rng.randint(1, args.members)) for _ in range(args.clicks)]
+
+    def clicks():
+        return [lambda m=member: button.callback(FakeInteraction(m)) for member in clickers]
+
+    main.stats_cache.clear()
+    cold, cold_s = await timed_gather(clicks())
+    warm, warm_s = await timed_gather(clicks())
+
+    print(f"\n== progress: {args.clicks} concurrent View Progress clicks ==")
+    print_table(
+        {"progress click (cold cache)": cold, "progress click (warm cache)": warm},
+        elapsed={"progress click (cold cache)": cold_s, "progress click (warm cache)": warm_s},
+    )
+
+
+async def run_log_event(args, guild: FakeGuild, rng: random.Random):
+    event_types = sorted(main.WARFARE_EVENT_TYPES | main.TRAINING_EVENT_TYPES)
+    logging_samples, followup_samples = [], []
+    digests_before = guild.outbox.counts["channel_send"]
+
+    async def log_one():
+        host = guild.get_member(rng.randint(1, args.members))
+        attendees = [
+            guild.get_member(uid)
+            for uid in rng.sample(range(1, args.members + 1), ATTENDEES_PER_EVENT)
+        ]
+        event_type = rng.choice(event_types)
+        with Timer() as t:
+            event_id = await main.log_event(event_type, host.id, None, [m.id for m in attendees])
+        logging_samples.append(t.ms)
+        with Timer() as t:
+            await main.after_event_logged(guild, event_id, event_type, host, attendees)
+        followup_samples.append(t.ms)
+
+    total, total_s = await timed_bounded([log_one] * args.events, args.concurrency)
+
+    print(
+        f"\n== log_event: {args.events} events x {ATTENDEES_PER_EVENT} attendees, "
+        f"{args.concurrency} at a time =="
+    )
+    print_table(
+        {
+            "log_event": logging_samples,
+            "after_event_logged": followup_samples,
+            "event end to end": total,
+        },
+        elapsed={"event end to end": total_s},
+    )
+    print(f"Promotion digests posted: {guild.outbox.counts['channel_send'] - digests_before}")
+
+    await check_stats_cache(args, rng)
+
+
+async def check_stats_cache(args, rng: random.Random):
+    """Log events and duels while their members' stats are read (and cached)
+    in a loop, then compare every touched cached entry with Postgres.
+
+    Readers that land between a write's commit and its cache update store the
+    committed row; the write must not be counted a second time on top of it.
+    """
+    event_types = sorted(main.WARFARE_EVENT_TYPES | main.TRAINING_EVENT_TYPES)
+    touched = set()
+
+    async def read_until(done: asyncio.Event, member_ids):
+        while not done.is_set():
+            for uid in member_ids:
+                await main.get_user_stats(uid)
+
+    async def with_readers(write, member_ids):
+        touched.update(member_ids)
+        done = asyncio.Event()
+        readers = [asyncio.create_task(read_until(done, member_ids)) for _ in range(2)]
+        try:
+            await write
+        finally:
+            done.set()
+            await asyncio.gather(*readers)
+
+    async def log_one():
+        member_ids = rng.sample(range(1, args.members + 1), ATTENDEES_PER_EVENT + 1)
+        await with_readers(
+            main.log_event(rng.choice(event_types), member_ids[0], None, member_ids[1:]),
+            member_ids,
+        )
+
+    async def duel_one():
+        winner, loser = rng.sample(range(1, args.members + 1), 2)
+        await with_readers(main.log_duel_result(winner, loser), [winner, loser])
+
+    writes = max(1, args.events // 4)
+    await timed_bounded([log_one] * writes + [duel_one] * writes, args.concurrency)
+
+    fresh = await main.get_bulk_user_stats(sorted(touched))
+    stale = 0
+    for uid in touched:
+        cached = main.stats_cache.get(uid)
+        if cached is not None and cached != fresh[uid]:
+            stale += 1
+    print(
+        f"Stats cache after {writes} events and {writes} duels under concurrent reads: "
+        f"{stale} of {len(touched)} members differ from Postgres"
+    )
+
+
+async def run_quiz_review(args, guild: FakeGuild, rng: random.Random):
+    message_ids = [SUBMISSION_MESSAGE_BASE + i for i in range(args.submissions)]
+    for message_id in message_ids:
+        candidate = rng.randint(1, args.members - args.reviewers)
+        await main.quiz_submissions.add(message_id, candidate, ["bench answer"] * len(main.QUIZ_QUESTIONS))
+
+    # Every submission gets a burst of reactions from reviewers and a few
+    # members without the reviewer role, all delivered at once
+    payloads = []
+    for message_id in message_ids:
+        for _ in range(args.reactions):
+            if rng.random() < 0.2:
+                reactor = guild.get_member(rng.randint(1, args.members - args.reviewers))
+            else:
+                reactor = guild.get_member(rng.randint(args.members - args.reviewers + 1, args.members))
+            emoji = rng.choice(("✅", "❌"))
+            payloads.append(
+                reaction_payload(reactor, main.QUIZ_REVIEW_CHANNEL_ID, message_id, emoji)
+            )
+    rng.shuffle(payloads)
+
+    reactions, reactions_s = await timed_gather(
+        [lambda p=payload: main.on_raw_reaction_add(p) for payload in payloads]
+    )
+
+    print(
+        f"\n== quiz_review: {len(payloads)} reactions on {args.submissions} "
+        f"pending submissions =="
+    )
+    print_table({"review reaction": reactions}, elapsed={"review reaction": reactions_s})
+
+    replies = guild.outbox.replies
+    reviewed = sum(1 for message_id in message_ids if replies[message_id])
+    duplicated = sum(1 for message_id in message_ids if replies[message_id] > 1)
+    print(
+        f"Reviewed: {reviewed}/{args.submissions}, reviewed more than once: {duplicated}, "
+        f"unauthorized reactions removed: {guild.outbox.counts['remove_reaction']}, "
+        f"DMs queued: {len(main.notifications)}"
+    )
+
+
+RUNNERS = {
+    "progress": run_progress,
+    "log_event": run_log_event,
+    "quiz_review": run_quiz_review,
+}
+
+
+async def run(args):
+    url = bench_database_url()
+    await reset_schema(url, SCHEMA)
+    pool = await create_bench_pool(url, SCHEMA, min_size=1, max_size=args.pool_size)
+    rng = random.Random(42)
+
+    try:
+        async with pool.acquire() as conn:
+            await apply_migrations(conn)
+            if args.preset:
+                scale = PRESETS[args.preset]
+                args.members = scale.users
+                print(f"Loading fixture preset {args.preset} {tuple(scale)}...")
+                with Timer() as t:
+                    await load_fixture(conn, scale)
+            else:
+                print(
+                    f"Loading {args.members:,} members, {args.history:,} events "
+                    f"({args.history * ATTENDEES_PER_EVENT:,} attendance rows)..."
+                )
+                with Timer() as t:
+                    await load_history(conn, args.members, args.history, args.history // 2)
+            print(f"Loaded in {t.ms / 1000:.1f}s")
+
+        guild = build_guild(args.members, args.reviewers)
+        install(main.bot, guild, BOT_USER_ID)
+
+        for name in args.only:
+            main.metrics.histograms.clear()
+            await RUNNERS[name](args, guild, rng)
+            print_query_breakdown()
+    finally:
+        await pool.close()
+        if not args.keep:
+            await drop_schema(url, SCHEMA)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=5_000)
+    parser.add_argument("--history", type=int, default=20_000, help="events already logged")
+    parser.add_argument(
+        "--preset",
+        choices=sorted(PRESETS),
+        help="load a datagen.py fixture instead (overrides --members/--history)",
+    )
+    parser.add_argument("--clicks", type=int, default=500)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10, help="events logged at once")
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--reactions", type=int, default=5, help="reactions per submission")
+    parser.add_argument("--reviewers", type=int, default=20)
+    parser.add_argument("--pool-size", type=int, default=main.DB_POOL_MAX_SIZE)
+    parser.add_argument(
+        "--only",
+        type=lambda value: [name.strip() for name in value.split(",") if name.strip()],
+        default=list(WORKLOADS),
+        help=f"comma-separated subset of {','.join(WORKLOADS)}",
+    )
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+    unknown = set(args.only) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workload(s): {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
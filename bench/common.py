@@ -0,0 +1,122 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+The benchmarks talk to a real Postgres server given by BENCH_DATABASE_URL
+(falling back to DATABASE_URL). Each script works inside its own throwaway
+schema, so they are safe to point at a development database - but never at
+production.
+"""
+
+import os
+import sys
+import time
+import statistics
+from typing import Dict, List, Optional, Sequence
+
+import asyncpg
+
+# Make `import main` work when a script is run as `python bench/<script>.py`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+def bench_database_url() -> str:
+    url = os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("Set BENCH_DATABASE_URL to a scratch Postgres database.")
+    return url
+
+
+async def reset_schema(url: str, schema: str):
+    """Drop and recreate `schema` so every run starts from an empty database."""
+    conn = await asyncpg.connect(url)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+        await conn.execute(f"CREATE SCHEMA {schema};")
+    finally:
+        await conn.close()
+
+
+async def drop_schema(url: str, schema: str):
+    conn = await asyncpg.connect(url)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    finally:
+        await conn.close()
+
+
+async def create_bench_pool(url: str, schema: str, **kwargs) -> asyncpg.Pool:
+    """Create a pool whose connections resolve tables inside `schema` and
+    install it as the bot's pool, so main's DB helpers run unmodified."""
+    bench_pool = await asyncpg.create_pool(
+        url, server_settings={**main.DB_SERVER_SETTINGS, "search_path": schema}, **kwargs
+    )
+    main.pool = bench_pool
+    main.stats_cache.clear()
+    return bench_pool
+
+
+async def apply_migrations(conn: asyncpg.Connection, up_to: Optional[int] = None):
+    """Run main.MIGRATIONS statements directly, optionally stopping at `up_to`."""
+    for version, _, statements in main.MIGRATIONS:
+        if up_to is not None and version > up_to:
+            break
+        for statement in statements:
+            if callable(statement):
+                await statement(conn)
+            else:
+                await conn.execute(statement)
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(samples_ms),
+        "mean": statistics.fmean(samples_ms) if samples_ms else 0.0,
+        "p50": percentile(samples_ms, 50),
+        "p95": percentile(samples_ms, 95),
+        "p99": percentile(samples_ms, 99),
+        "max": max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def print_table(rows: Dict[str, List[float]], elapsed: Optional[Dict[str, float]] = None):
+    """Print latency percentiles (ms) per operation, plus throughput when the
+    wall-clock time for an operation is given in `elapsed` (seconds)."""
+    header = f"{'operation':<32}{'n':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    if elapsed:
+        header += f"{'ops/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, samples in rows.items():
+        s = summarize(samples)
+        line = (
+            f"{name:<32}{s['n']:>8}{s['mean']:>10.2f}{s['p50']:>10.2f}"
+            f"{s['p95']:>10.2f}{s['p99']:>10.2f}{s['max']:>10.2f}"
+        )
+        if elapsed:
+            seconds = elapsed.get(name)
+            line += f"{(s['n'] / seconds) if seconds else 0:>10.1f}"
+        print(line)
+
+
+class Timer:
+    """`with Timer() as t: ...` then read `t.ms`."""
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self._start) * 1000
+        return False
@@ -0,0 +1,243 @@
+"""
+Deterministic history fixtures at production-like scale.
+
+Bulk-loads users, events, Zipf-distributed attendance and duels into the
+bot's schema with COPY, then rebuilds the derived tables (user_stats,
+player_ratings) the same way the bot would. The same seed and preset
+always produce the same rows (with the history ending on the day it is
+loaded), so slowdowns can be reproduced and compared across changes.
+
+A few members attend (and host, and duel) far more than the rest, as in a
+real group: who does is drawn from a Zipf distribution over the members
+with exponent --zipf. Events are spread evenly over the last --years years.
+
+Presets are named after the number of event_attendance rows:
+
+    preset   users   events   attendance   duels
+    10k        500      500       ~10k      1,000
+    100k     2,000    5,000      ~100k     10,000
+    1m      10,000   50,000        ~1M    100,000
+    10m     50,000  500,000       ~10M  1,000,000
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://localhost/covenant_bench \
+        python bench/datagen.py --preset 1m [--seed 42] [--schema bench_fixture]
+
+The fixture is left in its schema for other scripts and manual queries
+(SET search_path TO bench_fixture). Other benchmarks can call
+load_fixture() directly.
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, NamedTuple, Tuple
+
+from common import (
+    Timer,
+    apply_migrations,
+    bench_database_url,
+    create_bench_pool,
+    main,
+    reset_schema,
+)
+
+
+class Scale(NamedTuple):
+    users: int
+    events: int
+    duels: int
+
+
+PRESETS = {
+    "10k": Scale(users=500, events=500, duels=1_000),
+    "100k": Scale(users=2_000, events=5_000, duels=10_000),
+    "1m": Scale(users=10_000, events=50_000, duels=100_000),
+    "10m": Scale(users=50_000, events=500_000, duels=1_000_000),
+}
+
+# Attendees per event, drawn uniformly (mean 20)
+EVENT_SIZE = (5, 35)
+COHOST_RATE = 1 / 3
+# Rows handed to each COPY
+COPY_BATCH = 50_000
+
+
+class ZipfSampler:
+    """Draws member ids 1..n where the k-th most active member is picked
+    with weight 1 / k**s. Which id is the k-th most active is shuffled."""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self.rng = rng
+        self.ids = list(range(1, n + 1))
+        rng.shuffle(self.ids)
+        self.cum_weights = list(itertools.accumulate(1 / k ** s for k in range(1, n + 1)))
+
+    def draw(self, k: int) -> List[int]:
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+    def distinct(self, k: int) -> List[int]:
+        """k different members (fewer only if there are not k members)"""
+        k = min(k, len(self.ids))
+        chosen = dict.fromkeys(self.draw(k))
+        while len(chosen) < k:
+            chosen.update(dict.fromkeys(self.draw(k - len(chosen))))
+        return list(chosen)[:k]
+
+
+def spread(count: int, years: float, now: datetime) -> Iterator[datetime]:
+    """`count` timestamps evenly spaced over the last `years` years, oldest
+    first, as naive UTC (the history tables use TIMESTAMP)."""
+    start = now - timedelta(days=365 * years)
+    step = (now - start) / max(count, 1)
+    naive_start = start.replace(tzinfo=None)
+    for i in range(count):
+        yield naive_start + step * i
+
+
+def event_rows(
+    scale: Scale,
+    sampler: ZipfSampler,
+    rng: random.Random,
+    years: float,
+    now: datetime,
+) -> Iterator[Tuple[tuple, List[tuple]]]:
+    """Yield (event row, its attendance rows) in id order."""
+    event_types = sorted(main.WARFARE_EVENT_TYPES) + sorted(main.TRAINING_EVENT_TYPES) + ["gamenight", "other"]
+    for event_id, timestamp in enumerate(spread(scale.events, years, now), start=1):
+        event_type = rng.choice(event_types)
+        host_id, cohost_id = sampler.distinct(2)
+        if rng.random() >= COHOST_RATE:
+            cohost_id = None
+        attendees = sampler.distinct(rng.randint(*EVENT_SIZE))
+        yield (
+            (event_id, event_type, host_id, cohost_id, timestamp),
+            [(event_id, uid, event_type, timestamp) for uid in attendees],
+        )
+
+
+def duel_rows(
+    scale: Scale,
+    sampler: ZipfSampler,
+    years: float,
+    now: datetime,
+) -> Iterator[tuple]:
+    for duel_id, timestamp in enumerate(spread(scale.duels, years, now), start=1):
+        winner_id, loser_id = sampler.distinct(2)
+        yield duel_id, winner_id, loser_id, timestamp
+
+
+async def copy_batched(conn, table: str, columns: List[str], rows: Iterator[tuple]) -> int:
+    copied = 0
+    while True:
+        batch = list(itertools.islice(rows, COPY_BATCH))
+        if not batch:
+            return copied
+        await conn.copy_records_to_table(table, records=batch, columns=columns)
+        copied += len(batch)
+
+
+async def load_fixture(
+    conn,
+    scale: Scale,
+    seed: int = 42,
+    zipf: float = 1.1,
+    years: float = 3.0,
+) -> dict:
+    """Load a fixture into the (migrated, empty) schema on `conn`.
+
+    Returns row counts per table. Timestamps end at the start of today
+    (UTC), so reruns on the same day load identical rows.
+    """
+    rng = random.Random(seed)
+    sampler = ZipfSampler(scale.users, zipf, rng)
+    now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    await conn.copy_records_to_table(
+        "users",
+        records=[(uid,) for uid in range(1, scale.users + 1)],
+        columns=["discord_id"],
+    )
+
+    attendance: List[tuple] = []
+    counts = {"users": scale.users, "events": 0, "event_attendance": 0}
+
+    def events_only() -> Iterator[tuple]:
+        for event, rows in event_rows(scale, sampler, rng, years, now):
+            attendance.extend(rows)
+            yield event
+
+    # Events and their attendance are generated together; attendance is
+    # flushed whenever a batch of events has been copied
+    events = events_only()
+    while True:
+        batch = list(itertools.islice(events, COPY_BATCH // EVENT_SIZE[1]))
+        if not batch:
+            break
+        await conn.copy_records_to_table(
+            "events",
+            records=batch,
+            columns=["id", "event_type", "host_discord_id", "cohost_discord_id", "timestamp"],
+        )
+        await conn.copy_records_to_table(
+            "event_attendance",
+            records=attendance,
+            columns=["event_id", "user_discord_id", "event_type", "attended_at"],
+        )
+        counts["events"] += len(batch)
+        counts["event_attendance"] += len(attendance)
+        attendance.clear()
+
+    counts["duels"] = await copy_batched(
+        conn,
+        "duels",
+        ["id", "winner_discord_id", "loser_discord_id", "timestamp"],
+        duel_rows(scale, sampler, years, now),
+    )
+
+    # Rows were copied with explicit ids; move the sequences past them
+    for table in ("events", "duels"):
+        await conn.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"GREATEST((SELECT MAX(id) FROM {table}), 1));"
+        )
+
+    await main.rebuild_user_stats(conn)
+    await main.rebuild_player_ratings(conn)
+    await conn.execute("ANALYZE;")
+    return counts
+
+
+async def run(args):
+    url = bench_database_url()
+    scale = PRESETS[args.preset]
+    await reset_schema(url, args.schema)
+    pool = await create_bench_pool(url, args.schema, min_size=1, max_size=1)
+
+    try:
+        async with pool.acquire() as conn:
+            await apply_migrations(conn)
+            print(f"Loading preset {args.preset} {tuple(scale)} into schema {args.schema}...")
+            with Timer() as t:
+                counts = await load_fixture(conn, scale, args.seed, args.zipf, args.years)
+            for table, count in counts.items():
+                print(f"  {table:<18}{count:>12,}")
+            print(f"Loaded in {t.ms / 1000:.1f}s")
+    finally:
+        await pool.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS, key=lambda p: PRESETS[p].events), default="1m")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of member activity")
+    parser.add_argument("--years", type=float, default=3.0, help="span of the generated history")
+    parser.add_argument("--schema", default="bench_fixture")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,213 @@
+"""
+A fake Discord gateway for the benchmarks.
+
+Provides just enough Guild, Member, channel, message and Interaction
+behaviour for main's views and event handlers to run unmodified, with
+every outgoing call recorded in an Outbox instead of going to Discord.
+
+Members are real discord.Member objects built on a stub connection state,
+so isinstance checks and properties (roles, mention, display_avatar)
+behave exactly as they do in production.
+"""
+
+import itertools
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+
+import discord
+
+
+class FakeState:
+    """The only part of discord.py's ConnectionState a Member needs."""
+
+    def store_user(self, data) -> discord.User:
+        return discord.User(state=self, data=data)
+
+
+class FakeRole:
+    def __init__(self, role_id: int, position: int = 1):
+        self.id = role_id
+        self.position = position
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+    def __lt__(self, other: "FakeRole") -> bool:
+        return (self.position, self.id) < (other.position, other.id)
+
+
+class Outbox:
+    """Counts every call that would have reached Discord, by kind, and
+    remembers which message each reply was attached to."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.replies: Counter = Counter()
+
+    def record(self, kind: str):
+        self.counts[kind] += 1
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, channel: "FakeTextChannel", message_id: Optional[int] = None):
+        self.channel = channel
+        self.id = message_id if message_id is not None else next(self._ids)
+
+    async def reply(self, *args, **kwargs) -> "FakeMessage":
+        self.channel.guild.outbox.record("reply")
+        self.channel.guild.outbox.replies[self.id] += 1
+        return FakeMessage(self.channel)
+
+    async def edit(self, *args, **kwargs) -> "FakeMessage":
+        self.channel.guild.outbox.record("edit")
+        return self
+
+    async def add_reaction(self, emoji):
+        self.channel.guild.outbox.record("add_reaction")
+
+    async def remove_reaction(self, emoji, member):
+        self.channel.guild.outbox.record("remove_reaction")
+
+
+class FakeTextChannel(discord.TextChannel):
+    """A TextChannel as far as isinstance is concerned; sends are recorded."""
+
+    def __init__(self, guild: "FakeGuild", channel_id: int):
+        self.guild = guild
+        self.id = channel_id
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return FakeMessage(self, message_id)
+
+    async def send(self, *args, **kwargs) -> FakeMessage:
+        self.guild.outbox.record("channel_send")
+        return FakeMessage(self)
+
+
+class FakeMember(discord.Member):
+    async def send(self, *args, **kwargs) -> FakeMessage:
+        self.guild.outbox.record("dm")
+        return FakeMessage(self.guild.dm_channel)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int = 1):
+        self.id = guild_id
+        self.outbox = Outbox()
+        self.default_role = FakeRole(guild_id, position=0)
+        self._state = FakeState()
+        self._members: Dict[int, FakeMember] = {}
+        self._channels: Dict[int, FakeTextChannel] = {}
+        self._roles: Dict[int, FakeRole] = {}
+        self.dm_channel = FakeTextChannel(self, 0)
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    def add_member(self, discord_id: int, role_ids: Iterable[int] = ()) -> FakeMember:
+        member = FakeMember(
+            data={
+                "user": {
+                    "id": str(discord_id),
+                    "username": f"member{discord_id}",
+                    "discriminator": "0",
+                    "avatar": None,
+                    "global_name": None,
+                },
+                "roles": [str(role_id) for role_id in role_ids],
+                "flags": 0,
+            },
+            guild=self,
+            state=self._state,
+        )
+        self._members[discord_id] = member
+        return member
+
+    def add_text_channel(self, channel_id: int) -> FakeTextChannel:
+        channel = self._channels[channel_id] = FakeTextChannel(self, channel_id)
+        return channel
+
+    def get_member(self, discord_id: int) -> Optional[FakeMember]:
+        return self._members.get(discord_id)
+
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return self._channels.get(channel_id)
+
+    def get_role(self, role_id: int) -> FakeRole:
+        role = self._roles.get(role_id)
+        if role is None:
+            role = self._roles[role_id] = FakeRole(role_id, position=len(self._roles) + 1)
+        return role
+
+
+class FakeResponse:
+    def __init__(self, outbox: Outbox):
+        self._outbox = outbox
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, *args, **kwargs):
+        self._done = True
+        self._outbox.record("defer")
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+        self._outbox.record("response")
+
+    async def edit_message(self, *args, **kwargs):
+        self._done = True
+        self._outbox.record("response_edit")
+
+    async def send_modal(self, modal):
+        self._done = True
+        self._outbox.record("modal")
+
+
+class FakeFollowup:
+    def __init__(self, outbox: Outbox):
+        self._outbox = outbox
+
+    async def send(self, *args, **kwargs):
+        self._outbox.record("followup")
+
+
+class FakeInteraction:
+    """A component click by `member`, created now."""
+
+    def __init__(self, member: FakeMember, channel: Optional[FakeTextChannel] = None):
+        self.user = member
+        self.guild = member.guild
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(member.guild.outbox)
+        self.followup = FakeFollowup(member.guild.outbox)
+
+
+def reaction_payload(
+    member: FakeMember,
+    channel_id: int,
+    message_id: int,
+    emoji: str,
+) -> SimpleNamespace:
+    """The fields of a RawReactionActionEvent that on_raw_reaction_add reads."""
+    return SimpleNamespace(
+        user_id=member.id,
+        member=member,
+        guild_id=member.guild.id,
+        channel_id=channel_id,
+        message_id=message_id,
+        emoji=emoji,
+    )
+
+
+def install(bot, guild: FakeGuild, bot_user_id: int):
+    """Point `bot` at the fake guild, as if it had connected to the gateway."""
+    bot._connection.user = SimpleNamespace(id=bot_user_id)
+    bot.get_guild = lambda guild_id: guild if guild_id == guild.id else None
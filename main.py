@@ -1,11 +1,21 @@
 import os
+import json
+import time
+import functools
+import contextlib
+import bisect
 import asyncio
 import logging
-from typing import List, Optional, Dict, Tuple
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Dict, Set, Tuple, Union
 from enum import Enum
 
+# Taken before the third-party imports, which dominate import time
+started_at = time.monotonic()
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import ui
 import asyncpg
 
@@ -19,6 +29,78 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 # Railway Postgres URL (Railway usually sets DATABASE_URL)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Optional read replica. Read-only helpers use it, except for members written
+# in the last READ_AFTER_WRITE_SECONDS, whose reads stay on the primary so
+# they always see their own events, duels and quiz results despite lag.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+READ_AFTER_WRITE_SECONDS = float(os.getenv("READ_AFTER_WRITE_SECONDS", "10"))
+
+# Connection pool tuning (asyncpg defaults in brackets). Size the pool for
+# event surges with the per-query numbers reported by !dbstats.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))  # [10]
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))  # [10]
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # [100]
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "30")) or None  # [no timeout]
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = float(
+    os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300")
+)  # [300]
+
+# How get_user_stats talks to Postgres:
+#   "summary" - primary-key lookup in the user_stats counters table (default)
+#   "single"  - one consolidated aggregate over the raw history tables
+#   "legacy"  - the original one-query-per-counter path
+#   "compare" - read the summary and the aggregate, log any mismatch and
+#               return the summary result
+STATS_QUERY_MODE = os.getenv("STATS_QUERY_MODE", "summary").lower()
+
+# In-process stats cache: max number of users kept, and how long (seconds) an
+# entry may be served before it is re-read from Postgres (0 = no expiry)
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "5000"))
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "600"))
+
+# After connecting, members active in the last CACHE_WARM_DAYS days have
+# their stats preloaded into the cache in the background (0 = off)
+CACHE_WARM_DAYS = int(os.getenv("CACHE_WARM_DAYS", "30"))
+CACHE_WARM_BATCH = 500
+CACHE_WARM_CONCURRENCY = 2
+
+# How often (seconds) leaderboard rankings are rebuilt from Postgres; between
+# refreshes they are kept current in memory by the stat writers
+LEADERBOARD_REFRESH_SECONDS = int(os.getenv("LEADERBOARD_REFRESH_SECONDS", "300"))
+LEADERBOARD_PAGE_SIZE = 10
+
+# Duel ratings (Elo): starting rating and the most points one duel can move
+ELO_INITIAL_RATING = float(os.getenv("ELO_INITIAL_RATING", "1000"))
+ELO_K_FACTOR = float(os.getenv("ELO_K_FACTOR", "32"))
+
+# Seasons for windowed stats and leaderboards: back-to-back periods of
+# SEASON_LENGTH_DAYS counted from SEASON_EPOCH (an ISO date, UTC)
+SEASON_EPOCH = os.getenv("SEASON_EPOCH", "2025-01-01")
+SEASON_LENGTH_DAYS = int(os.getenv("SEASON_LENGTH_DAYS", "90"))
+
+# Run the guild-wide promotion sweep automatically every N hours (0 = only
+# when an officer runs !promotion_sweep)
+PROMOTION_SWEEP_INTERVAL_HOURS = float(os.getenv("PROMOTION_SWEEP_INTERVAL_HOURS", "0"))
+
+# Serve Prometheus metrics at http://METRICS_HOST:METRICS_PORT/metrics
+# (0 = disabled; latency is still recorded for !perf)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "0.0.0.0")
+
+# Background DM delivery: worker count, overall send rate, and how many
+# times a DM is attempted before giving up
+DM_WORKERS = int(os.getenv("DM_WORKERS", "4"))
+DM_SENDS_PER_SECOND = float(os.getenv("DM_SENDS_PER_SECOND", "5"))
+DM_MAX_ATTEMPTS = int(os.getenv("DM_MAX_ATTEMPTS", "4"))
+
+# Log how long each startup stage took (imports, migrations, pools, login,
+# gateway) once the bot is ready
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+# Half-built menu flows (attendance lists, duel reports) survive restarts
+# and are discarded after this many hours
+DRAFT_TTL_HOURS = float(os.getenv("DRAFT_TTL_HOURS", "24"))
+
 # Allowed roles for logging events (officer roles)
 OFFICER_ROLE_IDS = [
     1283223363980103702,  # REPLACE with real officer role IDs
@@ -168,59 +250,172 @@ RANK_REQUIREMENTS = {
     }
 }
 
+# Events that count as warfare (for hosted/attended warfare stats)
+WARFARE_EVENT_TYPES = {"raid", "defense", "scrim"}
+
+# Events that count as training
+TRAINING_EVENT_TYPES = {"training"}
+
+# Quiz questions (placeholders – edit texts as you like)
+QUIZ_QUESTIONS = [
+    "How should you behave during raids, trainings and other Covenant events?",
+    "Explain the Covenant's uniform policy and how it applies to you.",
+    "What is the Covenant's stance on cheating and recording policy?",
+    "Explain the Covenant's policy on toxicity and how it applies to you.",
+    "Do you understand the rules of the Covenant and promise to follow them?",
+]
+
+# =========================
+# RANK ENGINE
+# =========================
+
+# Requirement key -> (stats key, label) for the numeric requirements
+REQUIREMENT_STATS = {
+    "events": ("total_attended", "Events"),
+    "warfare": ("warfare_attended", "Warfare"),
+    "training": ("training_attended", "Training"),
+    "duels": ("duels_won", "Duels"),
+}
+
+
+class RankRequirement:
+    """One rank from RANK_REQUIREMENTS, compiled for fast evaluation.
+
+    `index` is the rank's position in the progression (higher = more
+    senior) and `checks` holds only the (stats key, required) pairs that
+    actually apply, so evaluating a member is one short loop.
+    """
+
+    __slots__ = (
+        "index", "role_id", "current_rank", "next_rank", "note",
+        "events", "warfare", "training", "duels", "quiz", "checks",
+    )
+
+    def __init__(self, index: int, role_id: Optional[int], rank_data: Dict):
+        requirements = rank_data.get("requirements", {})
+        self.index = index
+        self.role_id = role_id
+        self.current_rank = rank_data["current_rank"]
+        self.next_rank = rank_data.get("next_rank")
+        self.note = rank_data.get("note", "")
+        self.events = requirements.get("events", 0)
+        self.warfare = requirements.get("warfare", 0)
+        self.training = requirements.get("training", 0)
+        self.duels = requirements.get("duels", 0)
+        self.quiz = bool(requirements.get("quiz", False))
+        self.checks: Tuple[Tuple[str, int], ...] = tuple(
+            (stat, requirements.get(key, 0))
+            for key, (stat, _) in REQUIREMENT_STATS.items()
+            if requirements.get(key, 0) > 0
+        )
+
+    def is_met(self, stats: Dict[str, int]) -> bool:
+        """True if stats satisfy every requirement for the next rank"""
+        for stat, required in self.checks:
+            if stats[stat] < required:
+                return False
+        return not self.quiz or bool(stats["quiz_passed"])
+
+    def progress(self, stats: Dict[str, int]) -> Tuple[int, int]:
+        """Return (requirements met, requirements total)"""
+        met = sum(1 for stat, required in self.checks if stats[stat] >= required)
+        if self.quiz:
+            met += bool(stats["quiz_passed"])
+        return met, len(self.checks) + self.quiz
+
+    def completed_lines(self, stats: Dict[str, int]) -> List[str]:
+        """Lines like '✅ Events: 5/5' for every requirement this rank has"""
+        labels = {stat: label for stat, label in REQUIREMENT_STATS.values()}
+        lines = [f"✅ {labels[stat]}: {stats[stat]}/{required}" for stat, required in self.checks]
+        if self.quiz:
+            lines.append("✅ Quiz: Passed")
+        return lines
+
+
+def compile_ranks(rank_requirements: Dict[int, Dict]) -> Tuple[RankRequirement, ...]:
+    """Compile RANK_REQUIREMENTS (declared lowest to highest) into records"""
+    return tuple(
+        RankRequirement(index, role_id, rank_data)
+        for index, (role_id, rank_data) in enumerate(rank_requirements.items())
+    )
+
+
+RANKS = compile_ranks(RANK_REQUIREMENTS)
+RANK_INDEX_BY_ROLE: Dict[int, int] = {rank.role_id: rank.index for rank in RANKS}
+
+# Shown to members without any rank role
+UNRANKED = RankRequirement(-1, None, {
+    "current_rank": "Unranked",
+    "next_rank": "Minor III",
+    "requirements": {},
+    "note": "Join us to start your journey!",
+})
+
+
+def resolve_rank(member: discord.Member) -> Optional[RankRequirement]:
+    """Return the member's highest rank in one pass over their roles"""
+    best = max((RANK_INDEX_BY_ROLE.get(role.id, -1) for role in member.roles), default=-1)
+    return RANKS[best] if best >= 0 else None
+
+
+def resolve_ranks(members: List[discord.Member]) -> List[Tuple[discord.Member, RankRequirement]]:
+    """Resolve the highest rank for many members, skipping unranked ones"""
+    resolved = []
+    for member in members:
+        rank = resolve_rank(member)
+        if rank is not None:
+            resolved.append((member, rank))
+    return resolved
+
+
 # Helper to get user's current rank
 def get_user_rank(member: discord.Member) -> Optional[Tuple[int, Dict]]:
     """Returns (role_id, rank_info) for the user's highest rank role, or None"""
-    for role in member.roles:
-        if role.id in RANK_REQUIREMENTS:
-            return (role.id, RANK_REQUIREMENTS[role.id])
-    return None
+    rank = resolve_rank(member)
+    if rank is None:
+        return None
+    return (rank.role_id, RANK_REQUIREMENTS[rank.role_id])
 
 
-async def check_promotion_eligible(member: discord.Member, stats: Dict[str, int], guild: discord.Guild):
+# =========================
+# PROMOTIONS
+# =========================
+
+async def check_promotion_eligible(
+    member: discord.Member,
+    stats: Optional[Dict[str, int]],
+    guild: discord.Guild,
+):
     """Check if user meets requirements for next rank and send notification to HiCom"""
-    rank_info = get_user_rank(member)
-    if not rank_info:
+    rank = resolve_rank(member)
+    if rank is None:
         return
     
-    role_id, rank_data = rank_info
-    next_rank = rank_data.get("next_rank")
+    next_rank = rank.next_rank
     
     # No promotion if at max rank
     if not next_rank:
         return
     
-    requirements = rank_data["requirements"]
-    current_rank = rank_data["current_rank"]
-    
-    # Check if all requirements are met
-    total_att = stats["total_attended"]
-    warfare_att = stats["warfare_attended"]
-    training_att = stats["training_attended"]
-    duels_won = stats["duels_won"]
-    quiz_passed = bool(stats["quiz_passed"])
-    
-    req_events = requirements.get("events", 0)
-    req_warfare = requirements.get("warfare", 0)
-    req_training = requirements.get("training", 0)
-    req_duels = requirements.get("duels", 0)
-    req_quiz = requirements.get("quiz", False)
+    current_rank = rank.current_rank
     
-    # Check each requirement
-    if req_events > 0 and total_att < req_events:
-        return
-    if req_warfare > 0 and warfare_att < req_warfare:
+    # Each rank transition is only announced once
+    notification_key = (member.id, current_rank)
+    if notification_key in promotion_notifications:
         return
-    if req_training > 0 and training_att < req_training:
-        return
-    if req_duels > 0 and duels_won < req_duels:
-        return
-    if req_quiz and not quiz_passed:
+
+    if stats is None:
+        stats = await get_user_stats(member.id)
+    
+    if not rank.is_met(stats):
         return
     
     # All requirements met! Send promotion notification
     promotion_channel = guild.get_channel(PROMOTION_CHANNEL_ID)
     if promotion_channel:
+        if not await promotion_notifications.claim([notification_key]):
+            return
+        
         hicom_role = guild.get_role(HIGH_COMMAND_ROLE_ID)
         ping_text = hicom_role.mention if hicom_role else "@High Command"
         
@@ -235,21 +430,9 @@ async def check_promotion_eligible(member: discord.Member, stats: Dict[str, int]
         )
         
         # Show what they completed
-        requirements_text = []
-        if req_events > 0:
-            requirements_text.append(f"✅ Events: {total_att}/{req_events}")
-        if req_warfare > 0:
-            requirements_text.append(f"✅ Warfare: {warfare_att}/{req_warfare}")
-        if req_training > 0:
-            requirements_text.append(f"✅ Training: {training_att}/{req_training}")
-        if req_duels > 0:
-            requirements_text.append(f"✅ Duels: {duels_won}/{req_duels}")
-        if req_quiz:
-            requirements_text.append(f"✅ Quiz: Passed")
-        
         promotion_embed.add_field(
             name="Completed Requirements",
-            value="\n".join(requirements_text),
+            value="\n".join(rank.completed_lines(stats)),
             inline=False
         )
         
@@ -262,21 +445,76 @@ async def check_promotion_eligible(member: discord.Member, stats: Dict[str, int]
             )
         except Exception as e:
             logger.error(f"Failed to send promotion notification: {e}")
+            await promotion_notifications.release([notification_key])
 
-# Events that count as warfare (for hosted/attended warfare stats)
-WARFARE_EVENT_TYPES = {"raid", "defense", "scrim"}
 
-# Events that count as training
-TRAINING_EVENT_TYPES = {"training"}
+async def find_promotion_candidates(
+    members: List[discord.Member],
+    use_cache: bool = False,
+) -> List[Tuple[discord.Member, RankRequirement, Dict[str, int]]]:
+    """Return (member, rank, stats) for every member ready for promotion.
+
+    Stats for all ranked members come from one get_bulk_user_stats query
+    (only for the cache misses with use_cache); requirements are then
+    checked in memory.
+    """
+    ranked = [
+        (member, rank)
+        for member, rank in resolve_ranks([m for m in members if not m.bot])
+        if rank.next_rank
+    ]
+    if not ranked:
+        return []
+
+    member_ids = [member.id for member, _ in ranked]
+    if use_cache:
+        stats_by_id = await get_cached_bulk_user_stats(member_ids)
+    else:
+        stats_by_id = await get_bulk_user_stats(member_ids)
+
+    return [
+        (member, rank, stats_by_id[member.id])
+        for member, rank in ranked
+        if rank.is_met(stats_by_id[member.id])
+    ]
+
+
+async def post_promotion_digest(
+    guild: discord.Guild,
+    candidates: List[Tuple[discord.Member, RankRequirement, Dict[str, int]]],
+    title: str = "🎉 Promotions Ready",
+) -> List[Tuple[discord.Member, RankRequirement, Dict[str, int]]]:
+    """Announce promotion-ready members to HiCom in as few messages as possible.
+
+    Members whose transition was already announced are skipped. Returns the
+    candidates that were newly announced.
+    """
+    promotion_channel = guild.get_channel(PROMOTION_CHANNEL_ID)
+    if not promotion_channel or not candidates:
+        return []
+
+    keys = [(member.id, rank.current_rank) for member, rank, _ in candidates]
+    claimed = await promotion_notifications.claim(keys)
+    new_candidates = [
+        candidate for candidate, key in zip(candidates, keys) if key in claimed
+    ]
+    if not new_candidates:
+        return []
+
+    hicom_role = guild.get_role(HIGH_COMMAND_ROLE_ID)
+    ping_text = hicom_role.mention if hicom_role else "@High Command"
+
+    try:
+        for i, embed in enumerate(create_promotion_digest_embeds(new_candidates, title)):
+            # Only the first message pings
+            await promotion_channel.send(content=ping_text if i == 0 else None, embed=embed)
+    except Exception as e:
+        logger.error(f"Failed to send promotion digest: {e}")
+        await promotion_notifications.release(list(claimed))
+        return []
+
+    return new_candidates
 
-# Quiz questions (placeholders – edit texts as you like)
-QUIZ_QUESTIONS = [
-    "How should you behave during raids, trainings and other Covenant events?",
-    "Explain the Covenant's uniform policy and how it applies to you.",
-    "What is the Covenant's stance on cheating and recording policy?",
-    "Explain the Covenant's policy on toxicity and how it applies to you.",
-    "Do you understand the rules of the Covenant and promise to follow them?",
-]
 
 # =========================
 # LOGGING
@@ -302,24 +540,239 @@ bot = commands.Bot(
 )
 
 # =========================
-# POSTGRES / ASYNCPG
+# METRICS
 # =========================
 
-pool: Optional[asyncpg.Pool] = None
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 
+# How many recent samples per operation are kept for the p50/p95/p99 in !perf
+LATENCY_SAMPLE_WINDOW = 1024
 
-async def init_db():
-    global pool
-    if not DATABASE_URL:
-        raise RuntimeError("DATABASE_URL environment variable not set.")
 
-    # On Railway, this should work directly. If SSL is required:
-    # pool = await asyncpg.create_pool(DATABASE_URL, ssl="require")
-    pool = await asyncpg.create_pool(DATABASE_URL)
+class LatencyHistogram:
+    """Bucketed latency counts plus a window of recent samples for percentiles"""
 
-    async with pool.acquire() as conn:
-        # Users table
-        await conn.execute(
+    __slots__ = ("counts", "count", "total", "errors", "recent")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.recent = deque(maxlen=LATENCY_SAMPLE_WINDOW)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        if index < len(self.counts):
+            self.counts[index] += 1
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile (seconds) of the recent samples"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class Metrics:
+    """Latency histograms keyed by (kind, operation), exported for Prometheus.
+
+    Kinds group operations by layer: "command", "view", "query", "db",
+    "discord_api" and "pool". Values owned by other components (pool size,
+    cache hits) are registered as callbacks and read at scrape time.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.collectors: Dict[str, Tuple[str, str, Callable[[], float]]] = {}
+
+    def histogram(self, kind: str, name: str) -> LatencyHistogram:
+        key = (kind, name)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        return hist
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool = False):
+        hist = self.histogram(kind, name)
+        hist.observe(seconds)
+        if error:
+            hist.errors += 1
+
+    def collect(self, name: str, help_text: str, read: Callable[[], float], metric_type: str = "gauge"):
+        self.collectors[name] = (metric_type, help_text, read)
+
+    def timed(self, kind: str, name: str) -> "Timed":
+        return Timed(self, kind, name)
+
+    def instrument(self, kind: str, name: Optional[str] = None):
+        """Decorator that times every call of an async function"""
+
+        def decorator(func):
+            op = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with Timed(self, kind, op):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP covenant_operation_duration_seconds Latency of instrumented operations",
+            "# TYPE covenant_operation_duration_seconds histogram",
+        ]
+        for (kind, name), hist in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",op="{name}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, hist.counts):
+                cumulative += count
+                lines.append(
+                    f'covenant_operation_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'covenant_operation_duration_seconds_bucket{{{labels},le="+Inf"}} {hist.count}'
+            )
+            lines.append(f"covenant_operation_duration_seconds_sum{{{labels}}} {hist.total}")
+            lines.append(f"covenant_operation_duration_seconds_count{{{labels}}} {hist.count}")
+
+        lines.append("# HELP covenant_operation_errors_total Instrumented operations that raised")
+        lines.append("# TYPE covenant_operation_errors_total counter")
+        for (kind, name), hist in sorted(self.histograms.items()):
+            lines.append(f'covenant_operation_errors_total{{kind="{kind}",op="{name}"}} {hist.errors}')
+
+        for metric_name, (metric_type, help_text, read) in sorted(self.collectors.items()):
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric_name} {help_text}")
+            lines.append(f"# TYPE {metric_name} {metric_type}")
+            lines.append(f"{metric_name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class Timed:
+    """`async with metrics.timed(kind, name):` records the block's latency"""
+
+    __slots__ = ("metrics", "kind", "name", "started")
+
+    def __init__(self, metrics: Metrics, kind: str, name: str):
+        self.metrics = metrics
+        self.kind = kind
+        self.name = name
+        self.started = 0.0
+
+    async def __aenter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.metrics.observe(
+            self.kind, self.name, time.perf_counter() - self.started, error=exc_type is not None
+        )
+        return False
+
+
+metrics = Metrics()
+
+
+def record_interaction_ack(interaction: discord.Interaction, name: str):
+    """Record how long after the click Discord received our first response"""
+    delay = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    metrics.observe("view", f"{name}_ack", max(delay, 0.0))
+
+
+class StartupProfile:
+    """Wall-clock time of each startup stage, measured from `started_at`.
+
+    Stages may overlap (the database and the Discord login start together),
+    so the report lists each one and the total until ready. Stages are also
+    recorded under the "startup" metrics kind for !perf.
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self.stages: List[Tuple[str, float]] = []
+        self._open: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+        metrics.observe("startup", name, seconds)
+
+    def begin(self, name: str):
+        self._open[name] = time.monotonic()
+
+    def end(self, name: str):
+        began = self._open.pop(name, None)
+        if began is not None:
+            self.record(name, time.monotonic() - began)
+
+    @contextlib.asynccontextmanager
+    async def stage(self, name: str):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    async def run(self, name: str, coro):
+        async with self.stage(name):
+            return await coro
+
+    def report(self) -> str:
+        lines = [f"{name:<20}{seconds * 1000:>9.1f} ms" for name, seconds in self.stages]
+        lines.append(f"{'ready after':<20}{(time.monotonic() - self.started) * 1000:>9.1f} ms")
+        return "Startup profile:\n" + "\n".join(lines)
+
+
+startup = StartupProfile(started_at)
+
+
+async def start_metrics_server(host: str, port: int):
+    """Serve metrics.render_prometheus() at http://host:port/metrics"""
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(
+            text=metrics.render_prometheus(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+    return runner
+
+
+# =========================
+# SCHEMA MIGRATIONS
+# =========================
+
+# Ordered (version, description, steps). A step is either an SQL string or an
+# async callable taking the connection. Append new steps at the end; never
+# edit or reorder a migration that has already shipped.
+MigrationStep = Union[str, Callable[[asyncpg.Connection], Any]]
+
+MIGRATIONS: List[Tuple[int, str, List[MigrationStep]]] = [
+    (
+        1,
+        "initial schema",
+        [
+            # Users table
             """
             CREATE TABLE IF NOT EXISTS users (
                 id SERIAL PRIMARY KEY,
@@ -327,11 +780,8 @@ async def init_db():
                 roblox_user_id BIGINT,
                 quiz_passed BOOLEAN DEFAULT FALSE
             );
-            """
-        )
-
-        # Events table
-        await conn.execute(
+            """,
+            # Events table
             """
             CREATE TABLE IF NOT EXISTS events (
                 id SERIAL PRIMARY KEY,
@@ -340,22 +790,16 @@ async def init_db():
                 cohost_discord_id BIGINT,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
-            """
-        )
-
-        # Attendance table
-        await conn.execute(
+            """,
+            # Attendance table
             """
             CREATE TABLE IF NOT EXISTS event_attendance (
                 id SERIAL PRIMARY KEY,
                 event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
                 user_discord_id BIGINT NOT NULL
             );
-            """
-        )
-
-        # Duels table
-        await conn.execute(
+            """,
+            # Duels table
             """
             CREATE TABLE IF NOT EXISTS duels (
                 id SERIAL PRIMARY KEY,
@@ -363,149 +807,1478 @@ async def init_db():
                 loser_discord_id BIGINT NOT NULL,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            """,
+        ],
+    ),
+    (
+        2,
+        "lookup indexes for attendance, events and duels",
+        [
             """
-        )
-
-    logger.info("Postgres database initialized.")
-
-
-# =========================
-# DATABASE HELPERS
-# =========================
-
-async def ensure_user(discord_id: int):
-    """Ensure a user row exists for this Discord ID."""
-    async with pool.acquire() as conn:
-        await conn.execute(
+            CREATE INDEX IF NOT EXISTS idx_event_attendance_user_event
+            ON event_attendance (user_discord_id, event_id);
+            """,
             """
-            INSERT INTO users (discord_id)
-            VALUES ($1)
-            ON CONFLICT (discord_id) DO NOTHING;
+            CREATE INDEX IF NOT EXISTS idx_events_host
+            ON events (host_discord_id) INCLUDE (event_type);
             """,
-            discord_id,
-        )
-
-
-async def set_quiz_passed(discord_id: int, passed: bool):
-    await ensure_user(discord_id)
-    async with pool.acquire() as conn:
-        await conn.execute(
             """
-            UPDATE users
-            SET quiz_passed = $1
-            WHERE discord_id = $2;
+            CREATE INDEX IF NOT EXISTS idx_events_cohost
+            ON events (cohost_discord_id) INCLUDE (event_type);
             """,
-            passed,
-            discord_id,
-        )
-
-
-async def get_quiz_passed(discord_id: int) -> bool:
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow(
             """
-            SELECT quiz_passed
-            FROM users
-            WHERE discord_id = $1;
+            CREATE INDEX IF NOT EXISTS idx_events_event_type
+            ON events (event_type);
             """,
-            discord_id,
-        )
-
-    if not row:
-        return False
-    return bool(row["quiz_passed"])
-
-
-async def log_event(
-    event_type: str,
-    host_id: int,
-    cohost_id: Optional[int],
-    attendee_ids: List[int],
-) -> int:
-    """Create an event and event_attendance rows. Returns event_id."""
-    # Deduplicate attendees
-    unique_attendees = list(dict.fromkeys(attendee_ids))
-
-    async with pool.acquire() as conn:
-        # Ensure host/cohost/users exist
-        await ensure_user(host_id)
-        if cohost_id:
-            await ensure_user(cohost_id)
-        for uid in unique_attendees:
-            await ensure_user(uid)
-
-        row = await conn.fetchrow(
             """
-            INSERT INTO events (event_type, host_discord_id, cohost_discord_id)
-            VALUES ($1, $2, $3)
-            RETURNING id;
+            CREATE INDEX IF NOT EXISTS idx_duels_winner
+            ON duels (winner_discord_id);
             """,
-            event_type,
-            host_id,
-            cohost_id,
-        )
-        event_id = row["id"]
-
-        for uid in unique_attendees:
-            await conn.execute(
-                """
-                INSERT INTO event_attendance (event_id, user_discord_id)
-                VALUES ($1, $2);
-                """,
-                event_id,
-                uid,
-            )
-
-    return event_id
-
-
-async def log_duel_result(winner_id: int, loser_id: int):
-    async with pool.acquire() as conn:
-        await ensure_user(winner_id)
-        await ensure_user(loser_id)
-        await conn.execute(
+        ],
+    ),
+    (
+        3,
+        "user_stats counters table",
+        [
             """
-            INSERT INTO duels (winner_discord_id, loser_discord_id)
-            VALUES ($1, $2);
+            CREATE TABLE IF NOT EXISTS user_stats (
+                discord_id BIGINT PRIMARY KEY,
+                total_hosted INTEGER NOT NULL DEFAULT 0,
+                warfare_hosted INTEGER NOT NULL DEFAULT 0,
+                total_attended INTEGER NOT NULL DEFAULT 0,
+                warfare_attended INTEGER NOT NULL DEFAULT 0,
+                training_attended INTEGER NOT NULL DEFAULT 0,
+                duels_won INTEGER NOT NULL DEFAULT 0
+            );
             """,
-            winner_id,
-            loser_id,
-        )
-
-
-async def get_user_stats(discord_id: int) -> Dict[str, int]:
-    await ensure_user(discord_id)
-
-    async with pool.acquire() as conn:
-        # Total hosted
-        total_hosted = await conn.fetchval(
+            # Backfill from the existing history
+            lambda conn: rebuild_user_stats(conn),
+        ],
+    ),
+    (
+        4,
+        "promotion notification log",
+        [
             """
-            SELECT COUNT(*) FROM events
-            WHERE host_discord_id = $1 OR cohost_discord_id = $1;
+            CREATE TABLE IF NOT EXISTS promotion_notifications (
+                member_discord_id BIGINT NOT NULL,
+                from_rank TEXT NOT NULL,
+                notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (member_discord_id, from_rank)
+            );
             """,
-            discord_id,
-        )
-
-        # Warfare hosted
-        warfare_hosted = await conn.fetchval(
+        ],
+    ),
+    (
+        5,
+        "quiz submissions",
+        [
             """
-            SELECT COUNT(*) FROM events
-            WHERE (host_discord_id = $1 OR cohost_discord_id = $1)
-              AND event_type = ANY($2::text[]);
+            CREATE TABLE IF NOT EXISTS quiz_submissions (
+                review_message_id BIGINT PRIMARY KEY,
+                candidate_discord_id BIGINT NOT NULL,
+                answers TEXT[] NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                reviewer_discord_id BIGINT,
+                submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                reviewed_at TIMESTAMP
+            );
             """,
-            discord_id,
-            list(WARFARE_EVENT_TYPES),
-        )
-
-        # Total attended
-        total_attended = await conn.fetchval(
             """
-            SELECT COUNT(*)
-            FROM event_attendance
-            WHERE user_discord_id = $1;
+            CREATE INDEX IF NOT EXISTS idx_quiz_submissions_pending
+            ON quiz_submissions (review_message_id)
+            WHERE status = 'pending';
             """,
-            discord_id,
-        )
+        ],
+    ),
+    (
+        6,
+        "attendance receipt opt-in",
+        [
+            """
+            ALTER TABLE users
+            ADD COLUMN IF NOT EXISTS attendance_receipts BOOLEAN NOT NULL DEFAULT FALSE;
+            """,
+        ],
+    ),
+    (
+        7,
+        "menu flow drafts",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS ui_drafts (
+                owner_discord_id BIGINT NOT NULL,
+                kind TEXT NOT NULL,
+                state JSONB NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (owner_discord_id, kind)
+            );
+            """,
+        ],
+    ),
+    (
+        8,
+        "quiz sessions",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS quiz_sessions (
+                discord_id BIGINT PRIMARY KEY,
+                guild_id BIGINT NOT NULL,
+                question_index INTEGER NOT NULL DEFAULT 0,
+                answers TEXT[] NOT NULL DEFAULT '{}',
+                pending_answer TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """,
+        ],
+    ),
+    (
+        9,
+        "duel challenges",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS duel_challenges (
+                id SERIAL PRIMARY KEY,
+                channel_id BIGINT NOT NULL,
+                message_id BIGINT,
+                challenger_id BIGINT NOT NULL,
+                opponent_id BIGINT NOT NULL,
+                supervisor_id BIGINT,
+                duel_link TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                expires_at TIMESTAMPTZ NOT NULL,
+                resolved_at TIMESTAMPTZ
+            );
+            """,
+            # One open challenge per player per channel, so a "yes" is never ambiguous
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_duel_challenges_open
+            ON duel_challenges (channel_id, opponent_id)
+            WHERE status = 'pending';
+            """,
+        ],
+    ),
+    (
+        10,
+        "duel ratings",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS player_ratings (
+                discord_id BIGINT PRIMARY KEY,
+                rating DOUBLE PRECISION NOT NULL,
+                wins INTEGER NOT NULL DEFAULT 0,
+                losses INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_player_ratings_rating
+            ON player_ratings (rating);
+            """,
+            """
+            ALTER TABLE duels ADD COLUMN IF NOT EXISTS rating_change DOUBLE PRECISION;
+            """,
+            # Head-to-head lookups
+            """
+            CREATE INDEX IF NOT EXISTS idx_duels_pair
+            ON duels (winner_discord_id, loser_discord_id);
+            """,
+            # Backfill from the existing history
+            lambda conn: rebuild_player_ratings(conn),
+        ],
+    ),
+    (
+        11,
+        "time-windowed stats",
+        [
+            """
+            ALTER TABLE users ADD COLUMN IF NOT EXISTS promoted_at TIMESTAMPTZ;
+            """,
+            # Attendance rows carry their event's type and time, so a windowed
+            # count is an index-only range scan with no join to events
+            """
+            ALTER TABLE event_attendance
+            ADD COLUMN IF NOT EXISTS event_type TEXT,
+            ADD COLUMN IF NOT EXISTS attended_at TIMESTAMP;
+            """,
+            """
+            UPDATE event_attendance ea
+            SET event_type = e.event_type, attended_at = e.timestamp
+            FROM events e
+            WHERE e.id = ea.event_id;
+            """,
+            """
+            ALTER TABLE event_attendance ALTER COLUMN attended_at SET DEFAULT CURRENT_TIMESTAMP;
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_event_attendance_user_time
+            ON event_attendance (user_discord_id, attended_at) INCLUDE (event_type);
+            """,
+            # Per-user windows over hosting and duels; these supersede the
+            # single-column indexes from migration 2
+            """
+            CREATE INDEX IF NOT EXISTS idx_events_host_time
+            ON events (host_discord_id, timestamp) INCLUDE (event_type);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_events_cohost_time
+            ON events (cohost_discord_id, timestamp) INCLUDE (event_type);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_duels_winner_time
+            ON duels (winner_discord_id, timestamp);
+            """,
+            "DROP INDEX IF EXISTS idx_events_host;",
+            "DROP INDEX IF EXISTS idx_events_cohost;",
+            "DROP INDEX IF EXISTS idx_duels_winner;",
+            # Guild-wide windows (leaderboards). Attendance and duel rows are
+            # appended in time order, so BRIN ranges stay tight and tiny
+            """
+            CREATE INDEX IF NOT EXISTS idx_events_timestamp
+            ON events (timestamp);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_event_attendance_attended_at_brin
+            ON event_attendance USING BRIN (attended_at);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_duels_timestamp_brin
+            ON duels USING BRIN (timestamp);
+            """,
+        ],
+    ),
+]
+
+# Arbitrary key for the advisory lock that serializes migrations when more
+# than one bot process starts at the same time
+MIGRATION_LOCK_ID = 7_461_203
+
+
+async def get_schema_version(conn: asyncpg.Connection) -> int:
+    """Return the highest applied migration version (0 on a fresh database)."""
+    exists = await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL;")
+    if not exists:
+        return 0
+    return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+
+
+async def run_migrations(conn: asyncpg.Connection) -> int:
+    """Apply any pending MIGRATIONS in order. Safe to run on every startup.
+
+    Each migration runs in its own transaction under an advisory lock and is
+    recorded in schema_version, so a partially applied step is rolled back
+    and concurrent starters never apply the same step twice. When the schema
+    is already current this is two catalog reads and no DDL or locking.
+    """
+    latest = MIGRATIONS[-1][0]
+    current = await get_schema_version(conn)
+    if current >= latest:
+        return current
+
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+    )
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1);", MIGRATION_LOCK_ID)
+            applied = await conn.fetchval(
+                "SELECT 1 FROM schema_version WHERE version = $1;", version
+            )
+            if applied:
+                continue
+
+            for statement in statements:
+                if callable(statement):
+                    await statement(conn)
+                else:
+                    await conn.execute(statement)
+            await conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES ($1, $2);",
+                version,
+                description,
+            )
+        logger.info(f"Applied migration {version}: {description}")
+
+    return latest
+
+
+# =========================
+# POSTGRES / ASYNCPG
+# =========================
+
+pool: Optional[asyncpg.Pool] = None
+# Read replica pool (DATABASE_READ_URL), or None when every read uses `pool`
+read_pool: Optional[asyncpg.Pool] = None
+
+
+@contextlib.asynccontextmanager
+async def acquire_connection(replica: bool = False):
+    """pool.acquire() that records how long the caller waited for a connection.
+
+    `replica` takes the connection from the read pool instead; callers decide
+    with `reads_from_replica` / `split_reads`.
+    """
+    started = time.perf_counter()
+    source, wait = (read_pool, "read_acquire_wait") if replica else (pool, "acquire_wait")
+    async with source.acquire() as conn:
+        metrics.observe("pool", wait, time.perf_counter() - started)
+        yield conn
+
+
+class StickyPrimary:
+    """Members written in the last `window` seconds, whose reads stay on the
+    primary until the replica has caught up.
+
+    Entries are kept in expiry order (a re-marked member moves to the end),
+    so pruning only ever looks at the front.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._until: "OrderedDict[int, float]" = OrderedDict()
+        self.stats = {"replica": 0, "primary": 0}
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+    def mark(self, discord_ids: List[Optional[int]]):
+        now = time.monotonic()
+        until = now + self.window
+        for discord_id in discord_ids:
+            if discord_id is None:
+                continue
+            self._until[discord_id] = until
+            self._until.move_to_end(discord_id)
+        while self._until:
+            discord_id, expires = next(iter(self._until.items()))
+            if expires > now:
+                break
+            del self._until[discord_id]
+
+    def is_sticky(self, discord_id: int) -> bool:
+        expires = self._until.get(discord_id)
+        return expires is not None and expires > time.monotonic()
+
+
+sticky_primary = StickyPrimary(READ_AFTER_WRITE_SECONDS)
+
+
+def reads_from_replica(*discord_ids: int) -> bool:
+    """True if a read of these members' data can go to the replica"""
+    replica = read_pool is not None and not any(
+        sticky_primary.is_sticky(discord_id) for discord_id in discord_ids
+    )
+    sticky_primary.stats["replica" if replica else "primary"] += 1
+    return replica
+
+
+def split_reads(discord_ids: List[int]) -> List[Tuple[bool, List[int]]]:
+    """Split a bulk read into (replica, ids) groups: recently written members
+    on the primary, everyone else on the replica. Empty groups are dropped."""
+    if read_pool is None:
+        return [(False, discord_ids)] if discord_ids else []
+    primary = [uid for uid in discord_ids if sticky_primary.is_sticky(uid)]
+    if not primary:
+        replica = discord_ids
+    else:
+        fresh = set(primary)
+        replica = [uid for uid in discord_ids if uid not in fresh]
+    return [(flag, ids) for flag, ids in ((False, primary), (True, replica)) if ids]
+
+
+class Query:
+    """A named SQL statement that records how often and how long it runs"""
+
+    __slots__ = ("name", "sql", "calls", "errors", "total_ms", "max_ms")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    async def execute(self, conn: asyncpg.Connection, *args):
+        return await self._run(conn.execute, args)
+
+    async def fetch(self, conn: asyncpg.Connection, *args):
+        return await self._run(conn.fetch, args)
+
+    async def fetchrow(self, conn: asyncpg.Connection, *args):
+        return await self._run(conn.fetchrow, args)
+
+    async def fetchval(self, conn: asyncpg.Connection, *args):
+        return await self._run(conn.fetchval, args)
+
+    async def _run(self, method, args):
+        started = time.perf_counter()
+        try:
+            return await method(self.sql, *args)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            elapsed_ms = elapsed * 1000
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            metrics.observe("query", self.name, elapsed)
+
+
+class QueryRegistry:
+    """Every runtime SQL statement the bot issues, by name.
+
+    Statements are prepared by asyncpg's per-connection statement cache the
+    first time each connection runs them, so the cache should hold all of
+    them. Per-query stats are shown by !dbstats.
+    """
+
+    def __init__(self):
+        self._queries: Dict[str, Query] = {}
+
+    def __iter__(self):
+        return iter(self._queries.values())
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def register(self, name: str, sql: str) -> Query:
+        if name in self._queries:
+            raise ValueError(f"Query {name!r} is already registered")
+        query = Query(name, sql)
+        self._queries[name] = query
+        return query
+
+
+queries = QueryRegistry()
+
+# The history tables store TIMESTAMP (no zone) filled by CURRENT_TIMESTAMP,
+# and windows are bound as aware UTC datetimes. Comparing the two converts
+# through the session TimeZone, so pin it to UTC on every connection.
+DB_SERVER_SETTINGS = {"timezone": "UTC"}
+
+
+async def create_db_pool(dsn: str) -> asyncpg.Pool:
+    """Create a pool with the configured sizing and statement cache"""
+    if DB_STATEMENT_CACHE_SIZE < len(queries):
+        logger.warning(
+            f"DB_STATEMENT_CACHE_SIZE ({DB_STATEMENT_CACHE_SIZE}) is smaller than the "
+            f"{len(queries)} registered queries; prepared statements will be evicted."
+        )
+
+    # On Railway, this should work directly. If SSL is required, add ssl="require"
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        server_settings=DB_SERVER_SETTINGS,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+    )
+
+
+async def load_state(conn: asyncpg.Connection):
+    """Fill the in-memory mirrors of the small state tables"""
+    await promotion_notifications.load(conn)
+    await quiz_submissions.load(conn)
+    await attendance_receipts.load(conn)
+    await drafts.load(conn)
+    await quiz_sessions.load(conn)
+    await challenges.load(conn)
+
+
+async def create_read_pool() -> Optional[asyncpg.Pool]:
+    if not DATABASE_READ_URL:
+        return None
+    async with startup.stage("db_read_pool"):
+        return await create_db_pool(DATABASE_READ_URL)
+
+
+async def init_db():
+    global pool, read_pool
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL environment variable not set.")
+
+    # Migrate on a standalone connection first, so no pooled connection
+    # ever sees a half-migrated schema
+    async with startup.stage("db_connect"):
+        conn = await asyncpg.connect(DATABASE_URL, server_settings=DB_SERVER_SETTINGS)
+    try:
+        async with startup.stage("migrations"):
+            version = await run_migrations(conn)
+
+        # The pools connect while the state is loaded over the migration
+        # connection
+        pool, read_pool, _ = await asyncio.gather(
+            startup.run("db_pool", create_db_pool(DATABASE_URL)),
+            create_read_pool(),
+            startup.run("load_state", load_state(conn)),
+        )
+    finally:
+        await conn.close()
+
+    metrics.collect("covenant_db_pool_size", "Open pool connections", pool.get_size)
+    metrics.collect("covenant_db_pool_idle", "Idle pool connections", pool.get_idle_size)
+
+    if read_pool is not None:
+        metrics.collect(
+            "covenant_db_read_pool_size", "Open read replica connections", read_pool.get_size
+        )
+        metrics.collect(
+            "covenant_db_read_pool_idle", "Idle read replica connections", read_pool.get_idle_size
+        )
+        metrics.collect(
+            "covenant_db_reads_on_replica",
+            "Reads routed to the replica",
+            lambda: sticky_primary.stats["replica"],
+            "counter",
+        )
+        metrics.collect(
+            "covenant_db_reads_on_primary",
+            "Reads kept on the primary (no replica, or read-after-write)",
+            lambda: sticky_primary.stats["primary"],
+            "counter",
+        )
+
+    logger.info(
+        f"Postgres database initialized (schema version {version}, "
+        f"pool {DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE}, {len(queries)} registered queries"
+        f"{', read replica enabled' if read_pool else ''})."
+    )
+
+
+# =========================
+# STATS CACHE
+# =========================
+
+class StatsCache:
+    """Bounded LRU cache of get_user_stats results, keyed by discord_id.
+
+    After their transaction commits, the counter writers (log_event,
+    log_duel_result) invalidate the users they wrote, and set_quiz_passed
+    overwrites the cached flag. Each of these stamps the user with a new
+    `generation`. A reader passes the generation it saw before reading to
+    `put`, which drops the result if the user was stamped since: it may
+    predate the write. Applying deltas to cached entries instead would
+    count a write twice when a reader that saw the committed row stores it
+    before the delta lands.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl or None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, int]]]" = OrderedDict()
+        # Generation each recently written user was last stamped at, oldest
+        # first. Stamps dropped to bound it raise `_floor` instead, which
+        # rejects every read that started before them.
+        self._stamps: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, discord_id: int) -> Optional[Dict[str, int]]:
+        entry = self._entries.get(discord_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, stats = entry
+        if self.ttl and time.monotonic() - stored_at > self.ttl:
+            del self._entries[discord_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(discord_id)
+        self.hits += 1
+        return dict(stats)
+
+    def put(self, discord_id: int, stats: Dict[str, int], generation: Optional[int] = None):
+        if self.max_size <= 0:
+            return
+        if generation is not None and (
+            generation < self._floor or generation < self._stamps.get(discord_id, 0)
+        ):
+            return
+
+        self._entries[discord_id] = (time.monotonic(), dict(stats))
+        self._entries.move_to_end(discord_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, discord_id: int, **fields: int):
+        """Overwrite fields of a cached entry (no-op if the user isn't cached)."""
+        self._stamp(discord_id)
+        entry = self._entries.get(discord_id)
+        if entry is None:
+            return
+        entry[1].update(fields)
+
+    def invalidate(self, discord_id: int):
+        self._stamp(discord_id)
+        self._entries.pop(discord_id, None)
+
+    def clear(self):
+        self.generation += 1
+        self._floor = self.generation
+        self._stamps.clear()
+        self._entries.clear()
+
+    def _stamp(self, discord_id: int):
+        self.generation += 1
+        self._stamps[discord_id] = self.generation
+        self._stamps.move_to_end(discord_id)
+        while len(self._stamps) > max(self.max_size, 1):
+            _, stamped_at = self._stamps.popitem(last=False)
+            self._floor = stamped_at
+
+
+stats_cache = StatsCache(STATS_CACHE_SIZE, STATS_CACHE_TTL)
+metrics.collect("covenant_stats_cache_entries", "Users held in the stats cache", lambda: len(stats_cache))
+metrics.collect(
+    "covenant_stats_cache_hits_total", "Stats cache hits", lambda: stats_cache.hits, "counter"
+)
+metrics.collect(
+    "covenant_stats_cache_misses_total", "Stats cache misses", lambda: stats_cache.misses, "counter"
+)
+
+
+PROMOTION_NOTIFICATIONS_LOAD = queries.register("promotion_notifications_load", """
+    SELECT member_discord_id, from_rank FROM promotion_notifications;
+""")
+
+PROMOTION_NOTIFICATIONS_CLAIM = queries.register("promotion_notifications_claim", """
+    INSERT INTO promotion_notifications (member_discord_id, from_rank)
+    SELECT * FROM unnest($1::bigint[], $2::text[])
+    ON CONFLICT DO NOTHING
+    RETURNING member_discord_id, from_rank;
+""")
+
+PROMOTION_NOTIFICATIONS_RELEASE = queries.register("promotion_notifications_release", """
+    DELETE FROM promotion_notifications
+    WHERE (member_discord_id, from_rank) IN (
+        SELECT * FROM unnest($1::bigint[], $2::text[])
+    );
+""")
+
+
+class PromotionNotifications:
+    """Rank transitions HiCom has already been told about.
+
+    Backed by the promotion_notifications table and mirrored in a set that
+    is loaded at startup, so the common "already announced" answer costs
+    no database round trip. `claim` is the only writer; its INSERT ... ON
+    CONFLICT makes each (member, from_rank) announce exactly once even with
+    several processes.
+    """
+
+    def __init__(self):
+        self._notified: Set[Tuple[int, str]] = set()
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        return key in self._notified
+
+    async def load(self, conn: asyncpg.Connection):
+        rows = await PROMOTION_NOTIFICATIONS_LOAD.fetch(conn)
+        self._notified = {(row["member_discord_id"], row["from_rank"]) for row in rows}
+
+    async def claim(self, keys: List[Tuple[int, str]]) -> Set[Tuple[int, str]]:
+        """Record transitions as announced. Returns the ones this call claimed."""
+        pending = [key for key in dict.fromkeys(keys) if key not in self._notified]
+        if not pending:
+            return set()
+
+        async with acquire_connection() as conn:
+            rows = await PROMOTION_NOTIFICATIONS_CLAIM.fetch(
+                conn,
+                [member_id for member_id, _ in pending],
+                [from_rank for _, from_rank in pending],
+            )
+        self._notified.update(pending)
+        return {(row["member_discord_id"], row["from_rank"]) for row in rows}
+
+    async def release(self, keys: List[Tuple[int, str]]):
+        """Forget claims whose announcement could not be delivered."""
+        if not keys:
+            return
+        async with acquire_connection() as conn:
+            await PROMOTION_NOTIFICATIONS_RELEASE.execute(
+                conn,
+                [member_id for member_id, _ in keys],
+                [from_rank for _, from_rank in keys],
+            )
+        self._notified.difference_update(keys)
+
+
+promotion_notifications = PromotionNotifications()
+
+
+# =========================
+# DATABASE HELPERS
+# =========================
+
+ENSURE_USER = queries.register("ensure_user", """
+    INSERT INTO users (discord_id)
+    VALUES ($1)
+    ON CONFLICT (discord_id) DO NOTHING;
+""")
+
+
+async def ensure_user(discord_id: int):
+    """Ensure a user row exists for this Discord ID."""
+    async with acquire_connection() as conn:
+        await ENSURE_USER.execute(conn, discord_id)
+
+
+SET_QUIZ_PASSED = queries.register("set_quiz_passed", """
+    UPDATE users
+    SET quiz_passed = $1
+    WHERE discord_id = $2;
+""")
+
+
+@metrics.instrument("db")
+async def set_quiz_passed(discord_id: int, passed: bool):
+    await ensure_user(discord_id)
+    async with acquire_connection() as conn:
+        await SET_QUIZ_PASSED.execute(conn, passed, discord_id)
+    sticky_primary.mark([discord_id])
+    stats_cache.update(discord_id, quiz_passed=int(passed))
+
+
+GET_QUIZ_PASSED = queries.register("get_quiz_passed", """
+    SELECT quiz_passed
+    FROM users
+    WHERE discord_id = $1;
+""")
+
+
+@metrics.instrument("db")
+async def get_quiz_passed(discord_id: int) -> bool:
+    async with acquire_connection(reads_from_replica(discord_id)) as conn:
+        row = await GET_QUIZ_PASSED.fetchrow(conn, discord_id)
+
+    if not row:
+        return False
+    return bool(row["quiz_passed"])
+
+
+QUIZ_SUBMISSIONS_LOAD_PENDING = queries.register("quiz_submissions_load_pending", """
+    SELECT review_message_id, candidate_discord_id
+    FROM quiz_submissions
+    WHERE status = 'pending';
+""")
+
+INSERT_QUIZ_SUBMISSION = queries.register("insert_quiz_submission", """
+    INSERT INTO quiz_submissions (review_message_id, candidate_discord_id, answers)
+    VALUES ($1, $2, $3);
+""")
+
+# Submissions posted before they were tracked here are adopted on their
+# first review; one that has been adopted (and maybe reviewed) is left alone
+ADOPT_QUIZ_SUBMISSION = queries.register("adopt_quiz_submission", """
+    INSERT INTO quiz_submissions (review_message_id, candidate_discord_id, answers)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (review_message_id) DO NOTHING
+    RETURNING candidate_discord_id;
+""")
+
+# Only a still-pending submission can be reviewed, and the result lands on
+# the users row in the same statement
+REVIEW_QUIZ_SUBMISSION = queries.register("review_quiz_submission", """
+    WITH reviewed AS (
+        UPDATE quiz_submissions
+        SET status = $2, reviewer_discord_id = $3, reviewed_at = CURRENT_TIMESTAMP
+        WHERE review_message_id = $1 AND status = 'pending'
+        RETURNING candidate_discord_id
+    )
+    INSERT INTO users (discord_id, quiz_passed)
+    SELECT candidate_discord_id, $4::boolean FROM reviewed
+    ON CONFLICT (discord_id) DO UPDATE SET quiz_passed = EXCLUDED.quiz_passed
+    RETURNING discord_id;
+""")
+
+
+class QuizSubmissions:
+    """Quiz submissions awaiting review, keyed by their review message id.
+
+    The pending ones are mirrored in memory (loaded at startup), so the
+    reaction handler can ignore unrelated messages and find the candidate
+    without touching Discord or Postgres. `review` is idempotent: only the
+    first result for a submission is applied, however many reviewers react.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, int] = {}
+        # Messages known to need no review (reviewed since startup, or not
+        # a submission), so later reactions don't look them up again
+        self._settled: Set[int] = set()
+        self._adopting: Dict[int, "asyncio.Future[Optional[int]]"] = {}
+
+    def candidate_for(self, message_id: int) -> Optional[int]:
+        return self._pending.get(message_id)
+
+    def is_settled(self, message_id: int) -> bool:
+        return message_id in self._settled
+
+    async def load(self, conn: asyncpg.Connection):
+        rows = await QUIZ_SUBMISSIONS_LOAD_PENDING.fetch(conn)
+        self._pending = {row["review_message_id"]: row["candidate_discord_id"] for row in rows}
+
+    async def add(self, message_id: int, candidate_id: int, answers: List[str]):
+        async with acquire_connection() as conn:
+            await INSERT_QUIZ_SUBMISSION.execute(conn, message_id, candidate_id, answers)
+        self._pending[message_id] = candidate_id
+
+    async def adopt(self, channel: discord.TextChannel, message_id: int) -> Optional[int]:
+        """Track a submission posted before submissions were stored, reading
+        the candidate from its "User ID: ..." footer and the answers from its
+        fields. Returns the candidate id, or None if the message isn't a
+        submission or was adopted before.
+
+        Concurrent calls for one message share a single lookup, and a
+        negative answer is remembered, so each message is fetched from
+        Discord at most once.
+        """
+        adopting = self._adopting.get(message_id)
+        if adopting is None:
+            adopting = asyncio.ensure_future(self._adopt(channel, message_id))
+            self._adopting[message_id] = adopting
+            adopting.add_done_callback(lambda _: self._adopting.pop(message_id, None))
+        return await asyncio.shield(adopting)
+
+    async def _adopt(self, channel: discord.TextChannel, message_id: int) -> Optional[int]:
+        try:
+            async with metrics.timed("discord_api", "fetch_message"):
+                message = await channel.fetch_message(message_id)
+        except discord.NotFound:
+            self._settled.add(message_id)
+            return None
+
+        candidate_id = None
+        if bot.user is not None and message.author.id == bot.user.id and message.embeds:
+            footer_text = message.embeds[0].footer.text or ""
+            if "User ID:" in footer_text:
+                try:
+                    candidate_id = int(footer_text.split("User ID:")[-1].strip())
+                except ValueError:
+                    pass
+        if candidate_id is None:
+            self._settled.add(message_id)
+            return None
+
+        answers = [
+            field.value.strip("`")
+            for field in message.embeds[0].fields
+            if field.name == "💬 Answer"
+        ]
+        async with acquire_connection() as conn:
+            adopted = await ADOPT_QUIZ_SUBMISSION.fetchval(conn, message_id, candidate_id, answers)
+        if adopted is None:
+            self._settled.add(message_id)
+        else:
+            self._pending[message_id] = candidate_id
+        return adopted
+
+    @metrics.instrument("db", "review_quiz_submission")
+    async def review(self, message_id: int, passed: bool, reviewer_id: int) -> Optional[int]:
+        """Apply a review result. Returns the candidate id, or None if the
+        submission was already reviewed (or is unknown)."""
+        async with acquire_connection() as conn:
+            candidate_id = await REVIEW_QUIZ_SUBMISSION.fetchval(
+                conn, message_id, "passed" if passed else "failed", reviewer_id, passed
+            )
+        self._pending.pop(message_id, None)
+        self._settled.add(message_id)
+        if candidate_id is not None:
+            sticky_primary.mark([candidate_id])
+            stats_cache.update(candidate_id, quiz_passed=int(passed))
+        return candidate_id
+
+
+quiz_submissions = QuizSubmissions()
+
+
+ENSURE_USERS = queries.register("ensure_users", """
+    INSERT INTO users (discord_id)
+    SELECT DISTINCT uid FROM unnest($1::bigint[]) AS uid
+    ON CONFLICT (discord_id) DO NOTHING;
+""")
+
+
+async def ensure_users(conn: asyncpg.Connection, discord_ids: List[int]):
+    """Ensure user rows exist for many Discord IDs with a single statement."""
+    await ENSURE_USERS.execute(conn, list(discord_ids))
+
+
+# Counter columns of the user_stats table, in table order
+STAT_COUNTERS = (
+    "total_hosted",
+    "warfare_hosted",
+    "total_attended",
+    "warfare_attended",
+    "training_attended",
+    "duels_won",
+)
+
+
+def event_stat_deltas(
+    event_type: str,
+    host_id: int,
+    cohost_id: Optional[int],
+    attendee_ids: List[int],
+) -> Dict[int, Dict[str, int]]:
+    """Per-user counter changes caused by logging one event."""
+    is_warfare = int(event_type in WARFARE_EVENT_TYPES)
+    is_training = int(event_type in TRAINING_EVENT_TYPES)
+
+    deltas: Dict[int, Dict[str, int]] = {}
+    for uid in {host_id, cohost_id} - {None}:
+        deltas.setdefault(uid, {}).update(total_hosted=1, warfare_hosted=is_warfare)
+    for uid in attendee_ids:
+        deltas.setdefault(uid, {}).update(
+            total_attended=1,
+            warfare_attended=is_warfare,
+            training_attended=is_training,
+        )
+    return deltas
+
+
+UPSERT_USER_STATS = queries.register("upsert_user_stats", """
+    INSERT INTO user_stats AS s (
+        discord_id, total_hosted, warfare_hosted, total_attended,
+        warfare_attended, training_attended, duels_won
+    )
+    SELECT * FROM unnest(
+        $1::bigint[], $2::int[], $3::int[], $4::int[], $5::int[], $6::int[], $7::int[]
+    )
+    ON CONFLICT (discord_id) DO UPDATE SET
+        total_hosted = s.total_hosted + EXCLUDED.total_hosted,
+        warfare_hosted = s.warfare_hosted + EXCLUDED.warfare_hosted,
+        total_attended = s.total_attended + EXCLUDED.total_attended,
+        warfare_attended = s.warfare_attended + EXCLUDED.warfare_attended,
+        training_attended = s.training_attended + EXCLUDED.training_attended,
+        duels_won = s.duels_won + EXCLUDED.duels_won
+    RETURNING txid_current();
+""")
+
+
+async def apply_stat_deltas(
+    conn: asyncpg.Connection,
+    deltas: Dict[int, Dict[str, int]],
+) -> Optional[int]:
+    """Add counter deltas to user_stats with one multi-row upsert.
+
+    Rows are written in discord_id order so concurrent writers lock them in
+    the same order. Returns the writing transaction's id, which tells
+    leaderboard refreshes whether their snapshot already includes the write.
+    """
+    ids = sorted(deltas)
+    columns = [[deltas[uid].get(name, 0) for uid in ids] for name in STAT_COUNTERS]
+    return await UPSERT_USER_STATS.fetchval(conn, ids, *columns)
+
+
+INSERT_EVENT = queries.register("insert_event", """
+    INSERT INTO events (event_type, host_discord_id, cohost_discord_id)
+    VALUES ($1, $2, $3)
+    RETURNING id, timestamp;
+""")
+
+
+@metrics.instrument("db")
+async def log_event(
+    event_type: str,
+    host_id: int,
+    cohost_id: Optional[int],
+    attendee_ids: List[int],
+) -> int:
+    """Create an event and event_attendance rows. Returns event_id.
+
+    Everything runs in one transaction on one connection, so the cost is
+    constant in the number of attendees and a failure leaves nothing behind.
+    """
+    # Deduplicate attendees
+    unique_attendees = list(dict.fromkeys(attendee_ids))
+
+    user_ids = [host_id] + ([cohost_id] if cohost_id else []) + unique_attendees
+    deltas = event_stat_deltas(event_type, host_id, cohost_id, unique_attendees)
+
+    async with acquire_connection() as conn:
+        async with conn.transaction():
+            # Ensure host/cohost/users exist
+            await ensure_users(conn, user_ids)
+
+            event = await INSERT_EVENT.fetchrow(conn, event_type, host_id, cohost_id)
+            event_id = event["id"]
+
+            await conn.copy_records_to_table(
+                "event_attendance",
+                records=[
+                    (event_id, uid, event_type, event["timestamp"])
+                    for uid in unique_attendees
+                ],
+                columns=["event_id", "user_discord_id", "event_type", "attended_at"],
+            )
+
+            txid = await apply_stat_deltas(conn, deltas)
+
+    sticky_primary.mark(user_ids)
+    for uid in deltas:
+        stats_cache.invalidate(uid)
+    leaderboards.apply_deltas(deltas, txid)
+
+    return event_id
+
+
+INSERT_DUEL = queries.register("insert_duel", """
+    INSERT INTO duels (winner_discord_id, loser_discord_id, rating_change)
+    VALUES ($1, $2, $3);
+""")
+
+
+@metrics.instrument("db")
+async def log_duel_result(winner_id: int, loser_id: int):
+    async with acquire_connection() as conn:
+        async with conn.transaction():
+            await ensure_users(conn, [winner_id, loser_id])
+            rating_change = await apply_duel_rating(conn, winner_id, loser_id)
+            await INSERT_DUEL.execute(conn, winner_id, loser_id, rating_change)
+            txid = await apply_stat_deltas(conn, {winner_id: {"duels_won": 1}})
+    sticky_primary.mark([winner_id, loser_id])
+    stats_cache.invalidate(winner_id)
+    leaderboards.apply_deltas({winner_id: {"duels_won": 1}}, txid)
+
+
+# Every lifetime counter for every user as one set-based aggregate over the
+# raw history. $1/$2 are the warfare/training types. This only relies on the
+# base schema, since migration 3 runs it as its backfill.
+STATS_AGGREGATE_SQL = """
+    WITH hosted AS (
+        SELECT
+            uid,
+            COUNT(*) AS total_hosted,
+            COUNT(*) FILTER (WHERE event_type = ANY($1::text[])) AS warfare_hosted
+        FROM (
+            SELECT host_discord_id AS uid, event_type FROM events
+            UNION ALL
+            SELECT cohost_discord_id, event_type FROM events
+            WHERE cohost_discord_id IS NOT NULL
+              AND cohost_discord_id <> host_discord_id
+        ) hosts
+        GROUP BY uid
+    ),
+    attended AS (
+        SELECT
+            ea.user_discord_id AS uid,
+            COUNT(*) AS total_attended,
+            COUNT(*) FILTER (WHERE e.event_type = ANY($1::text[])) AS warfare_attended,
+            COUNT(*) FILTER (WHERE e.event_type = ANY($2::text[])) AS training_attended
+        FROM event_attendance ea
+        LEFT JOIN events e ON ea.event_id = e.id
+        GROUP BY ea.user_discord_id
+    ),
+    won AS (
+        SELECT winner_discord_id AS uid, COUNT(*) AS duels_won
+        FROM duels
+        GROUP BY winner_discord_id
+    )
+    SELECT
+        COALESCE(h.uid, a.uid, w.uid) AS discord_id,
+        COALESCE(h.total_hosted, 0) AS total_hosted,
+        COALESCE(h.warfare_hosted, 0) AS warfare_hosted,
+        COALESCE(a.total_attended, 0) AS total_attended,
+        COALESCE(a.warfare_attended, 0) AS warfare_attended,
+        COALESCE(a.training_attended, 0) AS training_attended,
+        COALESCE(w.duels_won, 0) AS duels_won
+    FROM hosted h
+    FULL JOIN attended a ON a.uid = h.uid
+    FULL JOIN won w ON w.uid = COALESCE(h.uid, a.uid)
+"""
+
+USER_STATS_ALL = queries.register("user_stats_all", f"""
+    SELECT discord_id, {', '.join(STAT_COUNTERS)} FROM user_stats;
+""")
+
+
+async def rebuild_user_stats(conn: asyncpg.Connection) -> List[asyncpg.Record]:
+    """Recompute user_stats from the raw history tables.
+
+    Returns the rows that had drifted, each with the stored (`old_*`) and
+    recomputed values. Writers are blocked for the duration of the rebuild.
+    Run this after changing WARFARE_EVENT_TYPES / TRAINING_EVENT_TYPES, since
+    the counters classify events when they are written.
+    """
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE;")
+        await conn.execute(
+            """
+            CREATE TEMP TABLE user_stats_rebuild (LIKE user_stats)
+            ON COMMIT DROP;
+            """
+        )
+        await conn.execute(
+            f"""
+            INSERT INTO user_stats_rebuild
+            SELECT
+                u.discord_id,
+                COALESCE(x.total_hosted, 0),
+                COALESCE(x.warfare_hosted, 0),
+                COALESCE(x.total_attended, 0),
+                COALESCE(x.warfare_attended, 0),
+                COALESCE(x.training_attended, 0),
+                COALESCE(x.duels_won, 0)
+            FROM users u
+            LEFT JOIN ({STATS_AGGREGATE_SQL}) x ON x.discord_id = u.discord_id;
+            """,
+            list(WARFARE_EVENT_TYPES),
+            list(TRAINING_EVENT_TYPES),
+        )
+
+        drift = await conn.fetch(
+            """
+            SELECT
+                COALESCE(r.discord_id, s.discord_id) AS discord_id,
+                s.total_hosted AS old_total_hosted, r.total_hosted,
+                s.warfare_hosted AS old_warfare_hosted, r.warfare_hosted,
+                s.total_attended AS old_total_attended, r.total_attended,
+                s.warfare_attended AS old_warfare_attended, r.warfare_attended,
+                s.training_attended AS old_training_attended, r.training_attended,
+                s.duels_won AS old_duels_won, r.duels_won
+            FROM user_stats_rebuild r
+            FULL JOIN user_stats s ON s.discord_id = r.discord_id
+            WHERE (
+                COALESCE(s.total_hosted, 0), COALESCE(s.warfare_hosted, 0),
+                COALESCE(s.total_attended, 0), COALESCE(s.warfare_attended, 0),
+                COALESCE(s.training_attended, 0), COALESCE(s.duels_won, 0)
+            ) IS DISTINCT FROM (
+                COALESCE(r.total_hosted, 0), COALESCE(r.warfare_hosted, 0),
+                COALESCE(r.total_attended, 0), COALESCE(r.warfare_attended, 0),
+                COALESCE(r.training_attended, 0), COALESCE(r.duels_won, 0)
+            )
+            ORDER BY 1;
+            """
+        )
+
+        # DELETE rather than TRUNCATE: TRUNCATE takes an ACCESS EXCLUSIVE
+        # lock, which would stall every stats read until the rebuild commits
+        await conn.execute("DELETE FROM user_stats;")
+        await conn.execute("INSERT INTO user_stats SELECT * FROM user_stats_rebuild;")
+
+    return drift
+
+
+@metrics.instrument("db")
+async def get_user_stats(discord_id: int, use_cache: bool = True) -> Dict[str, int]:
+    """Return the progress counters for a user, creating their row if needed.
+
+    Served from `stats_cache` when possible; misses are read from Postgres
+    and stored in the cache.
+    """
+    if use_cache:
+        cached = stats_cache.get(discord_id)
+        if cached is not None:
+            return cached
+
+    generation = stats_cache.generation
+
+    if STATS_QUERY_MODE == "legacy":
+        stats = await get_user_stats_legacy(discord_id)
+    elif STATS_QUERY_MODE == "single":
+        stats = await get_user_stats_single(discord_id)
+    else:
+        stats = await get_user_stats_summary(discord_id)
+
+        if STATS_QUERY_MODE == "compare":
+            aggregate = await get_user_stats_single(discord_id)
+            if aggregate != stats:
+                logger.warning(
+                    f"Stats mismatch for {discord_id}: summary={stats} aggregate={aggregate}"
+                )
+
+    stats_cache.put(discord_id, stats, generation)
+    return stats
+
+
+STATS_SUMMARY = queries.register("stats_summary", """
+    WITH ensured AS (
+        INSERT INTO users (discord_id)
+        VALUES ($1)
+        ON CONFLICT (discord_id) DO NOTHING
+        RETURNING quiz_passed
+    )
+    SELECT
+        COALESCE(s.total_hosted, 0) AS total_hosted,
+        COALESCE(s.warfare_hosted, 0) AS warfare_hosted,
+        COALESCE(s.total_attended, 0) AS total_attended,
+        COALESCE(s.warfare_attended, 0) AS warfare_attended,
+        COALESCE(s.training_attended, 0) AS training_attended,
+        COALESCE(s.duels_won, 0) AS duels_won,
+        COALESCE(u.quiz_passed, (SELECT quiz_passed FROM ensured), FALSE) AS quiz_passed
+    FROM (SELECT $1::bigint AS discord_id) k
+    LEFT JOIN users u ON u.discord_id = k.discord_id
+    LEFT JOIN user_stats s ON s.discord_id = k.discord_id;
+""")
+
+
+async def get_user_stats_summary(discord_id: int) -> Dict[str, int]:
+    """Read the precomputed user_stats counters (one primary-key lookup).
+
+    On the read replica the user row cannot be created, so the read-only
+    bulk lookup is used instead; a missing user reads as all zeros either
+    way, and the writers create the row when it is first needed.
+    """
+    replica = reads_from_replica(discord_id)
+    async with acquire_connection(replica) as conn:
+        if replica:
+            row = await STATS_BULK.fetchrow(conn, [discord_id])
+        else:
+            row = await STATS_SUMMARY.fetchrow(conn, discord_id)
+
+    return {
+        **{name: row[name] for name in STAT_COUNTERS},
+        "quiz_passed": int(bool(row["quiz_passed"])),
+    }
+
+
+STATS_BULK = queries.register("stats_bulk", """
+    SELECT
+        k.discord_id,
+        COALESCE(s.total_hosted, 0) AS total_hosted,
+        COALESCE(s.warfare_hosted, 0) AS warfare_hosted,
+        COALESCE(s.total_attended, 0) AS total_attended,
+        COALESCE(s.warfare_attended, 0) AS warfare_attended,
+        COALESCE(s.training_attended, 0) AS training_attended,
+        COALESCE(s.duels_won, 0) AS duels_won,
+        COALESCE(u.quiz_passed, FALSE) AS quiz_passed
+    FROM unnest($1::bigint[]) AS k(discord_id)
+    LEFT JOIN users u ON u.discord_id = k.discord_id
+    LEFT JOIN user_stats s ON s.discord_id = k.discord_id;
+""")
+
+
+@metrics.instrument("db")
+async def get_bulk_user_stats(
+    discord_ids: List[int],
+    fill_cache: bool = False,
+) -> Dict[int, Dict[str, int]]:
+    """Read stats for many users in one set-based query.
+
+    Users without a row get all-zero stats. Unlike get_user_stats this never
+    writes, so it is safe to call for a whole guild. With a read replica,
+    only recently written users are read from the primary.
+    """
+    generation = stats_cache.generation
+    rows = []
+    for replica, ids in split_reads(list(dict.fromkeys(discord_ids))):
+        async with acquire_connection(replica) as conn:
+            rows.extend(await STATS_BULK.fetch(conn, ids))
+
+    result = {}
+    for row in rows:
+        stats = {name: row[name] for name in STAT_COUNTERS}
+        stats["quiz_passed"] = int(row["quiz_passed"])
+        result[row["discord_id"]] = stats
+        if fill_cache:
+            stats_cache.put(row["discord_id"], stats, generation)
+    return result
+
+
+async def get_cached_bulk_user_stats(discord_ids: List[int]) -> Dict[int, Dict[str, int]]:
+    """Like get_bulk_user_stats, but cached users are served from memory and
+    only the misses are read (and cached) in one query."""
+    result = {}
+    missing = []
+    for discord_id in dict.fromkeys(discord_ids):
+        stats = stats_cache.get(discord_id)
+        if stats is None:
+            missing.append(discord_id)
+        else:
+            result[discord_id] = stats
+    if missing:
+        result.update(await get_bulk_user_stats(missing, fill_cache=True))
+    return result
+
+
+# Members with any activity since $1, most recently active first
+ACTIVE_MEMBERS = queries.register("active_members", """
+    SELECT uid
+    FROM (
+        SELECT user_discord_id AS uid, attended_at AS at
+        FROM event_attendance WHERE attended_at >= $1::timestamptz
+        UNION ALL
+        SELECT host_discord_id, timestamp FROM events WHERE timestamp >= $1::timestamptz
+        UNION ALL
+        SELECT cohost_discord_id, timestamp FROM events
+        WHERE timestamp >= $1::timestamptz AND cohost_discord_id IS NOT NULL
+        UNION ALL
+        SELECT winner_discord_id, timestamp FROM duels WHERE timestamp >= $1::timestamptz
+        UNION ALL
+        SELECT loser_discord_id, timestamp FROM duels WHERE timestamp >= $1::timestamptz
+    ) activity
+    GROUP BY uid
+    ORDER BY MAX(at) DESC
+    LIMIT $2;
+""")
+
+
+async def warm_stats_cache(guilds: List[discord.Guild]) -> int:
+    """Preload the stats cache (counters and quiz status) for the guilds'
+    recently active members. Returns how many members were read.
+
+    One query picks the members (most recent first, at most the cache
+    size), then their stats are read CACHE_WARM_BATCH at a time with at
+    most CACHE_WARM_CONCURRENCY batches in flight, so interactive queries
+    still get connections. Guilds whose member list (and so rank roles)
+    isn't cached yet are chunked first.
+    """
+    if stats_cache.max_size <= 0 or CACHE_WARM_DAYS <= 0:
+        return 0
+
+    for guild in guilds:
+        if not guild.chunked:
+            await guild.chunk()
+    in_guild = {member.id for guild in guilds for member in guild.members}
+
+    since = discord.utils.utcnow() - timedelta(days=CACHE_WARM_DAYS)
+    async with acquire_connection(reads_from_replica()) as conn:
+        rows = await ACTIVE_MEMBERS.fetch(conn, since, stats_cache.max_size)
+
+    # Least recent first, so the most active members end up freshest in the LRU
+    member_ids = [row["uid"] for row in reversed(rows) if row["uid"] in in_guild]
+    semaphore = asyncio.Semaphore(CACHE_WARM_CONCURRENCY)
+
+    async def load(batch: List[int]):
+        async with semaphore:
+            await get_bulk_user_stats(batch, fill_cache=True)
+
+    await asyncio.gather(*(
+        load(member_ids[i:i + CACHE_WARM_BATCH])
+        for i in range(0, len(member_ids), CACHE_WARM_BATCH)
+    ))
+    return len(member_ids)
+
+
+async def warm_start():
+    started = time.monotonic()
+    warmed = await warm_stats_cache(bot.guilds)
+    logger.info(
+        f"Warmed stats cache with {warmed} active member(s) in "
+        f"{time.monotonic() - started:.2f}s ({len(stats_cache)} cached)"
+    )
+
+
+STATS_SINGLE = queries.register("stats_single", """
+    WITH ensured AS (
+        INSERT INTO users (discord_id)
+        VALUES ($1)
+        ON CONFLICT (discord_id) DO NOTHING
+        RETURNING quiz_passed
+    ),
+    hosted AS (
+        SELECT
+            COUNT(*) AS total_hosted,
+            COUNT(*) FILTER (WHERE event_type = ANY($2::text[])) AS warfare_hosted
+        FROM events
+        WHERE host_discord_id = $1 OR cohost_discord_id = $1
+    ),
+    attended AS (
+        SELECT
+            COUNT(*) AS total_attended,
+            COUNT(*) FILTER (WHERE e.event_type = ANY($2::text[])) AS warfare_attended,
+            COUNT(*) FILTER (WHERE e.event_type = ANY($3::text[])) AS training_attended
+        FROM event_attendance ea
+        LEFT JOIN events e ON ea.event_id = e.id
+        WHERE ea.user_discord_id = $1
+    )
+    SELECT
+        hosted.total_hosted,
+        hosted.warfare_hosted,
+        attended.total_attended,
+        attended.warfare_attended,
+        attended.training_attended,
+        (SELECT COUNT(*) FROM duels WHERE winner_discord_id = $1) AS duels_won,
+        COALESCE(
+            (SELECT quiz_passed FROM users WHERE discord_id = $1),
+            (SELECT quiz_passed FROM ensured),
+            FALSE
+        ) AS quiz_passed
+    FROM hosted, attended;
+""")
+
+
+async def get_user_stats_single(discord_id: int) -> Dict[str, int]:
+    """Aggregate all stats from the history tables (and ensure the user row)
+    in one round trip."""
+    async with acquire_connection() as conn:
+        row = await STATS_SINGLE.fetchrow(
+            conn,
+            discord_id,
+            list(WARFARE_EVENT_TYPES),
+            list(TRAINING_EVENT_TYPES),
+        )
+
+    return {
+        "total_hosted": row["total_hosted"] or 0,
+        "warfare_hosted": row["warfare_hosted"] or 0,
+        "total_attended": row["total_attended"] or 0,
+        "warfare_attended": row["warfare_attended"] or 0,
+        "training_attended": row["training_attended"] or 0,
+        "duels_won": row["duels_won"] or 0,
+        "quiz_passed": int(bool(row["quiz_passed"])),
+    }
+
+
+async def get_user_stats_legacy(discord_id: int) -> Dict[str, int]:
+    """Original per-counter implementation, kept for STATS_QUERY_MODE comparisons."""
+    await ensure_user(discord_id)
+
+    async with acquire_connection() as conn:
+        # Total hosted
+        total_hosted = await conn.fetchval(
+            """
+            SELECT COUNT(*) FROM events
+            WHERE host_discord_id = $1 OR cohost_discord_id = $1;
+            """,
+            discord_id,
+        )
+
+        # Warfare hosted
+        warfare_hosted = await conn.fetchval(
+            """
+            SELECT COUNT(*) FROM events
+            WHERE (host_discord_id = $1 OR cohost_discord_id = $1)
+              AND event_type = ANY($2::text[]);
+            """,
+            discord_id,
+            list(WARFARE_EVENT_TYPES),
+        )
+
+        # Total attended
+        total_attended = await conn.fetchval(
+            """
+            SELECT COUNT(*)
+            FROM event_attendance
+            WHERE user_discord_id = $1;
+            """,
+            discord_id,
+        )
 
         # Warfare attended
         warfare_attended = await conn.fetchval(
@@ -556,6 +2329,182 @@ async def get_user_stats(discord_id: int) -> Dict[str, int]:
     }
 
 
+# Stats windows: name -> display label. "rank" starts at the member's last
+# rank-up (users.promoted_at); the others start at the same time for everyone.
+STAT_WINDOWS = {
+    "all": "All Time",
+    "rank": "Since Last Rank-Up",
+    "season": "This Season",
+    "month": "Last 30 Days",
+    "week": "Last 7 Days",
+}
+
+# Fixed-length windows, in days
+STAT_WINDOW_DAYS = {"month": 30, "week": 7}
+
+
+def current_season(now: Optional[datetime] = None) -> Tuple[int, datetime]:
+    """Return (season number, season start) for `now`, counting from 1."""
+    now = now or discord.utils.utcnow()
+    epoch = datetime.fromisoformat(SEASON_EPOCH).replace(tzinfo=timezone.utc)
+    elapsed = max(0, (now - epoch).days)
+    number = elapsed // SEASON_LENGTH_DAYS
+    return number + 1, epoch + timedelta(days=number * SEASON_LENGTH_DAYS)
+
+
+def window_start(window: str) -> Optional[datetime]:
+    """Start of a guild-wide window, or None for all time. Not valid for
+    "rank", which depends on the member."""
+    if window == "season":
+        return current_season()[1]
+    days = STAT_WINDOW_DAYS.get(window)
+    if days is None:
+        return None
+    return discord.utils.utcnow() - timedelta(days=days)
+
+
+# All counters for every user with activity since $3, read from the
+# denormalized attendance columns so it never joins the full history.
+STATS_WINDOW_AGGREGATE = queries.register("stats_window_aggregate", """
+    WITH hosted AS (
+        SELECT
+            uid,
+            COUNT(*) AS total_hosted,
+            COUNT(*) FILTER (WHERE event_type = ANY($1::text[])) AS warfare_hosted
+        FROM (
+            SELECT host_discord_id AS uid, event_type FROM events
+            WHERE timestamp >= $3::timestamptz
+            UNION ALL
+            SELECT cohost_discord_id, event_type FROM events
+            WHERE timestamp >= $3::timestamptz
+              AND cohost_discord_id IS NOT NULL
+              AND cohost_discord_id <> host_discord_id
+        ) hosts
+        GROUP BY uid
+    ),
+    attended AS (
+        SELECT
+            user_discord_id AS uid,
+            COUNT(*) AS total_attended,
+            COUNT(*) FILTER (WHERE event_type = ANY($1::text[])) AS warfare_attended,
+            COUNT(*) FILTER (WHERE event_type = ANY($2::text[])) AS training_attended
+        FROM event_attendance
+        WHERE attended_at >= $3::timestamptz
+        GROUP BY user_discord_id
+    ),
+    won AS (
+        SELECT winner_discord_id AS uid, COUNT(*) AS duels_won
+        FROM duels
+        WHERE timestamp >= $3::timestamptz
+        GROUP BY winner_discord_id
+    )
+    SELECT
+        COALESCE(h.uid, a.uid, w.uid) AS discord_id,
+        COALESCE(h.total_hosted, 0) AS total_hosted,
+        COALESCE(h.warfare_hosted, 0) AS warfare_hosted,
+        COALESCE(a.total_attended, 0) AS total_attended,
+        COALESCE(a.warfare_attended, 0) AS warfare_attended,
+        COALESCE(a.training_attended, 0) AS training_attended,
+        COALESCE(w.duels_won, 0) AS duels_won
+    FROM hosted h
+    FULL JOIN attended a ON a.uid = h.uid
+    FULL JOIN won w ON w.uid = COALESCE(h.uid, a.uid);
+""")
+
+# One user's counters since $4, or since their last rank-up when $5 is true
+# (all history if they have never ranked up). Every count is an index-only
+# range scan on a (user, time) index, so the cost tracks the activity inside
+# the window rather than the size of the history.
+STATS_WINDOW = queries.register("stats_window", """
+    WITH member AS (
+        SELECT quiz_passed, promoted_at FROM users WHERE discord_id = $1
+    ),
+    bounds AS (
+        SELECT CASE
+            WHEN $5::boolean THEN COALESCE((SELECT promoted_at FROM member), '-infinity')
+            ELSE $4::timestamptz
+        END AS since
+    ),
+    hosted AS (
+        SELECT
+            COUNT(*) AS total_hosted,
+            COUNT(*) FILTER (WHERE event_type = ANY($2::text[])) AS warfare_hosted
+        FROM (
+            SELECT event_type FROM events, bounds
+            WHERE host_discord_id = $1 AND timestamp >= bounds.since
+            UNION ALL
+            SELECT event_type FROM events, bounds
+            WHERE cohost_discord_id = $1 AND host_discord_id <> $1
+              AND timestamp >= bounds.since
+        ) hosts
+    ),
+    attended AS (
+        SELECT
+            COUNT(*) AS total_attended,
+            COUNT(*) FILTER (WHERE event_type = ANY($2::text[])) AS warfare_attended,
+            COUNT(*) FILTER (WHERE event_type = ANY($3::text[])) AS training_attended
+        FROM event_attendance, bounds
+        WHERE user_discord_id = $1 AND attended_at >= bounds.since
+    )
+    SELECT
+        hosted.total_hosted,
+        hosted.warfare_hosted,
+        attended.total_attended,
+        attended.warfare_attended,
+        attended.training_attended,
+        (
+            SELECT COUNT(*) FROM duels, bounds
+            WHERE winner_discord_id = $1 AND timestamp >= bounds.since
+        ) AS duels_won,
+        COALESCE((SELECT quiz_passed FROM member), FALSE) AS quiz_passed,
+        NULLIF(bounds.since, '-infinity') AS since
+    FROM hosted, attended, bounds;
+""")
+
+
+@metrics.instrument("db")
+async def get_windowed_user_stats(
+    discord_id: int,
+    window: str,
+) -> Tuple[Dict[str, int], Optional[datetime]]:
+    """Return (stats, window start) for one user over a STAT_WINDOWS window.
+
+    The stats have the same keys as get_user_stats; quiz_passed is never
+    windowed. "all" is served by get_user_stats (and its cache). The start
+    is None when the window covers all history.
+    """
+    if window == "all":
+        return await get_user_stats(discord_id), None
+
+    async with acquire_connection(reads_from_replica(discord_id)) as conn:
+        row = await STATS_WINDOW.fetchrow(
+            conn,
+            discord_id,
+            list(WARFARE_EVENT_TYPES),
+            list(TRAINING_EVENT_TYPES),
+            window_start(window) if window != "rank" else None,
+            window == "rank",
+        )
+
+    stats = {name: row[name] for name in STAT_COUNTERS}
+    stats["quiz_passed"] = int(bool(row["quiz_passed"]))
+    return stats, row["since"]
+
+
+SET_PROMOTED_AT = queries.register("set_promoted_at", """
+    INSERT INTO users (discord_id, promoted_at)
+    VALUES ($1, now())
+    ON CONFLICT (discord_id) DO UPDATE SET promoted_at = EXCLUDED.promoted_at;
+""")
+
+
+async def record_rank_up(discord_id: int):
+    """Start a member's "since last rank-up" window now."""
+    async with acquire_connection() as conn:
+        await SET_PROMOTED_AT.execute(conn, discord_id)
+    sticky_primary.mark([discord_id])
+
+
 def make_progress_bar(current: int, required: int, length: int = 10) -> str:
     if required <= 0:
         return "[──────────]"
@@ -565,6 +2514,779 @@ def make_progress_bar(current: int, required: int, length: int = 10) -> str:
     return f"[{bar}]"
 
 
+# =========================
+# RATINGS
+# =========================
+
+# Duels streamed per round trip when replaying the whole history
+RATING_REPLAY_BATCH = 5000
+
+
+def elo_expected(rating: float, opponent_rating: float) -> float:
+    """Probability that a player rated `rating` beats one rated `opponent_rating`"""
+    return 1.0 / (1.0 + 10 ** ((opponent_rating - rating) / 400.0))
+
+
+def elo_change(winner_rating: float, loser_rating: float) -> float:
+    """Points the winner gains, and the loser loses, for one duel"""
+    return ELO_K_FACTOR * (1.0 - elo_expected(winner_rating, loser_rating))
+
+
+# Creates missing rows and locks both players' rows in id order, so two
+# duels between overlapping players can't deadlock or lose an update
+LOCK_RATINGS = queries.register("lock_ratings", """
+    INSERT INTO player_ratings (discord_id, rating)
+    SELECT uid, $2 FROM unnest($1::bigint[]) AS uid ORDER BY uid
+    ON CONFLICT (discord_id) DO UPDATE SET discord_id = EXCLUDED.discord_id
+    RETURNING discord_id, rating;
+""")
+
+APPLY_DUEL_RATING = queries.register("apply_duel_rating", """
+    UPDATE player_ratings
+    SET rating = rating + CASE WHEN discord_id = $1 THEN $3::float8 ELSE -$3::float8 END,
+        wins = wins + (discord_id = $1)::int,
+        losses = losses + (discord_id = $2)::int,
+        updated_at = now()
+    WHERE discord_id IN ($1, $2);
+""")
+
+
+async def apply_duel_rating(conn: asyncpg.Connection, winner_id: int, loser_id: int) -> float:
+    """Update both players' ratings for one duel (inside the caller's
+    transaction). Returns the rating change."""
+    rows = await LOCK_RATINGS.fetch(conn, sorted({winner_id, loser_id}), ELO_INITIAL_RATING)
+    ratings = {row["discord_id"]: row["rating"] for row in rows}
+    change = elo_change(ratings[winner_id], ratings[loser_id])
+    await APPLY_DUEL_RATING.execute(conn, winner_id, loser_id, change)
+    return change
+
+
+async def rebuild_player_ratings(conn: asyncpg.Connection) -> Tuple[int, int]:
+    """Recompute every rating by replaying the duel history in order.
+
+    Duels are streamed through a server-side cursor, so memory holds only
+    the per-player ratings and one batch of per-duel changes at a time.
+    Returns (duels replayed, players rated).
+    """
+    ratings: Dict[int, List] = {}
+    changes: List[Tuple[int, float]] = []
+    replayed = 0
+
+    async with conn.transaction():
+        # Writers wait until the rebuild commits
+        await conn.execute("LOCK TABLE duels, player_ratings IN SHARE ROW EXCLUSIVE MODE;")
+        await conn.execute(
+            """
+            CREATE TEMP TABLE duel_rating_changes (
+                duel_id INTEGER PRIMARY KEY,
+                rating_change DOUBLE PRECISION NOT NULL
+            ) ON COMMIT DROP;
+            """
+        )
+
+        async for duel in conn.cursor(
+            "SELECT id, winner_discord_id, loser_discord_id FROM duels ORDER BY id;",
+            prefetch=RATING_REPLAY_BATCH,
+        ):
+            winner = ratings.setdefault(duel["winner_discord_id"], [ELO_INITIAL_RATING, 0, 0])
+            loser = ratings.setdefault(duel["loser_discord_id"], [ELO_INITIAL_RATING, 0, 0])
+            change = elo_change(winner[0], loser[0])
+            winner[0] += change
+            winner[1] += 1
+            loser[0] -= change
+            loser[2] += 1
+            changes.append((duel["id"], change))
+            replayed += 1
+            if len(changes) >= RATING_REPLAY_BATCH:
+                await conn.copy_records_to_table("duel_rating_changes", records=changes)
+                changes.clear()
+
+        if changes:
+            await conn.copy_records_to_table("duel_rating_changes", records=changes)
+
+        await conn.execute(
+            """
+            UPDATE duels d
+            SET rating_change = c.rating_change
+            FROM duel_rating_changes c
+            WHERE d.id = c.duel_id
+              AND d.rating_change IS DISTINCT FROM c.rating_change;
+            """
+        )
+        # DELETE rather than TRUNCATE, so rating reads aren't blocked by an
+        # ACCESS EXCLUSIVE lock while the new ratings are copied in
+        await conn.execute("DELETE FROM player_ratings;")
+        await conn.copy_records_to_table(
+            "player_ratings",
+            records=[(uid, r[0], r[1], r[2]) for uid, r in ratings.items()],
+            columns=["discord_id", "rating", "wins", "losses"],
+        )
+
+    return replayed, len(ratings)
+
+
+PLAYER_RATING = queries.register("player_rating", """
+    SELECT
+        p.rating,
+        p.wins,
+        p.losses,
+        (SELECT COUNT(*) + 1 FROM player_ratings o WHERE o.rating > p.rating) AS position,
+        (SELECT COUNT(*) FROM player_ratings) AS rated
+    FROM player_ratings p
+    WHERE p.discord_id = $1;
+""")
+
+
+@metrics.instrument("db")
+async def get_player_rating(discord_id: int) -> Optional[Dict[str, Any]]:
+    """Rating, record and ladder position, or None if the player has no duels"""
+    async with acquire_connection(reads_from_replica(discord_id)) as conn:
+        row = await PLAYER_RATING.fetchrow(conn, discord_id)
+    return dict(row) if row else None
+
+
+HEAD_TO_HEAD = queries.register("head_to_head", """
+    SELECT
+        COUNT(*) FILTER (WHERE winner_discord_id = $1) AS wins,
+        COUNT(*) FILTER (WHERE winner_discord_id = $2) AS losses
+    FROM duels
+    WHERE (winner_discord_id = $1 AND loser_discord_id = $2)
+       OR (winner_discord_id = $2 AND loser_discord_id = $1);
+""")
+
+
+@metrics.instrument("db")
+async def get_head_to_head(player_id: int, opponent_id: int) -> Tuple[int, int]:
+    """(player's wins, opponent's wins) across all their duels"""
+    async with acquire_connection(reads_from_replica(player_id, opponent_id)) as conn:
+        row = await HEAD_TO_HEAD.fetchrow(conn, player_id, opponent_id)
+    return row["wins"], row["losses"]
+
+
+# =========================
+# LEADERBOARDS
+# =========================
+
+# metric name -> (display label, stat counter)
+LEADERBOARD_METRICS = {
+    "attended": ("Events Attended", "total_attended"),
+    "warfare": ("Warfare Events", "warfare_attended"),
+    "training": ("Training Events", "training_attended"),
+    "hosted": ("Events Hosted", "total_hosted"),
+    "duels": ("Duels Won", "duels_won"),
+}
+
+# period name -> display label; every guild-wide STAT_WINDOWS window
+LEADERBOARD_PERIODS = {
+    name: label for name, label in STAT_WINDOWS.items() if name != "rank"
+}
+
+
+class RankingIndex:
+    """Members sorted by score, highest first, for one metric and period.
+
+    Rows are kept as (-score, discord_id) in a sorted list, so a page is a
+    slice and a score change is a bisect remove + insert.
+    """
+
+    def __init__(self, scores: Optional[Dict[int, int]] = None):
+        self._scores: Dict[int, int] = {
+            uid: score for uid, score in (scores or {}).items() if score > 0
+        }
+        self._rows: List[Tuple[int, int]] = sorted(
+            (-score, uid) for uid, score in self._scores.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def page_count(self, size: int) -> int:
+        return max(1, -(-len(self._rows) // size))
+
+    def add(self, discord_id: int, delta: int):
+        if not delta:
+            return
+        old = self._scores.get(discord_id, 0)
+        new = old + delta
+        if old > 0:
+            del self._rows[bisect.bisect_left(self._rows, (-old, discord_id))]
+        if new > 0:
+            bisect.insort(self._rows, (-new, discord_id))
+            self._scores[discord_id] = new
+        else:
+            self._scores.pop(discord_id, None)
+
+    def page(self, page: int, size: int) -> List[Tuple[int, int, int]]:
+        """Return [(position, discord_id, score), ...] for a zero-based page."""
+        start = page * size
+        return [
+            (start + offset + 1, uid, -neg_score)
+            for offset, (neg_score, uid) in enumerate(self._rows[start:start + size])
+        ]
+
+    def position(self, discord_id: int) -> Optional[Tuple[int, int]]:
+        """Return (position, score) for a member, or None if unranked."""
+        score = self._scores.get(discord_id)
+        if not score:
+            return None
+        return bisect.bisect_left(self._rows, (-score, discord_id)) + 1, score
+
+
+TXID_SNAPSHOT = queries.register("txid_snapshot", """
+    SELECT txid_current_snapshot()::text;
+""")
+
+
+def txid_visible(txid: int, snapshot: str) -> bool:
+    """Whether a committed transaction is visible in a txid_current_snapshot
+    ("xmin:xmax:xip,...")."""
+    xmin, xmax, xip = snapshot.split(":")
+    if txid < int(xmin):
+        return True
+    return txid < int(xmax) and str(txid) not in xip.split(",")
+
+
+class Leaderboards:
+    """RankingIndexes for every metric/period.
+
+    Each period is rebuilt from a single aggregate query (the user_stats
+    table for all time, STATS_WINDOW_AGGREGATE for windows) and then kept
+    current by `apply_deltas` from the stat writers, so serving a page never
+    touches Postgres. Windowed periods also need the periodic refresh to drop
+    activity that has aged out.
+
+    Recent deltas are kept with the id of the transaction that wrote them.
+    A refresh reads its rows and the transaction snapshot together, then
+    replays the deltas its snapshot doesn't include: writes that land while
+    the query runs, or that the replica hasn't caught up with yet.
+    """
+
+    def __init__(self, max_age: float, replay_seconds: float):
+        self.max_age = max_age
+        self.replay_seconds = replay_seconds
+        self._indexes: Dict[Tuple[str, str], RankingIndex] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._recent: deque = deque()
+        self._refreshing: Dict[str, float] = {}
+
+    def cached(self, metric: str, period: str) -> RankingIndex:
+        return self._indexes.get((metric, period)) or RankingIndex()
+
+    async def get(self, metric: str, period: str) -> RankingIndex:
+        refreshed_at = self._refreshed_at.get(period)
+        if refreshed_at is None or time.monotonic() - refreshed_at > self.max_age:
+            await self.refresh(period)
+        return self.cached(metric, period)
+
+    async def refresh(self, period: str, primary: bool = False):
+        requested_at = time.monotonic()
+        lock = self._locks.setdefault(period, asyncio.Lock())
+        async with lock:
+            # Someone else refreshed this period while we were waiting
+            if self._refreshed_at.get(period, 0) >= requested_at:
+                return
+
+            self._refreshing[period] = requested_at
+            try:
+                since = window_start(period)
+                # Replica lag is made up for by replaying recent deltas
+                async with acquire_connection(not primary and reads_from_replica()) as conn:
+                    async with conn.transaction(isolation="repeatable_read", readonly=True):
+                        snapshot = await TXID_SNAPSHOT.fetchval(conn)
+                        if since is None:
+                            rows = await USER_STATS_ALL.fetch(conn)
+                        else:
+                            rows = await STATS_WINDOW_AGGREGATE.fetch(
+                                conn,
+                                list(WARFARE_EVENT_TYPES),
+                                list(TRAINING_EVENT_TYPES),
+                                since,
+                            )
+            finally:
+                del self._refreshing[period]
+
+            indexes = {
+                metric: RankingIndex({row["discord_id"]: row[counter] for row in rows})
+                for metric, (_, counter) in LEADERBOARD_METRICS.items()
+            }
+            for _, txid, deltas in self._recent:
+                if txid_visible(txid, snapshot):
+                    continue
+                for metric, index in indexes.items():
+                    counter = LEADERBOARD_METRICS[metric][1]
+                    for uid, delta in deltas.items():
+                        index.add(uid, delta.get(counter, 0))
+
+            for metric, index in indexes.items():
+                self._indexes[(metric, period)] = index
+            self._refreshed_at[period] = time.monotonic()
+            self._prune()
+
+    async def refresh_loaded(self, primary: bool = False):
+        """Rebuild every period that has been viewed at least once. `primary`
+        skips the replica, for changes that aren't replayed as deltas."""
+        for period in list(self._refreshed_at):
+            await self.refresh(period, primary)
+
+    def apply_deltas(self, deltas: Dict[int, Dict[str, int]], txid: Optional[int]):
+        for (metric, _), index in self._indexes.items():
+            counter = LEADERBOARD_METRICS[metric][1]
+            for uid, delta in deltas.items():
+                index.add(uid, delta.get(counter, 0))
+        if txid is not None:
+            self._recent.append((time.monotonic(), txid, deltas))
+            self._prune()
+
+    def _prune(self):
+        """Drop deltas no refresh could still be missing: older than the
+        replica lag allowance before the oldest refresh in progress."""
+        horizon = min([time.monotonic(), *self._refreshing.values()]) - self.replay_seconds
+        while self._recent and self._recent[0][0] < horizon:
+            self._recent.popleft()
+
+
+leaderboards = Leaderboards(LEADERBOARD_REFRESH_SECONDS, READ_AFTER_WRITE_SECONDS)
+
+
+@tasks.loop(seconds=LEADERBOARD_REFRESH_SECONDS)
+async def refresh_leaderboards():
+    try:
+        await leaderboards.refresh_loaded()
+    except Exception as e:
+        logger.error(f"Failed to refresh leaderboards: {e}")
+
+
+# =========================
+# PROMOTION SWEEP
+# =========================
+
+async def run_promotion_sweep(guild: discord.Guild) -> Tuple[int, int, int]:
+    """Check every ranked member of a guild and post one HiCom digest.
+
+    Returns (members checked, members ready, members newly announced).
+    """
+    if not guild.chunked:
+        await guild.chunk()
+
+    members = [m for m in guild.members if not m.bot]
+    candidates = await find_promotion_candidates(members)
+    announced = await post_promotion_digest(guild, candidates)
+    return len(members), len(candidates), len(announced)
+
+
+@tasks.loop(hours=PROMOTION_SWEEP_INTERVAL_HOURS or 24)
+async def scheduled_promotion_sweep():
+    for guild in bot.guilds:
+        try:
+            started = time.perf_counter()
+            checked, ready, announced = await run_promotion_sweep(guild)
+            logger.info(
+                f"Promotion sweep for {guild.name}: {ready}/{checked} ready, "
+                f"{announced} newly announced ({time.perf_counter() - started:.2f}s)"
+            )
+        except Exception as e:
+            logger.error(f"Promotion sweep failed for {guild.name}: {e}")
+
+
+# =========================
+# NOTIFICATIONS
+# =========================
+
+# Discord allows at most this many embeds in one message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+# Retry delays (seconds) grow as DM_RETRY_BASE_DELAY * 2**attempt
+DM_RETRY_BASE_DELAY = 2.0
+
+
+class PendingDM:
+    __slots__ = ("user", "embeds", "attempt", "queued_at")
+
+    def __init__(self, user: discord.abc.User, embeds: List[discord.Embed], attempt: int = 0):
+        self.user = user
+        self.embeds = embeds
+        self.attempt = attempt
+        self.queued_at = time.perf_counter()
+
+
+class NotificationDispatcher:
+    """Background DM delivery so interaction handlers never wait on Discord.
+
+    `send` only queues. Embeds queued for a user who is already waiting are
+    coalesced into that user's next message. A small worker pool drains the
+    queue, paced to DM_SENDS_PER_SECOND on top of discord.py's own per-route
+    rate limit handling. Server errors are retried with exponential backoff;
+    closed DMs (403) are not. Outcomes are counted in `stats`.
+
+    Each user has at most one delivery in flight (including a retry's
+    backoff), so their DMs arrive in the order they were queued. Embeds
+    queued meanwhile wait in `_pending` and are queued when it finishes.
+    """
+
+    def __init__(self, workers: int, sends_per_second: float, max_attempts: int):
+        self.workers = max(1, workers)
+        self.interval = 1.0 / sends_per_second if sends_per_second > 0 else 0.0
+        self.max_attempts = max(1, max_attempts)
+        self.stats = {"queued": 0, "coalesced": 0, "sent": 0, "retried": 0, "failed": 0, "forbidden": 0}
+        self._queue: "asyncio.Queue[int]" = asyncio.Queue()
+        self._pending: Dict[int, PendingDM] = {}
+        self._in_flight: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._next_slot = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"dm-worker-{i}") for i in range(self.workers)
+        ]
+
+    def send(self, user: discord.abc.User, *embeds: discord.Embed):
+        """Queue embeds for delivery to a user's DMs. Returns immediately."""
+        self.stats["queued"] += 1
+        self._enqueue(PendingDM(user, list(embeds)))
+
+    def _enqueue(self, item: PendingDM):
+        waiting = self._pending.get(item.user.id)
+        if waiting is not None:
+            # Retried embeds go first so the user sees them in order
+            if item.attempt:
+                waiting.embeds[:0] = item.embeds
+                waiting.attempt = max(waiting.attempt, item.attempt)
+            else:
+                waiting.embeds.extend(item.embeds)
+            self.stats["coalesced"] += 1
+            return
+        self._pending[item.user.id] = item
+        if item.user.id not in self._in_flight:
+            self._queue.put_nowait(item.user.id)
+
+    def _release(self, user_id: int):
+        """End a user's delivery and queue whatever arrived meanwhile"""
+        self._in_flight.discard(user_id)
+        if user_id in self._pending:
+            self._queue.put_nowait(user_id)
+
+    async def _throttle(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self):
+        while True:
+            user_id = await self._queue.get()
+            item = self._pending.pop(user_id, None)
+            retry_delay = None
+            try:
+                if item is not None:
+                    self._in_flight.add(user_id)
+                    retry_delay = await self._deliver(item)
+            except Exception as e:
+                logger.error(f"DM worker error for user {user_id}: {e}")
+            finally:
+                if item is not None:
+                    if retry_delay is None:
+                        self._release(user_id)
+                    else:
+                        asyncio.get_running_loop().call_later(retry_delay, self._release, user_id)
+                self._queue.task_done()
+
+    async def _deliver(self, item: PendingDM) -> Optional[float]:
+        """Send one user's embeds. Returns the backoff before the unsent
+        ones (put back in front of anything newer) may be retried."""
+        metrics.observe("notification", "dm_queue_wait", time.perf_counter() - item.queued_at)
+        sent = 0
+        try:
+            dm = item.user.dm_channel
+            if dm is None:
+                await self._throttle()
+                async with metrics.timed("discord_api", "create_dm"):
+                    dm = await item.user.create_dm()
+            for start in range(0, len(item.embeds), MAX_EMBEDS_PER_MESSAGE):
+                await self._throttle()
+                async with metrics.timed("discord_api", "dm_send"):
+                    await dm.send(embeds=item.embeds[start:start + MAX_EMBEDS_PER_MESSAGE])
+                sent = start + MAX_EMBEDS_PER_MESSAGE
+            self.stats["sent"] += 1
+        except discord.Forbidden:
+            # DMs closed or the bot is blocked; retrying will not help
+            self.stats["forbidden"] += 1
+        except (discord.HTTPException, OSError, asyncio.TimeoutError) as e:
+            status = getattr(e, "status", None)
+            item.embeds = item.embeds[sent:]
+            item.attempt += 1
+            if (status is None or status >= 500 or status == 429) and item.attempt < self.max_attempts:
+                self.stats["retried"] += 1
+                self._enqueue(item)
+                return DM_RETRY_BASE_DELAY * 2 ** (item.attempt - 1)
+            self.stats["failed"] += 1
+            logger.warning(f"Giving up on DM to {item.user} after {item.attempt} attempt(s): {e}")
+        return None
+
+
+background_tasks: Set[asyncio.Task] = set()
+
+
+def run_in_background(coro, name: str) -> asyncio.Task:
+    """Run a coroutine without awaiting it, keeping a reference and logging failures"""
+
+    def done(task: asyncio.Task):
+        background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task {name} failed: {task.exception()}")
+
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(done)
+    return task
+
+
+notifications = NotificationDispatcher(DM_WORKERS, DM_SENDS_PER_SECOND, DM_MAX_ATTEMPTS)
+metrics.collect("covenant_dm_pending", "Users with DMs waiting to be sent", lambda: len(notifications))
+for _outcome in ("sent", "retried", "failed", "forbidden", "coalesced"):
+    metrics.collect(
+        f"covenant_dm_{_outcome}_total",
+        f"DM deliveries {_outcome}",
+        lambda outcome=_outcome: notifications.stats[outcome],
+        "counter",
+    )
+
+
+ATTENDANCE_RECEIPTS_LOAD = queries.register("attendance_receipts_load", """
+    SELECT discord_id FROM users WHERE attendance_receipts;
+""")
+
+SET_ATTENDANCE_RECEIPTS = queries.register("set_attendance_receipts", """
+    INSERT INTO users (discord_id, attendance_receipts)
+    VALUES ($1, $2)
+    ON CONFLICT (discord_id) DO UPDATE SET attendance_receipts = EXCLUDED.attendance_receipts;
+""")
+
+
+class AttendanceReceipts:
+    """Members who opted in (!receipts on) to a DM whenever they are logged
+    at an event. Mirrored in memory so logging an event needs no lookup."""
+
+    def __init__(self):
+        self._subscribed: Set[int] = set()
+
+    def __contains__(self, discord_id: int) -> bool:
+        return discord_id in self._subscribed
+
+    async def load(self, conn: asyncpg.Connection):
+        rows = await ATTENDANCE_RECEIPTS_LOAD.fetch(conn)
+        self._subscribed = {row["discord_id"] for row in rows}
+
+    async def set(self, discord_id: int, enabled: bool):
+        async with acquire_connection() as conn:
+            await SET_ATTENDANCE_RECEIPTS.execute(conn, discord_id, enabled)
+        if enabled:
+            self._subscribed.add(discord_id)
+        else:
+            self._subscribed.discard(discord_id)
+
+
+attendance_receipts = AttendanceReceipts()
+
+
+async def send_attendance_receipts(
+    event_id: int,
+    event_type: str,
+    host: discord.abc.User,
+    attendees: List[discord.abc.User],
+):
+    """DM opted-in attendees their updated progress after an event is logged.
+
+    Cached stats are used as-is (log_event already applied the deltas); the
+    rest are read with one bulk query. Delivery goes through the dispatcher.
+    """
+    recipients = list({
+        user.id: user for user in attendees
+        if user.id in attendance_receipts and user.id != host.id and not user.bot
+    }.values())
+    if not recipients:
+        return
+
+    stats_by_id = await get_cached_bulk_user_stats([user.id for user in recipients])
+
+    for user in recipients:
+        receipt = create_styled_embed(
+            "📋 Attendance Recorded",
+            f"You were logged at a **{event_type.capitalize()}** event hosted by {host.mention}.\n"
+            f"**Event ID:** {event_id}",
+            UIStyle.COLOR_SUCCESS
+        )
+        receipt.set_footer(text="Turn these off with !receipts off")
+        stats = stats_by_id.get(user.id)
+        if stats is not None and isinstance(user, discord.Member):
+            notifications.send(user, receipt, create_progress_embed(user, stats))
+        else:
+            notifications.send(user, receipt)
+
+
+async def after_event_logged(
+    guild: Optional[discord.Guild],
+    event_id: int,
+    event_type: str,
+    host: discord.abc.User,
+    participants: List[discord.abc.User],
+):
+    """Follow-up work for a logged event, run off the officer's interaction.
+
+    Everyone logged (host, co-host, attendees) is re-evaluated for promotion
+    with one bulk stats read, and any newly eligible members go to HiCom in
+    a single digest. That read also fills the cache for the receipts.
+    """
+    if guild is not None:
+        member_ids = dict.fromkeys(user.id for user in [host] + participants)
+        members = [
+            member for member in (guild.get_member(member_id) for member_id in member_ids)
+            if member is not None
+        ]
+        candidates = await find_promotion_candidates(members, use_cache=True)
+        if candidates:
+            announced = await post_promotion_digest(
+                guild, candidates, title=f"🎉 Promotions Ready after Event #{event_id}"
+            )
+            if announced:
+                logger.info(f"Event {event_id}: announced {len(announced)} promotion(s)")
+
+    await send_attendance_receipts(event_id, event_type, host, participants)
+
+
+# =========================
+# UI DRAFTS
+# =========================
+
+UI_DRAFTS_EXPIRE = queries.register("ui_drafts_expire", """
+    DELETE FROM ui_drafts WHERE updated_at < $1;
+""")
+
+UI_DRAFTS_LOAD = queries.register("ui_drafts_load", """
+    SELECT owner_discord_id, kind, state FROM ui_drafts;
+""")
+
+UI_DRAFTS_SAVE = queries.register("ui_drafts_save", """
+    INSERT INTO ui_drafts (owner_discord_id, kind, state, updated_at)
+    VALUES ($1, $2, $3::jsonb, $4)
+    ON CONFLICT (owner_discord_id, kind)
+    DO UPDATE SET state = EXCLUDED.state, updated_at = EXCLUDED.updated_at;
+""")
+
+UI_DRAFTS_DISCARD = queries.register("ui_drafts_discard", """
+    DELETE FROM ui_drafts WHERE owner_discord_id = $1 AND kind = $2;
+""")
+
+
+class DraftStore:
+    """Half-finished menu flows (event logging, duel reports, challenges),
+    keyed by (owner_discord_id, kind).
+
+    The persistent views hold no per-message state; each step reads and
+    writes the clicking user's draft here instead. Drafts are written
+    through to the ui_drafts table so a restart mid-flow loses nothing,
+    and expire after DRAFT_TTL_HOURS.
+    """
+
+    def __init__(self, ttl_hours: float):
+        self.ttl = timedelta(hours=ttl_hours)
+        self._drafts: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._drafts)
+
+    async def load(self, conn: asyncpg.Connection):
+        await UI_DRAFTS_EXPIRE.execute(conn, discord.utils.utcnow() - self.ttl)
+        rows = await UI_DRAFTS_LOAD.fetch(conn)
+        self._drafts = {
+            (row["owner_discord_id"], row["kind"]): json.loads(row["state"]) for row in rows
+        }
+
+    def get(self, owner_id: int, kind: str) -> Optional[Dict[str, Any]]:
+        draft = self._drafts.get((owner_id, kind))
+        return dict(draft) if draft is not None else None
+
+    async def save(self, owner_id: int, kind: str, state: Dict[str, Any]):
+        self._drafts[(owner_id, kind)] = dict(state)
+        async with acquire_connection() as conn:
+            await UI_DRAFTS_SAVE.execute(
+                conn, owner_id, kind, json.dumps(state), discord.utils.utcnow()
+            )
+
+    async def pop(self, owner_id: int, kind: str) -> Optional[Dict[str, Any]]:
+        """Remove and return a draft. A concurrent second pop gets None."""
+        draft = self._drafts.pop((owner_id, kind), None)
+        if draft is not None:
+            try:
+                async with acquire_connection() as conn:
+                    await UI_DRAFTS_DISCARD.execute(conn, owner_id, kind)
+            except Exception:
+                # Still in ui_drafts, so keep serving it rather than have
+                # it reappear after the next restart
+                self._drafts.setdefault((owner_id, kind), draft)
+                raise
+        return draft
+
+
+drafts = DraftStore(DRAFT_TTL_HOURS)
+metrics.collect("covenant_ui_drafts", "Menu flows in progress", lambda: len(drafts))
+
+
+def render_only(view: ui.View) -> ui.View:
+    """Prepare a persistent view for sending.
+
+    Clicks are dispatched to the instance registered by
+    register_persistent_views, so the copy attached to a message is stopped
+    and never tracked per message.
+    """
+    view.stop()
+    return view
+
+
+async def send_draft_expired(interaction: discord.Interaction, flow: str):
+    embed = create_styled_embed(
+        "⏱️ Draft Expired",
+        f"This {flow} is no longer in progress. Open `!menu` to start again.",
+        UIStyle.COLOR_WARNING
+    )
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+def resolve_user(guild: Optional[discord.Guild], discord_id: int) -> Optional[discord.abc.User]:
+    """Member from the guild cache, falling back to the user cache"""
+    member = guild.get_member(discord_id) if guild is not None else None
+    return member or bot.get_user(discord_id)
+
+
+def register_persistent_views():
+    """Register one instance of every persistent view. Call once at startup."""
+    for view in (
+        MainMenuView(),
+        EventTypeSelectView(),
+        CoHostSelectView(),
+        AttendeeSelectView(),
+        DuelReportView(),
+        ChallengeSelectView(),
+        SupervisorSelectView(),
+        QuizConfirmView(),
+        DuelChallengeView(),
+    ):
+        bot.add_view(view)
+
+
 # =========================
 # ENHANCED UI COMPONENTS
 # =========================
@@ -589,33 +3311,25 @@ class UIStyle:
 
 
 class MainMenuView(ui.View):
-    """Main menu with buttons for all major features"""
+    """Main menu with buttons for all major features.
+
+    Persistent: never times out, and every button acts for whoever clicks
+    it, so one registered instance serves every menu message.
+    """
     
-    def __init__(self, ctx: commands.Context):
-        super().__init__(timeout=300)
-        self.ctx = ctx
-        self.is_officer = isinstance(ctx.author, discord.Member) and is_officer(ctx.author)
+    def __init__(self, show_officer_buttons: bool = True):
+        super().__init__(timeout=None)
         
         # Add buttons conditionally based on permissions
-        if self.is_officer:
+        if show_officer_buttons:
             self.add_item(LogEventButton())
             self.add_item(ReportDuelButton())
         
         self.add_item(ChallengeButton())
         self.add_item(ProgressButton())
+        self.add_item(LeaderboardButton())
         self.add_item(QuizButton())
         self.add_item(HelpButton())
-    
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.ctx.author.id
-    
-    async def on_timeout(self):
-        for item in self.children:
-            item.disabled = True
-        try:
-            await self.message.edit(view=self)
-        except:
-            pass
 
 
 class LogEventButton(ui.Button):
@@ -628,8 +3342,10 @@ class LogEventButton(ui.Button):
         )
     
     async def callback(self, interaction: discord.Interaction):
+        if not await require_officer(interaction):
+            return
         await interaction.response.defer()
-        view = EventTypeSelectView(interaction)
+        view = render_only(EventTypeSelectView())
         embed = create_styled_embed(
             "📋 Log Event",
             "Select the type of event you want to log:",
@@ -648,8 +3364,11 @@ class ReportDuelButton(ui.Button):
         )
     
     async def callback(self, interaction: discord.Interaction):
+        if not await require_officer(interaction):
+            return
         await interaction.response.defer()
-        view = DuelReportView(interaction)
+        await drafts.save(interaction.user.id, "duel_report", {})
+        view = render_only(DuelReportView())
         embed = create_styled_embed(
             "⚔️ Report Duel Result",
             "Select the winner and loser from the dropdowns below:",
@@ -669,7 +3388,7 @@ class ChallengeButton(ui.Button):
     
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        view = ChallengeSelectView(interaction)
+        view = render_only(ChallengeSelectView())
         embed = create_styled_embed(
             "⚔️ Challenge a Player",
             "Select the player you want to challenge from the dropdown below:",
@@ -687,8 +3406,10 @@ class ProgressButton(ui.Button):
             custom_id="progress"
         )
     
+    @metrics.instrument("view", "progress_button")
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
+        record_interaction_ack(interaction, "progress_button")
         
         stats = await get_user_stats(interaction.user.id)
         embed = create_progress_embed(interaction.user, stats)
@@ -734,17 +3455,50 @@ class QuizButton(ui.Button):
             return
         
         await interaction.response.defer(ephemeral=True)
-        await start_quiz_flow(interaction.user, interaction.guild)
+        try:
+            started = await quiz_sessions.start(interaction.user, interaction.guild)
+        except discord.HTTPException:
+            await interaction.followup.send(
+                embed=create_styled_embed(
+                    "Couldn't DM You",
+                    "Please enable direct messages from server members and try again.",
+                    UIStyle.COLOR_ERROR
+                ),
+                ephemeral=True
+            )
+            return
         await interaction.followup.send(
             embed=create_styled_embed(
-                "Quiz Started",
-                "Check your DMs! The quiz has been sent to you.",
+                "Quiz Started" if started else "Quiz In Progress",
+                "Check your DMs! The quiz has been sent to you."
+                if started else
+                "You already have a quiz in progress. Check your DMs to continue.",
                 UIStyle.COLOR_SUCCESS
             ),
             ephemeral=True
         )
 
 
+class LeaderboardButton(ui.Button):
+    def __init__(self):
+        super().__init__(
+            label="Leaderboard",
+            style=discord.ButtonStyle.success,
+            emoji="🏆",
+            custom_id="leaderboard"
+        )
+    
+    @metrics.instrument("view", "leaderboard_button")
+    async def callback(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        record_interaction_ack(interaction, "leaderboard_button")
+        await leaderboards.get("attended", "all")
+        view = LeaderboardView(interaction.user, "attended", "all")
+        view.message = await interaction.followup.send(
+            embed=view.build_embed(), view=view, ephemeral=True, wait=True
+        )
+
+
 class HelpButton(ui.Button):
     def __init__(self):
         super().__init__(
@@ -760,12 +3514,10 @@ class HelpButton(ui.Button):
 
 
 class EventTypeSelectView(ui.View):
-    """Interactive event type selection with buttons"""
+    """Interactive event type selection with buttons (persistent)"""
     
-    def __init__(self, interaction: discord.Interaction):
-        super().__init__(timeout=180)
-        self.interaction = interaction
-        self.selected_type = None
+    def __init__(self):
+        super().__init__(timeout=None)
         
         event_types = [
             ("Raid", "⚔️", discord.ButtonStyle.danger),
@@ -778,56 +3530,73 @@ class EventTypeSelectView(ui.View):
         ]
         
         for name, emoji, style in event_types:
-            button = ui.Button(label=name, emoji=emoji, style=style)
+            button = ui.Button(
+                label=name, emoji=emoji, style=style, custom_id=f"event_flow:type:{name.lower()}"
+            )
             button.callback = self.create_callback(name.lower())
             self.add_item(button)
     
     def create_callback(self, event_type: str):
         async def callback(interaction: discord.Interaction):
-            self.selected_type = event_type
             await interaction.response.defer()
-            await self.proceed_to_cohost(interaction)
+            # Picking a type starts a fresh draft for this officer
+            draft = {"event_type": event_type, "cohost_id": None, "attendee_ids": []}
+            await drafts.save(interaction.user.id, "event", draft)
+            await self.proceed_to_cohost(interaction, draft)
         return callback
     
-    async def proceed_to_cohost(self, interaction: discord.Interaction):
-        view = CoHostSelectView(self.interaction, self.selected_type)
+    async def proceed_to_cohost(self, interaction: discord.Interaction, draft: Dict[str, Any]):
+        view = render_only(CoHostSelectView())
         embed = create_styled_embed(
             "👥 Select Co-Host",
-            f"Event Type: **{self.selected_type.capitalize()}**\n\n"
+            f"Event Type: **{draft['event_type'].capitalize()}**\n\n"
             "Click below to select a co-host, or choose 'No Co-Host':",
             UIStyle.COLOR_PRIMARY
         )
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.interaction.user.id
+        return await require_officer(interaction)
 
 
 class CoHostSelectView(ui.View):
-    """Select co-host with user select menu"""
+    """Select co-host with user select menu (persistent, state in drafts)"""
     
-    def __init__(self, interaction: discord.Interaction, event_type: str):
-        super().__init__(timeout=180)
-        self.interaction = interaction
-        self.event_type = event_type
-        self.cohost = None
+    def __init__(self):
+        super().__init__(timeout=None)
         
         self.add_item(CoHostSelect())
         
-        no_cohost_btn = ui.Button(label="No Co-Host", style=discord.ButtonStyle.secondary)
+        no_cohost_btn = ui.Button(
+            label="No Co-Host", style=discord.ButtonStyle.secondary, custom_id="event_flow:no_cohost"
+        )
         no_cohost_btn.callback = self.no_cohost_callback
         self.add_item(no_cohost_btn)
     
     async def no_cohost_callback(self, interaction: discord.Interaction):
+        await self.set_cohost(interaction, None)
+    
+    async def set_cohost(self, interaction: discord.Interaction, cohost: Optional[discord.abc.User]):
+        draft = drafts.get(interaction.user.id, "event")
+        if draft is None:
+            await send_draft_expired(interaction, "event log")
+            return
         await interaction.response.defer()
-        await self.proceed_to_attendees(interaction)
+        draft["cohost_id"] = cohost.id if cohost else None
+        await drafts.save(interaction.user.id, "event", draft)
+        await self.proceed_to_attendees(interaction, draft, cohost)
     
-    async def proceed_to_attendees(self, interaction: discord.Interaction):
-        view = AttendeeSelectView(self.interaction, self.event_type, self.cohost)
-        cohost_text = f"@{self.cohost.display_name}" if self.cohost else "None"
+    async def proceed_to_attendees(
+        self,
+        interaction: discord.Interaction,
+        draft: Dict[str, Any],
+        cohost: Optional[discord.abc.User],
+    ):
+        view = render_only(AttendeeSelectView())
+        cohost_text = f"@{cohost.display_name}" if cohost else "None"
         embed = create_styled_embed(
             "👥 Select Attendees",
-            f"Event Type: **{self.event_type.capitalize()}**\n"
+            f"Event Type: **{draft['event_type'].capitalize()}**\n"
             f"Co-Host: **{cohost_text}**\n\n"
             "Select all attendees from the dropdown, then click 'Finish':",
             UIStyle.COLOR_PRIMARY
@@ -835,7 +3604,7 @@ class CoHostSelectView(ui.View):
         await interaction.followup.send(embed=embed, view=view, ephemeral=True)
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.interaction.user.id
+        return await require_officer(interaction)
 
 
 class CoHostSelect(ui.UserSelect):
@@ -843,36 +3612,43 @@ class CoHostSelect(ui.UserSelect):
         super().__init__(
             placeholder="Select co-host...",
             min_values=1,
-            max_values=1
+            max_values=1,
+            custom_id="event_flow:cohost"
         )
     
     async def callback(self, interaction: discord.Interaction):
         view: CoHostSelectView = self.view
-        view.cohost = self.values[0]
-        await interaction.response.defer()
-        await view.proceed_to_attendees(interaction)
+        await view.set_cohost(interaction, self.values[0])
 
 
 class AttendeeSelectView(ui.View):
-    """Select multiple attendees"""
+    """Select multiple attendees (persistent, state in drafts)"""
     
-    def __init__(self, interaction: discord.Interaction, event_type: str, cohost: Optional[discord.Member]):
-        super().__init__(timeout=300)
-        self.interaction = interaction
-        self.event_type = event_type
-        self.cohost = cohost
-        self.attendees = []
+    def __init__(self):
+        super().__init__(timeout=None)
         
         self.add_item(AttendeeSelect())
         
-        finish_btn = ui.Button(label="Finish & Log Event", style=discord.ButtonStyle.success, emoji="✅")
+        finish_btn = ui.Button(
+            label="Finish & Log Event",
+            style=discord.ButtonStyle.success,
+            emoji="✅",
+            custom_id="event_flow:finish"
+        )
         finish_btn.callback = self.finish_callback
         self.add_item(finish_btn)
     
+    @metrics.instrument("view", "log_event_finish")
     async def finish_callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
+        record_interaction_ack(interaction, "log_event_finish")
+        
+        draft = drafts.get(interaction.user.id, "event")
+        if draft is None:
+            await send_draft_expired(interaction, "event log")
+            return
         
-        if not self.attendees:
+        if not draft["attendee_ids"]:
             await interaction.followup.send(
                 embed=create_styled_embed(
                     "No Attendees",
@@ -883,37 +3659,63 @@ class AttendeeSelectView(ui.View):
             )
             return
         
+        # Claim the draft so a double click can't log the event twice
+        draft = await drafts.pop(interaction.user.id, "event")
+        if draft is None:
+            return
+        
+        event_type = draft["event_type"]
+        cohost_id = draft["cohost_id"]
+        attendees = draft["attendee_ids"]
+        
         # Log the event
-        attendee_ids = [a.id for a in self.attendees]
+        attendee_ids = list(attendees)
         attendee_ids.append(interaction.user.id)  # Host
-        if self.cohost:
-            attendee_ids.append(self.cohost.id)
+        if cohost_id:
+            attendee_ids.append(cohost_id)
         
-        event_id = await log_event(
-            self.event_type,
-            interaction.user.id,
-            self.cohost.id if self.cohost else None,
-            attendee_ids
-        )
+        try:
+            event_id = await log_event(event_type, interaction.user.id, cohost_id, attendee_ids)
+        except Exception:
+            await drafts.save(interaction.user.id, "event", draft)
+            raise
         
-        cohost_text = f"Co-Host: {self.cohost.mention}" if self.cohost else "No Co-Host"
-        attendee_list = ", ".join([a.mention for a in self.attendees[:10]])
-        if len(self.attendees) > 10:
-            attendee_list += f" and {len(self.attendees) - 10} more"
+        cohost_text = f"Co-Host: <@{cohost_id}>" if cohost_id else "No Co-Host"
+        attendee_list = ", ".join([f"<@{a}>" for a in attendees[:10]])
+        if len(attendees) > 10:
+            attendee_list += f" and {len(attendees) - 10} more"
         
         embed = create_styled_embed(
             "✅ Event Logged Successfully",
             f"**Event ID:** {event_id}\n"
-            f"**Type:** {self.event_type.capitalize()}\n"
+            f"**Type:** {event_type.capitalize()}\n"
             f"**Host:** {interaction.user.mention}\n"
             f"**{cohost_text}**\n"
-            f"**Attendees ({len(self.attendees)}):** {attendee_list}",
+            f"**Attendees ({len(attendees)}):** {attendee_list}",
             UIStyle.COLOR_SUCCESS
         )
         await interaction.followup.send(embed=embed)
+
+        participants = [
+            user for user in (
+                resolve_user(interaction.guild, discord_id)
+                for discord_id in attendees + ([cohost_id] if cohost_id else [])
+            )
+            if user is not None
+        ]
+        run_in_background(
+            after_event_logged(
+                interaction.guild,
+                event_id,
+                event_type,
+                interaction.user,
+                participants,
+            ),
+            name=f"after-event-{event_id}",
+        )
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.interaction.user.id
+        return await require_officer(interaction)
 
 
 class AttendeeSelect(ui.UserSelect):
@@ -921,25 +3723,35 @@ class AttendeeSelect(ui.UserSelect):
         super().__init__(
             placeholder="Select attendees (you can select multiple times)...",
             min_values=1,
-            max_values=25
+            max_values=25,
+            custom_id="event_flow:attendees"
         )
     
     async def callback(self, interaction: discord.Interaction):
-        view: AttendeeSelectView = self.view
+        draft = drafts.get(interaction.user.id, "event")
+        if draft is None:
+            await send_draft_expired(interaction, "event log")
+            return
         
         # Add new attendees
+        attendee_ids = draft["attendee_ids"]
         for user in self.values:
-            if user not in view.attendees:
-                view.attendees.append(user)
+            if user.id not in attendee_ids:
+                attendee_ids.append(user.id)
+        await drafts.save(interaction.user.id, "event", draft)
         
-        attendee_names = ", ".join([a.display_name for a in view.attendees[:20]])
-        if len(view.attendees) > 20:
-            attendee_names += f" and {len(view.attendees) - 20} more"
+        names = []
+        for discord_id in attendee_ids[:20]:
+            user = resolve_user(interaction.guild, discord_id)
+            names.append(user.display_name if user else f"<@{discord_id}>")
+        attendee_names = ", ".join(names)
+        if len(attendee_ids) > 20:
+            attendee_names += f" and {len(attendee_ids) - 20} more"
         
         await interaction.response.send_message(
             embed=create_styled_embed(
                 "Attendees Updated",
-                f"**Total selected:** {len(view.attendees)}\n"
+                f"**Total selected:** {len(attendee_ids)}\n"
                 f"**Members:** {attendee_names}\n\n"
                 "Select more or click 'Finish & Log Event' when done.",
                 UIStyle.COLOR_SUCCESS
@@ -948,121 +3760,380 @@ class AttendeeSelect(ui.UserSelect):
         )
 
 
+# Seconds a challenged player has to accept or decline
+DUEL_CHALLENGE_TIMEOUT = 60
+
+# Text replies accepted in place of the buttons
+CHALLENGE_REPLIES = {"yes": True, "y": True, "accept": True, "no": False, "n": False, "decline": False}
+
+
+class PendingChallenge:
+    __slots__ = (
+        "id", "channel_id", "message_id", "challenger_id", "opponent_id",
+        "supervisor_id", "duel_link", "expires_at",
+    )
+
+    def __init__(self, record: asyncpg.Record):
+        for name in self.__slots__:
+            setattr(self, name, record[name])
+
+
+INSERT_DUEL_CHALLENGE = queries.register("insert_duel_challenge", """
+    INSERT INTO duel_challenges
+        (channel_id, challenger_id, opponent_id, supervisor_id, duel_link, expires_at)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT DO NOTHING
+    RETURNING id, channel_id, message_id, challenger_id, opponent_id,
+              supervisor_id, duel_link, expires_at;
+""")
+
+SET_DUEL_CHALLENGE_MESSAGE = queries.register("set_duel_challenge_message", """
+    UPDATE duel_challenges SET message_id = $2 WHERE id = $1;
+""")
+
+RESOLVE_DUEL_CHALLENGE = queries.register("resolve_duel_challenge", """
+    UPDATE duel_challenges
+    SET status = $2, resolved_at = now()
+    WHERE id = $1 AND status = 'pending'
+    RETURNING id;
+""")
+
+DUEL_CHALLENGES_LOAD_PENDING = queries.register("duel_challenges_load_pending", """
+    SELECT id, channel_id, message_id, challenger_id, opponent_id,
+           supervisor_id, duel_link, expires_at
+    FROM duel_challenges
+    WHERE status = 'pending';
+""")
+
+
+class ChallengeRegistry:
+    """Open duel challenges, indexed by (channel_id, opponent_id) for text
+    replies and by message id for the accept/decline buttons.
+
+    A player can have one open challenge per channel (enforced by a partial
+    unique index), and `resolve` only succeeds once per challenge, so a
+    button click racing a text reply or the expiry loop is harmless.
+    """
+
+    def __init__(self):
+        self._by_target: Dict[Tuple[int, int], PendingChallenge] = {}
+        self._by_message: Dict[int, PendingChallenge] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_target)
+
+    def for_reply(self, channel_id: int, author_id: int) -> Optional[PendingChallenge]:
+        return self._by_target.get((channel_id, author_id))
+
+    def for_message(self, message_id: int) -> Optional[PendingChallenge]:
+        return self._by_message.get(message_id)
+
+    def _track(self, challenge: PendingChallenge):
+        self._by_target[(challenge.channel_id, challenge.opponent_id)] = challenge
+        if challenge.message_id is not None:
+            self._by_message[challenge.message_id] = challenge
+
+    def _forget(self, challenge: PendingChallenge):
+        self._by_target.pop((challenge.channel_id, challenge.opponent_id), None)
+        if challenge.message_id is not None:
+            self._by_message.pop(challenge.message_id, None)
+
+    async def load(self, conn: asyncpg.Connection):
+        rows = await DUEL_CHALLENGES_LOAD_PENDING.fetch(conn)
+        self._by_target = {}
+        self._by_message = {}
+        for row in rows:
+            self._track(PendingChallenge(row))
+
+    async def create(
+        self,
+        channel_id: int,
+        challenger_id: int,
+        opponent_id: int,
+        supervisor_id: Optional[int],
+        duel_link: str,
+    ) -> Optional[PendingChallenge]:
+        """Open a challenge. Returns None if the opponent already has one
+        open in this channel."""
+        if (channel_id, opponent_id) in self._by_target:
+            return None
+        expires_at = discord.utils.utcnow() + timedelta(seconds=DUEL_CHALLENGE_TIMEOUT)
+        async with acquire_connection() as conn:
+            row = await INSERT_DUEL_CHALLENGE.fetchrow(
+                conn, channel_id, challenger_id, opponent_id, supervisor_id, duel_link, expires_at
+            )
+        if row is None:
+            return None
+        challenge = PendingChallenge(row)
+        self._track(challenge)
+        return challenge
+
+    async def attach_message(self, challenge: PendingChallenge, message_id: int):
+        challenge.message_id = message_id
+        self._by_message[message_id] = challenge
+        async with acquire_connection() as conn:
+            await SET_DUEL_CHALLENGE_MESSAGE.execute(conn, challenge.id, message_id)
+
+    async def resolve(self, challenge: PendingChallenge, status: str) -> bool:
+        """Close a challenge as accepted/declined/expired. Only the first
+        caller gets True."""
+        if self._by_target.get((challenge.channel_id, challenge.opponent_id)) is not challenge:
+            return False
+        # Forgotten first so a concurrent resolve can't claim it too; put
+        # back if the row is still pending, or its open slot stays blocked
+        self._forget(challenge)
+        try:
+            async with acquire_connection() as conn:
+                resolved = await RESOLVE_DUEL_CHALLENGE.fetchval(conn, challenge.id, status)
+        except Exception:
+            self._track(challenge)
+            raise
+        return resolved is not None
+
+    def due(self) -> List[PendingChallenge]:
+        now = discord.utils.utcnow()
+        return [c for c in self._by_target.values() if c.expires_at <= now]
+
+
+challenges = ChallengeRegistry()
+metrics.collect("covenant_duel_challenges_open", "Open duel challenges", lambda: len(challenges))
+
+
+async def open_duel_challenge(
+    challenger: discord.abc.User,
+    opponent: discord.Member,
+    channel: discord.TextChannel,
+    duel_link: str,
+    supervisor: Optional[discord.abc.User],
+) -> bool:
+    """Post a duel challenge with accept/decline buttons and return at once.
+
+    The answer arrives through DuelChallengeView or route_message, and
+    expire_duel_challenges closes it if nobody answers in time. Returns
+    False if the opponent already has a challenge open in this channel.
+    """
+    challenge = await challenges.create(
+        channel.id, challenger.id, opponent.id, supervisor.id if supervisor else None, duel_link
+    )
+    if challenge is None:
+        return False
+
+    supervisor_text = f"\n**Supervising Officer:** {supervisor.mention}" if supervisor else ""
+    
+    challenge_embed = create_styled_embed(
+        "⚔️ Duel Challenge!",
+        f"{opponent.mention}, you have been challenged to a duel by {challenger.mention}!{supervisor_text}\n\n"
+        "**Respond with the buttons below, or:**\n"
+        "• `yes` or `accept` to accept the challenge\n"
+        "• `no` or `decline` to decline\n\n"
+        f"⏱️ You have {DUEL_CHALLENGE_TIMEOUT} seconds to respond...",
+        UIStyle.COLOR_WARNING
+    )
+    challenge_embed.set_thumbnail(url=challenger.display_avatar.url if challenger.display_avatar else None)
+    
+    try:
+        message = await channel.send(embed=challenge_embed, view=render_only(DuelChallengeView()))
+    except Exception:
+        await challenges.resolve(challenge, "expired")
+        raise
+    await challenges.attach_message(challenge, message.id)
+    return True
+
+
+async def answer_duel_challenge(challenge: PendingChallenge, status: str):
+    """Announce the outcome of a challenge that was just resolved"""
+    channel = bot.get_channel(challenge.channel_id)
+    if not isinstance(channel, discord.TextChannel):
+        return
+    guild = channel.guild
+    challenger = resolve_user(guild, challenge.challenger_id)
+    opponent = resolve_user(guild, challenge.opponent_id)
+    supervisor = resolve_user(guild, challenge.supervisor_id) if challenge.supervisor_id else None
+    opponent_mention = opponent.mention if opponent else f"<@{challenge.opponent_id}>"
+
+    # The buttons are spent either way
+    if challenge.message_id is not None:
+        try:
+            await channel.get_partial_message(challenge.message_id).edit(
+                view=render_only(DuelChallengeView(disabled=True))
+            )
+        except discord.HTTPException:
+            pass
+
+    if status == "expired":
+        timeout_embed = create_styled_embed(
+            "⏱️ Challenge Expired",
+            f"{opponent_mention} did not respond in time.\n\n"
+            f"The duel challenge has been cancelled.",
+            UIStyle.COLOR_ERROR
+        )
+        await channel.send(embed=timeout_embed)
+        return
+
+    if status == "declined":
+        declined_embed = create_styled_embed(
+            "❌ Challenge Declined",
+            f"{opponent_mention} has declined the duel challenge.",
+            UIStyle.COLOR_ERROR
+        )
+        await channel.send(embed=declined_embed)
+        return
+
+    # Accepted
+    accepted_embed = create_styled_embed(
+        "✅ Challenge Accepted!",
+        f"{opponent_mention} has accepted the duel!\n\n"
+        "📨 Both players and the supervising officer will receive a DM with the duel link.",
+        UIStyle.COLOR_SUCCESS
+    )
+    await channel.send(embed=accepted_embed)
+    if challenger is None or opponent is None:
+        return
+    duel_link = challenge.duel_link
+
+    # Send DM to participants and supervisor
+    recipients = [challenger, opponent]
+    if supervisor:
+        recipients.append(supervisor)
+
+    for user in recipients:
+        if user == supervisor:
+            # Special message for supervisor
+            dm_embed = create_styled_embed(
+                "👁️ Duel Supervision Request",
+                f"You have been selected to supervise a duel!\n\n"
+                f"**Challenger:** {challenger.mention}\n"
+                f"**Challenged:** {opponent.mention}\n\n"
+                f"**Duel Link:** {duel_link}\n\n"
+                "Please join to observe and ensure fair play. 🛡️",
+                UIStyle.COLOR_INFO
+            )
+        else:
+            # Message for participants
+            supervisor_info = f"\n**Supervising Officer:** {supervisor.mention}" if supervisor else ""
+            dm_embed = create_styled_embed(
+                "⚔️ Duel Information",
+                f"**Match:** {challenger.mention} vs {opponent.mention}{supervisor_info}\n\n"
+                f"**Duel Link:** {duel_link}\n\n"
+                "Good luck! May the best player win! 🎮",
+                UIStyle.COLOR_PRIMARY
+            )
+
+        dm_embed.add_field(
+            name="📋 After the Duel",
+            value="An officer will use the menu to report the results.",
+            inline=False
+        )
+        notifications.send(user, dm_embed)
+
+
+async def respond_to_challenge(challenge: PendingChallenge, accepted: bool) -> bool:
+    """Accept or decline a challenge. False if it was already answered."""
+    status = "accepted" if accepted else "declined"
+    if not await challenges.resolve(challenge, status):
+        return False
+    await answer_duel_challenge(challenge, status)
+    return True
+
+
+@tasks.loop(seconds=10)
+async def expire_duel_challenges():
+    for challenge in challenges.due():
+        try:
+            if await challenges.resolve(challenge, "expired"):
+                await answer_duel_challenge(challenge, "expired")
+        except Exception as e:
+            logger.error(f"Failed to expire duel challenge {challenge.id}: {e}")
+
+
+class DuelChallengeView(ui.View):
+    """Accept/decline buttons on a challenge (persistent; the challenge is
+    looked up by message id)"""
+    
+    def __init__(self, disabled: bool = False):
+        super().__init__(timeout=None)
+        for item in self.children:
+            item.disabled = disabled
+    
+    @discord.ui.button(label="Accept", emoji="✅", style=discord.ButtonStyle.success, custom_id="duel_challenge:accept")
+    async def accept_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.respond(interaction, True)
+    
+    @discord.ui.button(label="Decline", emoji="❌", style=discord.ButtonStyle.danger, custom_id="duel_challenge:decline")
+    async def decline_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.respond(interaction, False)
+    
+    async def respond(self, interaction: discord.Interaction, accepted: bool):
+        challenge = challenges.for_message(interaction.message.id)
+        if challenge is None:
+            await interaction.response.send_message(
+                "This challenge is no longer open.", ephemeral=True
+            )
+            return
+        if interaction.user.id != challenge.opponent_id:
+            await interaction.response.send_message(
+                "Only the challenged player can answer this challenge.", ephemeral=True
+            )
+            return
+        await interaction.response.defer()
+        await respond_to_challenge(challenge, accepted)
+
+
 class SupervisorSelectView(ui.View):
-    """Select supervising officer for duel"""
+    """Select supervising officer for duel (persistent, state in drafts)"""
     
-    def __init__(self, opponent: discord.Member, challenger: discord.User, channel: discord.TextChannel, duel_link: str):
-        super().__init__(timeout=180)
-        self.opponent = opponent
-        self.challenger = challenger
-        self.channel = channel
-        self.duel_link = duel_link
-        self.supervisor = None
+    def __init__(self):
+        super().__init__(timeout=None)
         
         self.add_item(SupervisorSelect())
         
-        no_supervisor_btn = ui.Button(label="No Supervisor (Optional)", style=discord.ButtonStyle.secondary)
+        no_supervisor_btn = ui.Button(
+            label="No Supervisor (Optional)",
+            style=discord.ButtonStyle.secondary,
+            custom_id="challenge_flow:no_supervisor"
+        )
         no_supervisor_btn.callback = self.no_supervisor_callback
         self.add_item(no_supervisor_btn)
     
     async def no_supervisor_callback(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        await self.proceed_with_challenge(interaction)
-    
-    async def proceed_with_challenge(self, interaction: discord.Interaction):
-        # Send challenge to the channel
-        def response_check(m: discord.Message):
-            return (
-                m.author.id == self.opponent.id
-                and m.channel == self.channel
-                and m.content.lower() in ("yes", "no", "y", "n", "accept", "decline")
-            )
-
-        supervisor_text = f"\n**Supervising Officer:** {self.supervisor.mention}" if self.supervisor else ""
-        
-        challenge_embed = create_styled_embed(
-            "⚔️ Duel Challenge!",
-            f"{self.opponent.mention}, you have been challenged to a duel by {self.challenger.mention}!{supervisor_text}\n\n"
-            "**Respond with:**\n"
-            "• `yes` or `accept` to accept the challenge\n"
-            "• `no` or `decline` to decline\n\n"
-            f"⏱️ You have 60 seconds to respond...",
-            UIStyle.COLOR_WARNING
-        )
-        challenge_embed.set_thumbnail(url=self.challenger.display_avatar.url if self.challenger.display_avatar else None)
-        
-        await self.channel.send(embed=challenge_embed)
-
-        try:
-            reply = await bot.wait_for("message", check=response_check, timeout=60)
-        except asyncio.TimeoutError:
-            timeout_embed = create_styled_embed(
-                "⏱️ Challenge Expired",
-                f"{self.opponent.mention} did not respond in time.\n\n"
-                f"The duel challenge has been cancelled.",
-                UIStyle.COLOR_ERROR
-            )
-            await self.channel.send(embed=timeout_embed)
+        await self.proceed_with_challenge(interaction, None)
+    
+    async def proceed_with_challenge(
+        self,
+        interaction: discord.Interaction,
+        supervisor: Optional[discord.abc.User],
+    ):
+        draft = await drafts.pop(interaction.user.id, "challenge")
+        if draft is None:
+            await send_draft_expired(interaction, "challenge")
             return
-
-        answer = reply.content.lower()
-        if answer in ("no", "n", "decline"):
-            declined_embed = create_styled_embed(
-                "❌ Challenge Declined",
-                f"{self.opponent.mention} has declined the duel challenge.",
-                UIStyle.COLOR_ERROR
+        
+        guild = interaction.guild
+        opponent = guild.get_member(draft["opponent_id"]) if guild else None
+        channel = guild.get_channel(draft["channel_id"]) if guild else None
+        if opponent is None or not isinstance(channel, discord.TextChannel):
+            await interaction.followup.send(
+                embed=create_styled_embed(
+                    "Challenge Cancelled",
+                    "The opponent or the channel is no longer available.",
+                    UIStyle.COLOR_ERROR
+                ),
+                ephemeral=True
             )
-            await self.channel.send(embed=declined_embed)
             return
-
-        # Accepted
-        accepted_embed = create_styled_embed(
-            "✅ Challenge Accepted!",
-            f"{self.opponent.mention} has accepted the duel!\n\n"
-            "📨 Both players and the supervising officer will receive a DM with the duel link.",
-            UIStyle.COLOR_SUCCESS
-        )
-        await self.channel.send(embed=accepted_embed)
-
-        # Send DM to participants and supervisor
-        recipients = [self.challenger, self.opponent]
-        if self.supervisor:
-            recipients.append(self.supervisor)
         
-        for user in recipients:
-            try:
-                dm = await user.create_dm()
-                
-                if user == self.supervisor:
-                    # Special message for supervisor
-                    dm_embed = create_styled_embed(
-                        "👁️ Duel Supervision Request",
-                        f"You have been selected to supervise a duel!\n\n"
-                        f"**Challenger:** {self.challenger.mention}\n"
-                        f"**Challenged:** {self.opponent.mention}\n\n"
-                        f"**Duel Link:** {self.duel_link}\n\n"
-                        "Please join to observe and ensure fair play. 🛡️",
-                        UIStyle.COLOR_INFO
-                    )
-                else:
-                    # Message for participants
-                    supervisor_info = f"\n**Supervising Officer:** {self.supervisor.mention}" if self.supervisor else ""
-                    dm_embed = create_styled_embed(
-                        "⚔️ Duel Information",
-                        f"**Match:** {self.challenger.mention} vs {self.opponent.mention}{supervisor_info}\n\n"
-                        f"**Duel Link:** {self.duel_link}\n\n"
-                        "Good luck! May the best player win! 🎮",
-                        UIStyle.COLOR_PRIMARY
-                    )
-                
-                dm_embed.add_field(
-                    name="📋 After the Duel",
-                    value="An officer will use the menu to report the results.",
-                    inline=False
-                )
-                await dm.send(embed=dm_embed)
-            except Exception:
-                pass
+        opened = await open_duel_challenge(interaction.user, opponent, channel, draft["duel_link"], supervisor)
+        if not opened:
+            await interaction.followup.send(
+                embed=create_styled_embed(
+                    "Challenge Already Open",
+                    f"{opponent.mention} already has a pending challenge in {channel.mention}. "
+                    "Wait for it to be answered or expire.",
+                    UIStyle.COLOR_WARNING
+                ),
+                ephemeral=True
+            )
 
 
 class SupervisorSelect(ui.UserSelect):
@@ -1070,24 +4141,25 @@ class SupervisorSelect(ui.UserSelect):
         super().__init__(
             placeholder="Select supervising officer (optional)...",
             min_values=1,
-            max_values=1
+            max_values=1,
+            custom_id="challenge_flow:supervisor"
         )
     
     async def callback(self, interaction: discord.Interaction):
         view: SupervisorSelectView = self.view
-        view.supervisor = self.values[0]
+        supervisor = self.values[0]
         
         await interaction.response.send_message(
             embed=create_styled_embed(
                 "Supervisor Selected",
-                f"Supervising Officer: {view.supervisor.mention}\n\n"
+                f"Supervising Officer: {supervisor.mention}\n\n"
                 "Proceeding with challenge...",
                 UIStyle.COLOR_SUCCESS
             ),
             ephemeral=True
         )
         
-        await view.proceed_with_challenge(interaction)
+        await view.proceed_with_challenge(interaction, supervisor)
 
 
 class DuelLinkModal(ui.Modal, title="Enter Duel Link"):
@@ -1124,7 +4196,12 @@ class DuelLinkModal(ui.Modal, title="Enter Duel Link"):
         
         # Now ask for supervising officer
         await interaction.response.defer()
-        view = SupervisorSelectView(self.opponent, self.challenger, self.channel, duel_link)
+        await drafts.save(
+            self.challenger.id,
+            "challenge",
+            {"opponent_id": self.opponent.id, "channel_id": self.channel.id, "duel_link": duel_link},
+        )
+        view = render_only(SupervisorSelectView())
         embed = create_styled_embed(
             "👁️ Select Supervising Officer",
             "Select an officer to supervise this duel, or click 'No Supervisor' to continue without one.\n\n"
@@ -1135,15 +4212,11 @@ class DuelLinkModal(ui.Modal, title="Enter Duel Link"):
 
 
 class ChallengeSelectView(ui.View):
-    """Select opponent for challenge"""
+    """Select opponent for challenge (persistent)"""
     
-    def __init__(self, interaction: discord.Interaction):
-        super().__init__(timeout=180)
-        self.interaction = interaction
+    def __init__(self):
+        super().__init__(timeout=None)
         self.add_item(OpponentSelect())
-    
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.interaction.user.id
 
 
 class OpponentSelect(ui.UserSelect):
@@ -1151,7 +4224,8 @@ class OpponentSelect(ui.UserSelect):
         super().__init__(
             placeholder="Select opponent to challenge...",
             min_values=1,
-            max_values=1
+            max_values=1,
+            custom_id="challenge_flow:opponent"
         )
     
     async def callback(self, interaction: discord.Interaction):
@@ -1186,23 +4260,30 @@ class OpponentSelect(ui.UserSelect):
 
 
 class DuelReportView(ui.View):
-    """Report duel results with winner/loser selection"""
+    """Report duel results with winner/loser selection (persistent, state in drafts)"""
     
-    def __init__(self, interaction: discord.Interaction):
-        super().__init__(timeout=180)
-        self.interaction = interaction
-        self.winner = None
-        self.loser = None
+    def __init__(self):
+        super().__init__(timeout=None)
         
         self.add_item(WinnerSelect())
         self.add_item(LoserSelect())
         
-        submit_btn = ui.Button(label="Submit Result", style=discord.ButtonStyle.success, emoji="✅")
+        submit_btn = ui.Button(
+            label="Submit Result",
+            style=discord.ButtonStyle.success,
+            emoji="✅",
+            custom_id="duel_report:submit"
+        )
         submit_btn.callback = self.submit_callback
         self.add_item(submit_btn)
     
+    @metrics.instrument("view", "duel_report_submit")
     async def submit_callback(self, interaction: discord.Interaction):
-        if not self.winner or not self.loser:
+        draft = drafts.get(interaction.user.id, "duel_report") or {}
+        winner = resolve_user(interaction.guild, draft["winner_id"]) if draft.get("winner_id") else None
+        loser = resolve_user(interaction.guild, draft["loser_id"]) if draft.get("loser_id") else None
+        
+        if not winner or not loser:
             await interaction.response.send_message(
                 embed=create_styled_embed(
                     "Missing Information",
@@ -1213,7 +4294,7 @@ class DuelReportView(ui.View):
             )
             return
         
-        if self.winner.id == self.loser.id:
+        if winner.id == loser.id:
             await interaction.response.send_message(
                 embed=create_styled_embed(
                     "Invalid Result",
@@ -1225,55 +4306,61 @@ class DuelReportView(ui.View):
             return
         
         await interaction.response.defer()
+        record_interaction_ack(interaction, "duel_report_submit")
+        
+        # Claim the draft so a double click can't record the duel twice
+        draft = await drafts.pop(interaction.user.id, "duel_report")
+        if draft is None:
+            return
         
-        await log_duel_result(self.winner.id, self.loser.id)
+        try:
+            await log_duel_result(winner.id, loser.id)
+        except Exception:
+            await drafts.save(interaction.user.id, "duel_report", draft)
+            raise
         
         result_embed = create_styled_embed(
             "✅ Duel Result Recorded",
-            f"**Winner:** {self.winner.mention} 🏆\n"
-            f"**Loser:** {self.loser.mention}\n\n"
+            f"**Winner:** {winner.mention} 🏆\n"
+            f"**Loser:** {loser.mention}\n\n"
             f"Recorded by: {interaction.user.mention}",
             UIStyle.COLOR_SUCCESS
         )
-        result_embed.set_thumbnail(url=self.winner.display_avatar.url if self.winner.display_avatar else None)
+        result_embed.set_thumbnail(url=winner.display_avatar.url if winner.display_avatar else None)
         
         await interaction.channel.send(embed=result_embed)
         
         # Notify participants
-        for user, is_winner in [(self.winner, True), (self.loser, False)]:
-            try:
-                dm = await user.create_dm()
-                if is_winner:
-                    dm_embed = create_styled_embed(
-                        "🏆 Duel Victory!",
-                        f"Congratulations! Your duel victory has been recorded.\n\n"
-                        f"**Opponent:** {self.loser.mention}\n"
-                        f"**Recorded by:** {interaction.user.mention}",
-                        UIStyle.COLOR_SUCCESS
-                    )
-                else:
-                    dm_embed = create_styled_embed(
-                        "⚔️ Duel Result",
-                        f"Your duel result has been recorded.\n\n"
-                        f"**Opponent:** {self.winner.mention}\n"
-                        f"**Recorded by:** {interaction.user.mention}",
-                        UIStyle.COLOR_INFO
-                    )
-                await dm.send(embed=dm_embed)
-            except Exception:
-                pass
+        for user, is_winner in [(winner, True), (loser, False)]:
+            if is_winner:
+                dm_embed = create_styled_embed(
+                    "🏆 Duel Victory!",
+                    f"Congratulations! Your duel victory has been recorded.\n\n"
+                    f"**Opponent:** {loser.mention}\n"
+                    f"**Recorded by:** {interaction.user.mention}",
+                    UIStyle.COLOR_SUCCESS
+                )
+            else:
+                dm_embed = create_styled_embed(
+                    "⚔️ Duel Result",
+                    f"Your duel result has been recorded.\n\n"
+                    f"**Opponent:** {winner.mention}\n"
+                    f"**Recorded by:** {interaction.user.mention}",
+                    UIStyle.COLOR_INFO
+                )
+            notifications.send(user, dm_embed)
         
         await interaction.followup.send(
             embed=create_styled_embed(
                 "✅ Complete",
-                "Duel result has been recorded and participants have been notified!",
+                "Duel result has been recorded and participants are being notified!",
                 UIStyle.COLOR_SUCCESS
             ),
             ephemeral=True
         )
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        return interaction.user.id == self.interaction.user.id
+        return await require_officer(interaction)
 
 
 class WinnerSelect(ui.UserSelect):
@@ -1282,16 +4369,19 @@ class WinnerSelect(ui.UserSelect):
             placeholder="Select winner...",
             min_values=1,
             max_values=1,
-            row=0
+            row=0,
+            custom_id="duel_report:winner"
         )
     
     async def callback(self, interaction: discord.Interaction):
-        view: DuelReportView = self.view
-        view.winner = self.values[0]
+        winner = self.values[0]
+        draft = drafts.get(interaction.user.id, "duel_report") or {}
+        draft["winner_id"] = winner.id
+        await drafts.save(interaction.user.id, "duel_report", draft)
         await interaction.response.send_message(
             embed=create_styled_embed(
                 "Winner Selected",
-                f"Winner: {view.winner.mention}\n\n"
+                f"Winner: {winner.mention}\n\n"
                 "Now select the loser and click 'Submit Result'.",
                 UIStyle.COLOR_SUCCESS
             ),
@@ -1305,16 +4395,19 @@ class LoserSelect(ui.UserSelect):
             placeholder="Select loser...",
             min_values=1,
             max_values=1,
-            row=1
+            row=1,
+            custom_id="duel_report:loser"
         )
     
     async def callback(self, interaction: discord.Interaction):
-        view: DuelReportView = self.view
-        view.loser = self.values[0]
+        loser = self.values[0]
+        draft = drafts.get(interaction.user.id, "duel_report") or {}
+        draft["loser_id"] = loser.id
+        await drafts.save(interaction.user.id, "duel_report", draft)
         await interaction.response.send_message(
             embed=create_styled_embed(
                 "Loser Selected",
-                f"Loser: {view.loser.mention}\n\n"
+                f"Loser: {loser.mention}\n\n"
                 "Click 'Submit Result' to record the duel.",
                 UIStyle.COLOR_SUCCESS
             ),
@@ -1322,6 +4415,54 @@ class LoserSelect(ui.UserSelect):
         )
 
 
+class LeaderboardView(ui.View):
+    """Page through a leaderboard with Prev/Next buttons"""
+    
+    def __init__(self, viewer: discord.abc.User, metric: str, period: str):
+        super().__init__(timeout=300)
+        self.viewer = viewer
+        self.metric = metric
+        self.period = period
+        self.page = 0
+        self.message: Optional[discord.Message] = None
+        
+        self.prev_btn = ui.Button(label="Prev", emoji=UIStyle.EMOJI_BACK, style=discord.ButtonStyle.secondary)
+        self.prev_btn.callback = self.prev_callback
+        self.add_item(self.prev_btn)
+        
+        self.next_btn = ui.Button(label="Next", emoji=UIStyle.EMOJI_FORWARD, style=discord.ButtonStyle.secondary)
+        self.next_btn.callback = self.next_callback
+        self.add_item(self.next_btn)
+    
+    def build_embed(self) -> discord.Embed:
+        index = leaderboards.cached(self.metric, self.period)
+        self.page = max(0, min(self.page, index.page_count(LEADERBOARD_PAGE_SIZE) - 1))
+        self.prev_btn.disabled = self.page == 0
+        self.next_btn.disabled = self.page >= index.page_count(LEADERBOARD_PAGE_SIZE) - 1
+        return create_leaderboard_embed(self.metric, self.period, index, self.page, self.viewer)
+    
+    async def prev_callback(self, interaction: discord.Interaction):
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+    
+    async def next_callback(self, interaction: discord.Interaction):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.viewer.id
+    
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message is None:
+            return
+        try:
+            await self.message.edit(view=self)
+        except discord.HTTPException:
+            pass
+
+
 def create_styled_embed(title: str, description: str, color: discord.Color) -> discord.Embed:
     """Create a consistently styled embed"""
     embed = discord.Embed(
@@ -1353,7 +4494,7 @@ def create_main_menu_embed(member: discord.Member, is_officer: bool) -> discord.
     
     embed.add_field(
         name="⚔️ Player Actions",
-        value="• Challenge Player\n• View Progress\n• Start Quiz (Minor I only)",
+        value="• Challenge Player\n• View Progress\n• Leaderboard\n• Start Quiz (Minor I only)",
         inline=False
     )
     
@@ -1394,7 +4535,31 @@ def create_help_embed() -> discord.Embed:
         name="📊 View Progress - `!progress` or `!stats`",
         value="Check your stats, including events attended, duels won, and quiz status.\n"
               "Shows progress bars for rank requirements.\n"
-              "Usage: `!progress [@member]`",
+              f"Windows: {', '.join(STAT_WINDOWS)}\n"
+              "Usage: `!progress [@member] [window]`",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🏆 Leaderboard - `!leaderboard`",
+        value="See the top members by attendance, hosting or duels.\n"
+              f"Metrics: {', '.join(LEADERBOARD_METRICS)}\n"
+              f"Periods: {', '.join(LEADERBOARD_PERIODS)}\n"
+              "Usage: `!leaderboard [metric] [period]`",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="⚔️ Duel Rating - `!rating`",
+        value="See a duel rating, record and ladder position, or a head-to-head.\n"
+              "Usage: `!rating [@member] [@opponent]`",
+        inline=False
+    )
+    
+    embed.add_field(
+        name="📋 Attendance Receipts - `!receipts`",
+        value="Get a DM with your updated progress whenever you are logged at an event.\n"
+              "Usage: `!receipts on` or `!receipts off`",
         inline=False
     )
     
@@ -1416,35 +4581,31 @@ def create_help_embed() -> discord.Embed:
     return embed
 
 
-def create_progress_embed(member: discord.Member, stats: Dict[str, int]) -> discord.Embed:
-    """Create enhanced progress embed with rank-specific requirements"""
+def create_progress_embed(
+    member: discord.Member,
+    stats: Dict[str, int],
+    window: str = "all",
+    since: Optional[datetime] = None,
+) -> discord.Embed:
+    """Create enhanced progress embed with rank-specific requirements, over
+    a STAT_WINDOWS window starting at `since`"""
     total_att = stats["total_attended"]
     warfare_att = stats["warfare_attended"]
     training_att = stats["training_attended"]
     duels_won = stats["duels_won"]
     quiz_passed = bool(stats["quiz_passed"])
 
-    # Get user's current rank and requirements
-    rank_info = get_user_rank(member)
-    
-    if rank_info:
-        role_id, rank_data = rank_info
-        current_rank = rank_data["current_rank"]
-        next_rank = rank_data["next_rank"]
-        requirements = rank_data["requirements"]
-        note = rank_data.get("note", "")
-    else:
-        # Default fallback if no rank role found
-        current_rank = "Unranked"
-        next_rank = "Minor III"
-        requirements = {"events": 0, "warfare": 0, "training": 0, "duels": 0, "quiz": False}
-        note = "Join us to start your journey!"
-
-    req_events = requirements.get("events", 0)
-    req_warfare = requirements.get("warfare", 0)
-    req_training = requirements.get("training", 0)
-    req_duels = requirements.get("duels", 0)
-    req_quiz = requirements.get("quiz", False)
+    # Get user's current rank and requirements (UNRANKED if no rank role)
+    rank = resolve_rank(member) or UNRANKED
+    current_rank = rank.current_rank
+    next_rank = rank.next_rank
+    note = rank.note
+
+    req_events = rank.events
+    req_warfare = rank.warfare
+    req_training = rank.training
+    req_duels = rank.duels
+    req_quiz = rank.quiz
 
     # Build description
     if next_rank:
@@ -1455,6 +4616,18 @@ def create_progress_embed(member: discord.Member, stats: Dict[str, int]) -> disc
     else:
         description = f"**Current Rank:** {current_rank}\n{note}"
 
+    window_label = STAT_WINDOWS[window]
+    if window != "all":
+        if since:
+            started = f" (since {discord.utils.format_dt(since, 'D')})"
+        elif window == "rank":
+            # promoted_at is only known for rank-ups seen by the bot; the
+            # window falls back to all history until then
+            started = " (not recorded yet, showing all-time stats)"
+        else:
+            started = ""
+        description = f"**Window:** {window_label}{started}\n" + description
+
     embed = discord.Embed(
         title=f"📊 Progress Report: {member.display_name}",
         description=description,
@@ -1466,33 +4639,7 @@ def create_progress_embed(member: discord.Member, stats: Dict[str, int]) -> disc
 
     # Calculate completion percentage (only if there's a next rank)
     if next_rank:
-        total_items = 0
-        total_progress = 0
-        
-        if req_events > 0:
-            total_items += 1
-            if total_att >= req_events:
-                total_progress += 1
-        
-        if req_warfare > 0:
-            total_items += 1
-            if warfare_att >= req_warfare:
-                total_progress += 1
-        
-        if req_training > 0:
-            total_items += 1
-            if training_att >= req_training:
-                total_progress += 1
-        
-        if req_duels > 0:
-            total_items += 1
-            if duels_won >= req_duels:
-                total_progress += 1
-        
-        if req_quiz:
-            total_items += 1
-            if quiz_passed:
-                total_progress += 1
+        total_progress, total_items = rank.progress(stats)
         
         if total_items > 0:
             completion = int((total_progress / total_items) * 100)
@@ -1551,7 +4698,7 @@ def create_progress_embed(member: discord.Member, stats: Dict[str, int]) -> disc
 
     # Always show overall stats
     embed.add_field(
-        name="📈 Overall Statistics",
+        name="📈 Overall Statistics" if window == "all" else f"📈 Statistics: {window_label}",
         value=f"**Total Events:** {total_att}\n"
               f"**Warfare Events:** {warfare_att}\n"
               f"**Training Events:** {training_att}\n"
@@ -1565,128 +4712,355 @@ def create_progress_embed(member: discord.Member, stats: Dict[str, int]) -> disc
     return embed
 
 
+def create_leaderboard_embed(
+    metric: str,
+    period: str,
+    index: RankingIndex,
+    page: int,
+    viewer: discord.abc.User,
+) -> discord.Embed:
+    """Create one page of a leaderboard"""
+    metric_label = LEADERBOARD_METRICS[metric][0]
+    period_label = LEADERBOARD_PERIODS[period]
+    medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+    
+    lines = [
+        f"{medals.get(position, f'**#{position}**')} <@{uid}> — **{score}**"
+        for position, uid, score in index.page(page, LEADERBOARD_PAGE_SIZE)
+    ]
+    
+    embed = create_styled_embed(
+        f"🏆 Leaderboard: {metric_label}",
+        f"**Period:** {period_label}\n\n" + ("\n".join(lines) or "No activity recorded for this period yet."),
+        UIStyle.COLOR_PRIMARY
+    )
+    
+    position = index.position(viewer.id)
+    embed.add_field(
+        name="📍 Your Position",
+        value=f"**#{position[0]}** with **{position[1]}**" if position else "Not ranked yet",
+        inline=False
+    )
+    
+    embed.set_footer(
+        text=f"Page {page + 1}/{index.page_count(LEADERBOARD_PAGE_SIZE)} • "
+             f"{len(index)} ranked members • Covenant Technologies"
+    )
+    
+    return embed
+
+
+def create_promotion_digest_embeds(
+    candidates: List[Tuple[discord.Member, RankRequirement, Dict[str, int]]],
+    title: str,
+) -> List[discord.Embed]:
+    """Group promotion-ready members by rank transition into digest embeds"""
+    by_transition: Dict[Tuple[str, str], List[str]] = {}
+    for member, rank, _ in sorted(candidates, key=lambda c: c[1].index):
+        key = (rank.current_rank, rank.next_rank)
+        by_transition.setdefault(key, []).append(f"• {member.mention} ({member.display_name})")
+
+    # Embed field values are capped at 1024 characters; stay well under the
+    # 6000 character / 25 field limit per embed
+    fields: List[Tuple[str, str]] = []
+    for (current_rank, next_rank), lines in by_transition.items():
+        chunk: List[str] = []
+        for line in lines:
+            if chunk and len("\n".join(chunk + [line])) > 1000:
+                fields.append((f"{current_rank} ➜ {next_rank}", "\n".join(chunk)))
+                chunk = []
+            chunk.append(line)
+        fields.append((f"{current_rank} ➜ {next_rank} ({len(lines)})", "\n".join(chunk)))
+
+    embeds: List[discord.Embed] = []
+    embed = None
+    size = 0
+    for name, value in fields:
+        if embed is None or len(embed.fields) >= 20 or size + len(name) + len(value) > 5000:
+            embed = create_styled_embed(
+                title if not embeds else f"{title} (continued)",
+                f"**{len(candidates)}** member(s) meet the requirements for their next rank.",
+                UIStyle.COLOR_SUCCESS
+            )
+            embeds.append(embed)
+            size = len(embed.description)
+        embed.add_field(name=name, value=value, inline=False)
+        size += len(name) + len(value)
+    return embeds
+
+
+# Seconds a quiz taker has to type an answer, and to confirm it, before
+# their session expires
+QUIZ_ANSWER_TIMEOUT = 300
+QUIZ_CONFIRM_TIMEOUT = 120
+
+
 class QuizConfirmView(discord.ui.View):
-    """View for confirming quiz answers"""
-    def __init__(self, user_id: int):
-        super().__init__(timeout=120)
-        self.user_id = user_id
-        self.confirmed = None
+    """View for confirming quiz answers (persistent; routed to the sender's session)"""
+    def __init__(self, disabled: bool = False):
+        super().__init__(timeout=None)
+        for item in self.children:
+            item.disabled = disabled
     
-    @discord.ui.button(label="✅ Confirm Answer", style=discord.ButtonStyle.success)
+    @discord.ui.button(label="✅ Confirm Answer", style=discord.ButtonStyle.success, custom_id="quiz:confirm")
     async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("This is not your quiz!", ephemeral=True)
-            return
-        self.confirmed = True
-        self.stop()
-        await interaction.response.defer()
+        await quiz_sessions.confirm(interaction, True)
     
-    @discord.ui.button(label="↩️ Re-answer", style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label="↩️ Re-answer", style=discord.ButtonStyle.secondary, custom_id="quiz:reanswer")
     async def reanswer_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("This is not your quiz!", ephemeral=True)
+        await quiz_sessions.confirm(interaction, False)
+
+
+class QuizSession:
+    """One member's progress through QUIZ_QUESTIONS"""
+
+    __slots__ = ("user_id", "guild_id", "index", "answers", "pending_answer", "updated_at")
+
+    def __init__(
+        self,
+        user_id: int,
+        guild_id: int,
+        index: int = 0,
+        answers: Optional[List[str]] = None,
+        pending_answer: Optional[str] = None,
+        updated_at=None,
+    ):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.index = index
+        self.answers = answers or []
+        self.pending_answer = pending_answer
+        self.updated_at = updated_at or discord.utils.utcnow()
+
+    @property
+    def confirming(self) -> bool:
+        return self.pending_answer is not None
+
+    def expired(self, now) -> bool:
+        timeout = QUIZ_CONFIRM_TIMEOUT if self.confirming else QUIZ_ANSWER_TIMEOUT
+        return (now - self.updated_at).total_seconds() > timeout
+
+
+QUIZ_SESSIONS_LOAD = queries.register("quiz_sessions_load", """
+    SELECT discord_id, guild_id, question_index, answers, pending_answer, updated_at
+    FROM quiz_sessions;
+""")
+
+QUIZ_SESSIONS_SAVE = queries.register("quiz_sessions_save", """
+    INSERT INTO quiz_sessions
+        (discord_id, guild_id, question_index, answers, pending_answer, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (discord_id) DO UPDATE SET
+        question_index = EXCLUDED.question_index,
+        answers = EXCLUDED.answers,
+        pending_answer = EXCLUDED.pending_answer,
+        updated_at = EXCLUDED.updated_at;
+""")
+
+QUIZ_SESSIONS_DELETE = queries.register("quiz_sessions_delete", """
+    DELETE FROM quiz_sessions WHERE discord_id = $1;
+""")
+
+
+class QuizSessions:
+    """Quiz state machine: every active quiz is a QuizSession keyed by user id.
+
+    DMs reach `handle_message` through the single on_message router and the
+    confirm/re-answer buttons reach `confirm`, both with a dict lookup, so
+    no coroutine, listener or view is held per quiz taker. Sessions are
+    written through to the quiz_sessions table and resume after a restart;
+    idle ones are expired by the expire_quiz_sessions loop.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[int, QuizSession] = {}
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def load(self, conn: asyncpg.Connection):
+        rows = await QUIZ_SESSIONS_LOAD.fetch(conn)
+        self._sessions = {
+            row["discord_id"]: QuizSession(
+                row["discord_id"],
+                row["guild_id"],
+                row["question_index"],
+                list(row["answers"]),
+                row["pending_answer"],
+                # Give sessions that were active at shutdown a fresh timeout
+                discord.utils.utcnow(),
+            )
+            for row in rows
+        }
+
+    async def _save(self, session: QuizSession):
+        session.updated_at = discord.utils.utcnow()
+        async with acquire_connection() as conn:
+            await QUIZ_SESSIONS_SAVE.execute(
+                conn,
+                session.user_id,
+                session.guild_id,
+                session.index,
+                session.answers,
+                session.pending_answer,
+                session.updated_at,
+            )
+
+    async def _drop(self, user_id: int) -> Optional[QuizSession]:
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            async with acquire_connection() as conn:
+                await QUIZ_SESSIONS_DELETE.execute(conn, user_id)
+        return session
+
+    async def start(self, user: discord.Member, guild: discord.Guild) -> bool:
+        """Start a quiz in the member's DMs. Returns False if one was already
+        in progress (its current step is re-sent instead)."""
+        async with metrics.timed("discord_api", "create_dm"):
+            dm = await user.create_dm()
+
+        session = self._sessions.get(user.id)
+        if session is not None:
+            await self._prompt(dm, session)
+            return False
+
+        session = self._sessions[user.id] = QuizSession(user.id, guild.id)
+        await self._save(session)
+
+        # Welcome message
+        welcome_embed = create_styled_embed(
+            "📝 Minor I → Major III Quiz",
+            "Welcome to the rank-up quiz!\n\n"
+            "**Instructions:**\n"
+            f"• You will be asked {len(QUIZ_QUESTIONS)} questions\n"
+            "• Type your answer and confirm it with buttons\n"
+            "• You can re-answer before confirming\n"
+            "• Your answers will be reviewed by staff\n\n"
+            "**Ready? Let's begin!**",
+            UIStyle.COLOR_PRIMARY
+        )
+        try:
+            await dm.send(embed=welcome_embed)
+            await self._prompt(dm, session)
+        except discord.HTTPException:
+            # DMs closed: don't leave a session the member never saw behind
+            await self._drop(user.id)
+            raise
+        return True
+
+    async def _prompt(self, dm: discord.DMChannel, session: QuizSession):
+        """Send the step the session is waiting on"""
+        if session.confirming:
+            confirm_embed = create_styled_embed(
+                "Confirm Your Answer",
+                f"**Your answer:**\n```{session.pending_answer}```\n\n"
+                "Click **✅ Confirm Answer** to proceed or **↩️ Re-answer** to try again.",
+                UIStyle.COLOR_WARNING
+            )
+            await dm.send(embed=confirm_embed, view=render_only(QuizConfirmView()))
             return
-        self.confirmed = False
-        self.stop()
-        await interaction.response.defer()
 
+        number = session.index + 1
+        question_embed = create_styled_embed(
+            f"Question {number}/{len(QUIZ_QUESTIONS)}",
+            QUIZ_QUESTIONS[session.index],
+            UIStyle.COLOR_INFO
+        )
+        question_embed.set_footer(text=f"Question {number} of {len(QUIZ_QUESTIONS)} • Type your answer below")
+        await dm.send(embed=question_embed)
 
-async def start_quiz_flow(user: discord.Member, guild: discord.Guild):
-    """Enhanced quiz flow with button-based confirmation"""
-    try:
-        dm = await user.create_dm()
-    except Exception:
-        return
-    
-    # Welcome message
-    welcome_embed = create_styled_embed(
-        "📝 Minor I → Major III Quiz",
-        "Welcome to the rank-up quiz!\n\n"
-        "**Instructions:**\n"
-        "• You will be asked 5 questions\n"
-        "• Type your answer and confirm it with buttons\n"
-        "• You can re-answer before confirming\n"
-        "• Your answers will be reviewed by staff\n\n"
-        "**Ready? Let's begin!**",
-        UIStyle.COLOR_PRIMARY
-    )
-    await dm.send(embed=welcome_embed)
-    
-    answers: List[str] = []
+    async def handle_message(self, message: discord.Message):
+        session = self._sessions.get(message.author.id)
+        if session is None or session.confirming:
+            return
 
-    def dm_msg_check(m: discord.Message):
-        return m.author.id == user.id and isinstance(m.channel, discord.DMChannel)
+        session.pending_answer = message.content.strip()
+        await self._save(session)
+        await self._prompt(message.channel, session)
 
-    for index, question in enumerate(QUIZ_QUESTIONS, start=1):
-        while True:
-            question_embed = create_styled_embed(
-                f"Question {index}/{len(QUIZ_QUESTIONS)}",
-                question,
+    async def confirm(self, interaction: discord.Interaction, confirmed: bool):
+        session = self._sessions.get(interaction.user.id)
+        if session is None or not session.confirming:
+            await interaction.response.send_message(
+                "This answer is no longer waiting for confirmation.", ephemeral=True
+            )
+            return
+
+        # Advance before any await so a double click is a no-op
+        answer_text = session.pending_answer
+        session.pending_answer = None
+        if confirmed:
+            session.answers.append(answer_text)
+            session.index += 1
+
+        # Disable buttons after interaction
+        await interaction.response.edit_message(view=render_only(QuizConfirmView(disabled=True)))
+        dm = interaction.channel
+
+        if not confirmed:
+            await self._save(session)
+            retry_embed = create_styled_embed(
+                "↩️ Re-answer",
+                "Please type your new answer for this question:",
                 UIStyle.COLOR_INFO
             )
-            question_embed.set_footer(text=f"Question {index} of {len(QUIZ_QUESTIONS)} • Type your answer below")
-            
-            try:
-                await dm.send(embed=question_embed)
-                answer_msg = await bot.wait_for("message", check=dm_msg_check, timeout=300)
-            except asyncio.TimeoutError:
-                timeout_embed = create_styled_embed(
-                    "⏱️ Quiz Timed Out",
-                    "The quiz has timed out. Please run `!menu` and try again when ready.",
-                    UIStyle.COLOR_ERROR
-                )
-                await dm.send(embed=timeout_embed)
-                return
+            await dm.send(embed=retry_embed)
+            return
 
-            answer_text = answer_msg.content.strip()
-            
-            confirm_embed = create_styled_embed(
-                "Confirm Your Answer",
-                f"**Your answer:**\n```{answer_text}```\n\n"
-                "Click **✅ Confirm Answer** to proceed or **↩️ Re-answer** to try again.",
-                UIStyle.COLOR_WARNING
+        if session.index < len(QUIZ_QUESTIONS):
+            await self._save(session)
+            progress_embed = create_styled_embed(
+                "✅ Answer Confirmed",
+                f"Moving to question {session.index + 1}...",
+                UIStyle.COLOR_SUCCESS
             )
-            
-            view = QuizConfirmView(user.id)
-            confirm_msg = await dm.send(embed=confirm_embed, view=view)
-            
-            await view.wait()
-            
-            if view.confirmed is None:
-                # Timeout
+            await dm.send(embed=progress_embed)
+            await self._prompt(dm, session)
+            return
+
+        await self._drop(session.user_id)
+        guild = bot.get_guild(session.guild_id)
+        user = (guild.get_member(session.user_id) if guild else None) or interaction.user
+        await submit_quiz(user, guild, session.answers, dm)
+
+    async def expire_idle(self):
+        now = discord.utils.utcnow()
+        for session in [s for s in self._sessions.values() if s.expired(now)]:
+            await self._drop(session.user_id)
+            user = bot.get_user(session.user_id)
+            if user is not None:
                 timeout_embed = create_styled_embed(
                     "⏱️ Quiz Timed Out",
-                    "The quiz has timed out. Please run `!menu` and try again.",
+                    "The quiz has timed out. Please run `!menu` and try again when ready.",
                     UIStyle.COLOR_ERROR
                 )
-                await dm.send(embed=timeout_embed)
-                return
-            
-            # Disable buttons after interaction
-            for item in view.children:
-                item.disabled = True
-            await confirm_msg.edit(view=view)
-
-            if view.confirmed:
-                answers.append(answer_text)
-                if index < len(QUIZ_QUESTIONS):
-                    progress_embed = create_styled_embed(
-                        "✅ Answer Confirmed",
-                        f"Moving to question {index + 1}...",
-                        UIStyle.COLOR_SUCCESS
-                    )
-                    await dm.send(embed=progress_embed)
-                break
-            else:
-                retry_embed = create_styled_embed(
-                    "↩️ Re-answer",
-                    "Please type your new answer for this question:",
-                    UIStyle.COLOR_INFO
-                )
-                await dm.send(embed=retry_embed)
+                notifications.send(user, timeout_embed)
+
+
+quiz_sessions = QuizSessions()
+metrics.collect("covenant_quiz_sessions", "Quizzes in progress", lambda: len(quiz_sessions))
+
+
+@tasks.loop(seconds=30)
+async def expire_quiz_sessions():
+    try:
+        await quiz_sessions.expire_idle()
+    except Exception as e:
+        logger.error(f"Failed to expire quiz sessions: {e}")
+
 
+async def submit_quiz(
+    user: discord.abc.User,
+    guild: Optional[discord.Guild],
+    answers: List[str],
+    dm: discord.abc.Messageable,
+):
+    """Post a finished quiz to the review channel and thank the candidate"""
     # Send quiz to review channel
-    review_channel = guild.get_channel(QUIZ_REVIEW_CHANNEL_ID)
+    review_channel = guild.get_channel(QUIZ_REVIEW_CHANNEL_ID) if guild else None
     if review_channel is None:
         error_embed = create_styled_embed(
             "Configuration Error",
@@ -1724,6 +5098,7 @@ async def start_quiz_flow(user: discord.Member, guild: discord.Guild):
         content="@here New quiz submission for review!",
         embed=embed
     )
+    await quiz_submissions.add(msg.id, user.id, answers)
     try:
         await msg.add_reaction("✅")  # pass
         await msg.add_reaction("❌")  # fail
@@ -1752,16 +5127,52 @@ def is_officer(member: discord.Member) -> bool:
     return has_any_role(member, OFFICER_ROLE_IDS)
 
 
+async def require_officer(interaction: discord.Interaction) -> bool:
+    """Interaction check for officer-only components; tells others why not"""
+    if isinstance(interaction.user, discord.Member) and is_officer(interaction.user):
+        return True
+    await interaction.response.send_message(
+        embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can use this.",
+            UIStyle.COLOR_ERROR
+        ),
+        ephemeral=True
+    )
+    return False
+
+
 # =========================
 # BOT EVENTS
 # =========================
 
+# Background cache preload, started on the first on_ready only
+cache_warm_task: Optional[asyncio.Task] = None
+
+
 @bot.event
 async def on_ready():
+    global cache_warm_task
     logger.info(f"Logged in as {bot.user} (ID: {bot.user.id})")
     logger.info("Bot is ready with enhanced UI system!")
     logger.info("------")
     
+    notifications.start()
+    if not refresh_leaderboards.is_running():
+        refresh_leaderboards.start()
+    if not expire_quiz_sessions.is_running():
+        expire_quiz_sessions.start()
+    if not expire_duel_challenges.is_running():
+        expire_duel_challenges.start()
+    if PROMOTION_SWEEP_INTERVAL_HOURS > 0 and not scheduled_promotion_sweep.is_running():
+        scheduled_promotion_sweep.start()
+    if cache_warm_task is None:
+        startup.end("gateway")
+        logger.info(f"Ready {time.monotonic() - started_at:.2f}s after startup")
+        if STARTUP_PROFILE:
+            logger.info(startup.report())
+        cache_warm_task = run_in_background(warm_start(), "warm_start")
+    
     # Set bot status
     activity = discord.Activity(
         type=discord.ActivityType.watching,
@@ -1770,6 +5181,45 @@ async def on_ready():
     await bot.change_presence(activity=activity)
 
 
+@bot.listen("on_message")
+async def route_message(message: discord.Message):
+    """Single entry point for conversational flows.
+
+    Each flow is found with a dict lookup on the author, instead of every
+    message being tested against one wait_for predicate per open flow.
+    """
+    if message.author.bot:
+        return
+
+    if message.guild is None:
+        if message.author.id in quiz_sessions:
+            await quiz_sessions.handle_message(message)
+        return
+
+    challenge = challenges.for_reply(message.channel.id, message.author.id)
+    if challenge is not None:
+        accepted = CHALLENGE_REPLIES.get(message.content.strip().lower())
+        if accepted is not None:
+            await respond_to_challenge(challenge, accepted)
+
+
+@bot.before_invoke
+async def start_command_timer(ctx: commands.Context):
+    ctx.command_started = time.perf_counter()
+
+
+@bot.after_invoke
+async def record_command_latency(ctx: commands.Context):
+    started = getattr(ctx, "command_started", None)
+    if started is not None:
+        metrics.observe(
+            "command",
+            ctx.command.qualified_name,
+            time.perf_counter() - started,
+            error=ctx.command_failed,
+        )
+
+
 @bot.event
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     """
@@ -1790,55 +5240,40 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
     guild = bot.get_guild(payload.guild_id)
     if guild is None:
         return
-
-    member = guild.get_member(payload.user_id)
-    if member is None:
-        try:
-            member = await guild.fetch_member(payload.user_id)
-        except Exception:
-            return
-
-    if not has_any_role(member, QUIZ_REVIEWER_ROLE_IDS):
-        # Remove unauthorized reaction
-        channel = bot.get_channel(payload.channel_id)
-        if isinstance(channel, discord.TextChannel):
-            try:
-                msg = await channel.fetch_message(payload.message_id)
-                await msg.remove_reaction(payload.emoji, member)
-            except Exception:
-                pass
-        return
-
-    channel = bot.get_channel(payload.channel_id)
+    channel = guild.get_channel(payload.channel_id)
     if not isinstance(channel, discord.TextChannel):
         return
+    # Reactions are acted on through a partial message: no fetch needed
+    message = channel.get_partial_message(payload.message_id)
 
-    try:
-        message = await channel.fetch_message(payload.message_id)
-    except Exception:
-        return
-
-    if not message.embeds:
-        return
-    embed = message.embeds[0]
-
-    # We encode the user id in the footer like "User ID: 123456789"
-    if not embed.footer or not embed.footer.text:
+    member = payload.member or guild.get_member(payload.user_id)
+    if member is None:
         return
 
-    footer_text = embed.footer.text
-    if "User ID:" not in footer_text:
+    if not has_any_role(member, QUIZ_REVIEWER_ROLE_IDS):
+        # Remove unauthorized reaction
+        try:
+            await message.remove_reaction(payload.emoji, member)
+        except Exception:
+            pass
         return
 
-    try:
-        user_id_str = footer_text.split("User ID:")[-1].strip()
-        target_user_id = int(user_id_str)
-    except ValueError:
-        return
+    if quiz_submissions.candidate_for(payload.message_id) is None:
+        if quiz_submissions.is_settled(payload.message_id):
+            return
+        # Possibly a submission from before they were stored: adopt it
+        try:
+            candidate_id = await quiz_submissions.adopt(channel, payload.message_id)
+        except discord.HTTPException:
+            return
+        if candidate_id is None:
+            return
 
-    # Apply result
+    # Apply result; a second reaction or a racing reviewer gets None here
     passed = emoji == "✅"
-    await set_quiz_passed(target_user_id, passed)
+    target_user_id = await quiz_submissions.review(payload.message_id, passed, member.id)
+    if target_user_id is None:
+        return
 
     target_user = guild.get_member(target_user_id)
     status_str = "PASSED" if passed else "FAILED"
@@ -1868,28 +5303,40 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
 
     # Notify user via DM
     if target_user:
-        try:
-            dm = await target_user.create_dm()
-            if passed:
-                dm_embed = create_styled_embed(
-                    "🎉 Quiz Passed!",
-                    f"Congratulations! Your quiz has been reviewed and **PASSED**!\n\n"
-                    f"**Reviewed by:** {member.mention}\n\n"
-                    "You are one step closer to your next rank! 🚀",
-                    UIStyle.COLOR_SUCCESS
-                )
-            else:
-                dm_embed = create_styled_embed(
-                    "Quiz Result",
-                    f"Your quiz has been reviewed and did not pass this time.\n\n"
-                    f"**Reviewed by:** {member.mention}\n\n"
-                    "Don't worry! You can retake the quiz when you're ready. "
-                    "Use `!menu` and select 'Start Quiz' to try again.",
-                    UIStyle.COLOR_WARNING
-                )
-            await dm.send(embed=dm_embed)
-        except Exception:
-            pass
+        if passed:
+            dm_embed = create_styled_embed(
+                "🎉 Quiz Passed!",
+                f"Congratulations! Your quiz has been reviewed and **PASSED**!\n\n"
+                f"**Reviewed by:** {member.mention}\n\n"
+                "You are one step closer to your next rank! 🚀",
+                UIStyle.COLOR_SUCCESS
+            )
+        else:
+            dm_embed = create_styled_embed(
+                "Quiz Result",
+                f"Your quiz has been reviewed and did not pass this time.\n\n"
+                f"**Reviewed by:** {member.mention}\n\n"
+                "Don't worry! You can retake the quiz when you're ready. "
+                "Use `!menu` and select 'Start Quiz' to try again.",
+                UIStyle.COLOR_WARNING
+            )
+        notifications.send(target_user, dm_embed)
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    """Record rank-ups, which start each member's "rank" stats window."""
+    if before.roles == after.roles:
+        return
+    old_rank = resolve_rank(before)
+    new_rank = resolve_rank(after)
+    if new_rank is None or (old_rank is not None and new_rank.index <= old_rank.index):
+        return
+    try:
+        await record_rank_up(after.id)
+        logger.info(f"Recorded rank-up of {after.id} to {new_rank.current_rank}")
+    except Exception as e:
+        logger.error(f"Failed to record rank-up for {after.id}: {e}")
 
 
 # =========================
@@ -1907,11 +5354,10 @@ async def menu_command(ctx: commands.Context):
         return
     
     is_officer_user = is_officer(ctx.author)
-    view = MainMenuView(ctx)
+    view = render_only(MainMenuView(is_officer_user))
     embed = create_main_menu_embed(ctx.author, is_officer_user)
     
-    message = await ctx.send(embed=embed, view=view)
-    view.message = message
+    await ctx.send(embed=embed, view=view)
 
 
 @bot.command(name="help")
@@ -1925,12 +5371,16 @@ async def help_command(ctx: commands.Context):
 
 
 @bot.command(name="stats")
-async def stats_command(ctx: commands.Context, member: Optional[discord.Member] = None):
+async def stats_command(
+    ctx: commands.Context,
+    member: Optional[discord.Member] = None,
+    window: str = "all",
+):
     """
-    !stats [@member]
+    !stats [@member] [window]
     Alias for !progress - shows user statistics and progress.
     """
-    await progress_command(ctx, member)
+    await progress_command(ctx, member, window)
 
 
 
@@ -1949,12 +5399,25 @@ async def stats_command(ctx: commands.Context, member: Optional[discord.Member]
 async def progress_command(
     ctx: commands.Context,
     member: Optional[discord.Member] = None,
+    window: str = "all",
 ):
     """
-    !progress [@member]
+    !progress [@member] [window]
     Shows attendance / duel / quiz stats with enhanced UI and progress bars
-    against DEFAULT_REQUIREMENTS.
+    against DEFAULT_REQUIREMENTS. `window` (all, rank, season, month, week)
+    limits the counts to that period; promotions are still judged on all
+    time.
     """
+    window = window.lower()
+    if window not in STAT_WINDOWS:
+        await ctx.send(embed=create_styled_embed(
+            "Unknown Window",
+            f"**Windows:** {', '.join(STAT_WINDOWS)}\n\n"
+            "Usage: `!progress [@member] [window]`",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
     if member is None:
         if isinstance(ctx.author, discord.Member):
             member = ctx.author
@@ -1967,7 +5430,19 @@ async def progress_command(
             await ctx.send(embed=embed)
             return
 
-    # Send loading message
+    if window != "all":
+        stats, since = await get_windowed_user_stats(member.id, window)
+        await ctx.send(embed=create_progress_embed(member, stats, window, since))
+        return
+
+    # Cached stats render immediately; only show a loading message on a miss
+    stats = stats_cache.get(member.id)
+    if stats is not None:
+        embed = create_progress_embed(member, stats)
+        await ctx.send(embed=embed)
+        await check_promotion_eligible(member, stats, ctx.guild)
+        return
+
     loading_embed = create_styled_embed(
         "⏳ Loading Progress...",
         f"Fetching stats for {member.mention}...",
@@ -1984,17 +5459,378 @@ async def progress_command(
     await loading_msg.edit(embed=embed)
 
 
+@bot.command(name="receipts")
+async def receipts_command(ctx: commands.Context, setting: Optional[str] = None):
+    """
+    !receipts [on|off]
+    Opt in to (or out of) a DM with your updated progress whenever you are
+    logged at an event.
+    """
+    if setting is None:
+        enabled = ctx.author.id in attendance_receipts
+        await ctx.send(embed=create_styled_embed(
+            "📋 Attendance Receipts",
+            f"Attendance receipts are **{'on' if enabled else 'off'}** for you.\n\n"
+            "Usage: `!receipts on` or `!receipts off`",
+            UIStyle.COLOR_INFO
+        ))
+        return
+
+    setting = setting.lower()
+    if setting not in ("on", "off"):
+        await ctx.send(embed=create_styled_embed(
+            "Invalid Setting",
+            "Usage: `!receipts on` or `!receipts off`",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    enabled = setting == "on"
+    await attendance_receipts.set(ctx.author.id, enabled)
+    await ctx.send(embed=create_styled_embed(
+        "✅ Attendance Receipts " + ("Enabled" if enabled else "Disabled"),
+        "You will get a DM with your progress whenever you are logged at an event."
+        if enabled else
+        "You will no longer get a DM when you are logged at an event.",
+        UIStyle.COLOR_SUCCESS
+    ))
+
+
+@bot.command(name="leaderboard", aliases=["lb", "top"])
+async def leaderboard_command(ctx: commands.Context, metric: str = "attended", period: str = "all"):
+    """
+    !leaderboard [metric] [period]
+    Shows the top members for a metric (attended, warfare, training, hosted,
+    duels) over a period (all, season, month, week), with Prev/Next paging.
+    """
+    metric = metric.lower()
+    period = period.lower()
+    if metric not in LEADERBOARD_METRICS or period not in LEADERBOARD_PERIODS:
+        await ctx.send(embed=create_styled_embed(
+            "Invalid Leaderboard",
+            f"**Metrics:** {', '.join(LEADERBOARD_METRICS)}\n"
+            f"**Periods:** {', '.join(LEADERBOARD_PERIODS)}\n\n"
+            "Usage: `!leaderboard [metric] [period]`",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    await leaderboards.get(metric, period)
+    view = LeaderboardView(ctx.author, metric, period)
+    message = await ctx.send(embed=view.build_embed(), view=view)
+    view.message = message
+
+
+@bot.command(name="rating", aliases=["elo"])
+async def rating_command(
+    ctx: commands.Context,
+    member: Optional[discord.Member] = None,
+    opponent: Optional[discord.Member] = None,
+):
+    """
+    !rating [@member] [@opponent]
+    Shows a member's duel rating, record and ladder position, and with a
+    second member their head-to-head record and win chance.
+    """
+    if member is None:
+        if isinstance(ctx.author, discord.Member):
+            member = ctx.author
+        else:
+            await ctx.send(embed=create_styled_embed(
+                "Member Required",
+                "Specify a member when using this command outside a server.",
+                UIStyle.COLOR_ERROR
+            ))
+            return
+
+    rating = await get_player_rating(member.id)
+    if rating is None:
+        await ctx.send(embed=create_styled_embed(
+            "⚔️ Duel Rating",
+            f"{member.mention} has no recorded duels yet.\n"
+            f"Everyone starts at **{ELO_INITIAL_RATING:.0f}**.",
+            UIStyle.COLOR_INFO
+        ))
+        return
+
+    embed = create_styled_embed(
+        f"⚔️ Duel Rating - {member.display_name}",
+        f"**Rating:** {rating['rating']:.0f}\n"
+        f"**Record:** {rating['wins']}W - {rating['losses']}L\n"
+        f"**Ladder:** #{rating['position']} of {rating['rated']}",
+        UIStyle.COLOR_PRIMARY
+    )
+    embed.set_thumbnail(url=member.display_avatar.url if member.display_avatar else None)
+
+    if opponent is not None and opponent.id != member.id:
+        opponent_rating = await get_player_rating(opponent.id)
+        opponent_value = opponent_rating["rating"] if opponent_rating else ELO_INITIAL_RATING
+        wins, losses = await get_head_to_head(member.id, opponent.id)
+        chance = elo_expected(rating["rating"], opponent_value)
+        embed.add_field(
+            name=f"🆚 vs {opponent.display_name} ({opponent_value:.0f})",
+            value=f"**Head-to-head:** {wins}W - {losses}L\n"
+                  f"**Win chance:** {chance:.0%}",
+            inline=False
+        )
+
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="promotion_sweep")
+async def promotion_sweep_command(ctx: commands.Context):
+    """
+    !promotion_sweep (officers only)
+    Checks every ranked member against their next rank's requirements and
+    posts a single digest of everyone ready for promotion to HiCom.
+    """
+    if not isinstance(ctx.author, discord.Member) or not is_officer(ctx.author):
+        await ctx.send(embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can run a promotion sweep.",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    loading_msg = await ctx.send(embed=create_styled_embed(
+        "⏳ Running Promotion Sweep...",
+        "Checking every ranked member against their next rank's requirements...",
+        UIStyle.COLOR_INFO
+    ))
+
+    started = time.perf_counter()
+    checked, ready, announced = await run_promotion_sweep(ctx.guild)
+    elapsed = time.perf_counter() - started
+
+    if announced:
+        outcome = f"A digest of {announced} new promotion(s) has been posted in <#{PROMOTION_CHANNEL_ID}>."
+    elif ready:
+        outcome = "Everyone ready has already been announced to HiCom."
+    else:
+        outcome = "No one is ready right now."
+
+    await loading_msg.edit(embed=create_styled_embed(
+        "✅ Promotion Sweep Complete",
+        f"**Members checked:** {checked}\n"
+        f"**Ready for promotion:** {ready}\n"
+        f"**Newly announced:** {announced}\n"
+        f"**Time taken:** {elapsed:.2f}s\n\n"
+        + outcome,
+        UIStyle.COLOR_SUCCESS
+    ))
+
+
+@bot.command(name="dbstats")
+async def dbstats_command(ctx: commands.Context):
+    """
+    !dbstats (officers only)
+    Shows connection pool usage and per-query call counts and latencies.
+    """
+    if not isinstance(ctx.author, discord.Member) or not is_officer(ctx.author):
+        await ctx.send(embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can view database stats.",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    description = (
+        f"**Pool:** {pool.get_size()} open / {pool.get_idle_size()} idle "
+        f"(min {pool.get_min_size()}, max {pool.get_max_size()})\n"
+    )
+    if read_pool is not None:
+        description += (
+            f"**Read replica:** {read_pool.get_size()} open / {read_pool.get_idle_size()} idle; "
+            f"{sticky_primary.stats['replica']} reads routed, "
+            f"{sticky_primary.stats['primary']} kept on primary "
+            f"({len(sticky_primary)} members within {READ_AFTER_WRITE_SECONDS:g}s of a write)\n"
+        )
+    description += (
+        f"**Statement cache:** {DB_STATEMENT_CACHE_SIZE} per connection\n"
+        f"**Command timeout:** {DB_COMMAND_TIMEOUT or 'none'}"
+    )
+    embed = create_styled_embed("🗄️ Database Stats", description, UIStyle.COLOR_INFO)
+
+    lines = [f"{'query':<30}{'calls':>8}{'avg ms':>9}{'max ms':>9}{'err':>5}"]
+    for query in sorted(queries, key=lambda q: q.total_ms, reverse=True):
+        if not query.calls:
+            continue
+        lines.append(
+            f"{query.name[:29]:<30}{query.calls:>8}"
+            f"{query.total_ms / query.calls:>9.1f}{query.max_ms:>9.1f}{query.errors:>5}"
+        )
+    embed.add_field(
+        name="Queries (by total time)",
+        value="```\n" + "\n".join(lines[:20])[:1000] + "\n```" if len(lines) > 1 else "No queries run yet.",
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="perf")
+async def perf_command(ctx: commands.Context, kind: Optional[str] = None):
+    """
+    !perf [kind] (officers only)
+    Shows p50/p95/p99 latency of the slowest instrumented operations,
+    optionally only one kind (command, view, query, db, discord_api, pool,
+    startup).
+    """
+    if not isinstance(ctx.author, discord.Member) or not is_officer(ctx.author):
+        await ctx.send(embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can view performance stats.",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    rows = [
+        (op_kind, name, hist)
+        for (op_kind, name), hist in metrics.histograms.items()
+        if hist.count and (kind is None or op_kind == kind.lower())
+    ]
+    rows.sort(key=lambda row: row[2].percentile(95), reverse=True)
+
+    lines = [f"{'operation':<28}{'n':>7}{'p50':>7}{'p95':>7}{'p99':>7}"]
+    for op_kind, name, hist in rows[:15]:
+        label = f"{op_kind}:{name}"
+        lines.append(
+            f"{label[:27]:<28}{hist.count:>7}"
+            f"{hist.percentile(50) * 1000:>7.0f}{hist.percentile(95) * 1000:>7.0f}"
+            f"{hist.percentile(99) * 1000:>7.0f}"
+        )
+
+    embed = create_styled_embed(
+        "⏱️ Performance",
+        "Latency in ms over the last "
+        f"{LATENCY_SAMPLE_WINDOW} calls of each operation, slowest p95 first."
+        + (f"\n**Metrics endpoint:** port {METRICS_PORT}" if METRICS_PORT else ""),
+        UIStyle.COLOR_INFO
+    )
+    embed.add_field(
+        name="Operations",
+        value="```\n" + "\n".join(lines)[:1000] + "\n```" if rows else "Nothing recorded yet.",
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
+
+@bot.command(name="rebuild_stats")
+async def rebuild_stats_command(ctx: commands.Context):
+    """
+    !rebuild_stats (officers only)
+    Recomputes the user_stats counters from the full history and reports
+    any users whose stored counters had drifted.
+    """
+    if not isinstance(ctx.author, discord.Member) or not is_officer(ctx.author):
+        await ctx.send(embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can rebuild stats.",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    loading_msg = await ctx.send(embed=create_styled_embed(
+        "⏳ Rebuilding Stats...",
+        "Recomputing counters from the full event and duel history...",
+        UIStyle.COLOR_INFO
+    ))
+
+    async with acquire_connection() as conn:
+        drift = await rebuild_user_stats(conn)
+    stats_cache.clear()
+    if drift:
+        # Rankings were built from the drifted counters
+        await leaderboards.refresh_loaded(primary=True)
+
+    if not drift:
+        await loading_msg.edit(embed=create_styled_embed(
+            "✅ Stats Rebuilt",
+            "All stored counters matched the history. No drift found.",
+            UIStyle.COLOR_SUCCESS
+        ))
+        return
+
+    lines = []
+    for row in drift[:15]:
+        changes = [
+            f"{name} {row['old_' + name] or 0}→{row[name] or 0}"
+            for name in STAT_COUNTERS
+            if (row["old_" + name] or 0) != (row[name] or 0)
+        ]
+        lines.append(f"<@{row['discord_id']}>: " + ", ".join(changes))
+    if len(drift) > 15:
+        lines.append(f"...and {len(drift) - 15} more")
+
+    await loading_msg.edit(embed=create_styled_embed(
+        "⚠️ Stats Rebuilt - Drift Corrected",
+        f"**{len(drift)}** user(s) had drifted counters:\n\n" + "\n".join(lines),
+        UIStyle.COLOR_WARNING
+    ))
+
+
+@bot.command(name="rebuild_ratings")
+async def rebuild_ratings_command(ctx: commands.Context):
+    """
+    !rebuild_ratings (officers only)
+    Recomputes every duel rating by replaying the full duel history.
+    """
+    if not isinstance(ctx.author, discord.Member) or not is_officer(ctx.author):
+        await ctx.send(embed=create_styled_embed(
+            "Permission Denied",
+            "Only officers can rebuild ratings.",
+            UIStyle.COLOR_ERROR
+        ))
+        return
+
+    loading_msg = await ctx.send(embed=create_styled_embed(
+        "⏳ Rebuilding Ratings...",
+        "Replaying the full duel history...",
+        UIStyle.COLOR_INFO
+    ))
+
+    started = time.perf_counter()
+    async with acquire_connection() as conn:
+        replayed, rated = await rebuild_player_ratings(conn)
+
+    await loading_msg.edit(embed=create_styled_embed(
+        "✅ Ratings Rebuilt",
+        f"Replayed **{replayed}** duel(s) for **{rated}** player(s) "
+        f"in {time.perf_counter() - started:.1f}s.",
+        UIStyle.COLOR_SUCCESS
+    ))
+
+
 # =========================
 # MAIN ENTRY
 # =========================
 
 async def main():
-    await init_db()
-
     if not DISCORD_TOKEN:
         raise RuntimeError("DISCORD_TOKEN environment variable not set.")
 
-    await bot.start(DISCORD_TOKEN)
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    register_persistent_views()
+
+    # The database and the Discord login don't depend on each other; only
+    # the gateway connection (which starts delivering events) needs both
+    try:
+        await asyncio.gather(
+            startup.run("database", init_db()),
+            startup.run("discord_login", bot.login(DISCORD_TOKEN)),
+        )
+    except BaseException:
+        await bot.close()
+        raise
+    logger.info(f"Database ready and logged in {time.monotonic() - started_at:.2f}s after startup")
+
+    startup.begin("gateway")
+    await bot.connect()
+
+
+# Everything above ran at import
+startup.record("import", time.monotonic() - started_at)
 
 
 if __name__ == "__main__":